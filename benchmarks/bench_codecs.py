@@ -0,0 +1,45 @@
+# Copyright (C) 2021 Fraunhofer Institut IOSB, Fraunhoferstr. 1, D 76131
+# Karlsruhe, Germany.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Compares the installed json codecs on a typical Observation page, for decoding a response and encoding a request.
+
+    python benchmarks/bench_codecs.py [rows] [repeat]
+"""
+
+import sys
+import timeit
+
+from frost_sta_client.service import json_codec
+from bench_decode import observation_page
+
+
+def main(rows=1000, repeat=20):
+    page = observation_page(rows)
+    data = json_codec.JsonCodec().dumps(page)
+    print('page of {} Observations, {} kB'.format(rows, len(data) // 1024))
+    for name, codec_class in json_codec.CODECS.items():
+        if codec_class.module is None:
+            print('{:>8}: not installed'.format(name))
+            continue
+        codec = codec_class()
+        loads = min(timeit.repeat(lambda: codec.loads(data), number=1, repeat=repeat))
+        dumps = min(timeit.repeat(lambda: codec.dumps(page), number=1, repeat=repeat))
+        print('{:>8}: loads {:7.2f} ms, dumps {:7.2f} ms'.format(name, loads * 1e3, dumps * 1e3))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
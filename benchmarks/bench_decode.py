@@ -0,0 +1,71 @@
+# Copyright (C) 2021 Fraunhofer Institut IOSB, Fraunhoferstr. 1, D 76131
+# Karlsruhe, Germany.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Compares the validated and the trusted decoding of an Observation page, as done for server responses, including the
+FeatureOfInterest expanded in every row, with and without an IdentityMap sharing it, and the serialization of the
+decoded Observations.
+
+    python benchmarks/bench_decode.py [rows] [repeat]
+"""
+
+import datetime
+import sys
+import timeit
+
+import frost_sta_client.utils
+from frost_sta_client.model.ext.identity_map import IdentityMap
+
+OBSERVATION_CLASS = 'frost_sta_client.model.observation.Observation'
+
+
+def observation_page(rows):
+    start = datetime.datetime(2021, 3, 4, tzinfo=datetime.timezone.utc)
+    return {"value": [{
+        "@iot.id": i,
+        "@iot.selfLink": "http://example.org/FROST-Server/v1.1/Observations({})".format(i),
+        "phenomenonTime": (start + datetime.timedelta(seconds=i)).strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+        "resultTime": "2021-03-04T05:07:00.000Z",
+        "result": i * 0.5,
+        "resultQuality": {"flag": "ok"},
+        "parameters": {"source": "bench"},
+        "Datastream@iot.navigationLink": "http://example.org/FROST-Server/v1.1/Observations({})/Datastream".format(i),
+        "FeatureOfInterest": {"@iot.id": 1, "name": "foi", "encodingType": "application/geo+json",
+                              "feature": {"type": "Point", "coordinates": [8.4, 49.0]}}
+    } for i in range(rows)]}
+
+
+def decode(page, trusted, identity_map):
+    observations = frost_sta_client.utils.transform_json_to_entity_list(page, OBSERVATION_CLASS, trusted,
+                                                                        identity_map)
+    return [observation.feature_of_interest for observation in observations.entities]
+
+
+def main(rows=10000, repeat=5):
+    page = observation_page(rows)
+    for identity_map in (False, True):
+        for trusted in (False, True):
+            seconds = min(timeit.repeat(lambda: decode(page, trusted, IdentityMap() if identity_map else None),
+                                        number=1, repeat=repeat))
+            name = ('trusted' if trusted else 'validated') + (' + identity map' if identity_map else '')
+            print('{:>24}: {:8.2f} us per Observation'.format(name, seconds / rows * 1e6))
+    observations = frost_sta_client.utils.transform_json_to_entity_list(page, OBSERVATION_CLASS).entities
+    seconds = min(timeit.repeat(lambda: [o.__getstate__() for o in observations], number=1, repeat=repeat))
+    print('{:>24}: {:8.2f} us per Observation'.format('serialize', seconds / rows * 1e6))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,71 @@
+# Copyright (C) 2021 Fraunhofer Institut IOSB, Fraunhoferstr. 1, D 76131
+# Karlsruhe, Germany.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measures the memory taken per decoded entity, for every entity type.
+
+    python benchmarks/bench_memory.py [count]
+"""
+
+import gc
+import sys
+import tracemalloc
+
+import frost_sta_client.utils
+from frost_sta_client.model.ext import entity_type
+
+SAMPLE_STATES = {
+    'Actuator': {"name": "a", "description": "d", "encodingType": "application/pdf", "metadata": "m",
+                 "properties": {}},
+    'Datastream': {"name": "ds", "description": "d", "observationType": "OM_Measurement",
+                   "unitOfMeasurement": {"name": "degree celsius", "symbol": "C", "definition": "ucum:Cel"}},
+    'FeatureOfInterest': {"name": "f", "description": "d", "encodingType": "application/geo+json",
+                          "feature": {"type": "Point", "coordinates": [8.4, 49.0]}},
+    'HistoricalLocation': {"time": "2021-03-04T05:06:07Z"},
+    'Location': {"name": "l", "description": "d", "encodingType": "application/geo+json",
+                 "location": {"type": "Point", "coordinates": [8.4, 49.0]}},
+    'MultiDatastream': {"name": "mds", "description": "d", "observationType": "OM_ComplexObservation",
+                        "multiObservationDataTypes": ["OM_Measurement"],
+                        "unitOfMeasurements": [{"name": "degree celsius", "symbol": "C"}]},
+    'Observation': {"phenomenonTime": "2021-03-04T05:06:07Z", "result": 1.5},
+    'ObservedProperty': {"name": "op", "description": "d", "definition": "http://example.org/op"},
+    'Sensor': {"name": "s", "description": "d", "encodingType": "application/pdf", "metadata": "m"},
+    'Task': {"taskingParameters": {"state": "on"}},
+    'TaskingCapability': {"name": "tc", "description": "d", "taskingParameters": {}},
+    'Thing': {"name": "t", "description": "d", "properties": {}},
+}
+
+
+def bytes_per_entity(entity_type_name, count):
+    entity_class = entity_type.EntityTypes[entity_type_name]['class']
+    states = [dict(SAMPLE_STATES[entity_type_name], **{"@iot.id": i}) for i in range(count)]
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    entities = [frost_sta_client.utils.transform_json_to_entity(state, entity_class) for state in states]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del entities
+    return (after - before) / count
+
+
+def main(count=20000):
+    for entity_type_name in sorted(SAMPLE_STATES):
+        print('{:>18}: {:7.0f} bytes per entity'.format(entity_type_name, bytes_per_entity(entity_type_name, count)))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -19,16 +19,28 @@ from frost_sta_client.model.thing import Thing
 from frost_sta_client.model.ext.unitofmeasurement import UnitOfMeasurement
 from frost_sta_client.service.sensorthingsservice import SensorThingsService
 from frost_sta_client.service.auth_handler import AuthHandler
+from frost_sta_client.service.response_cache import ResponseCache
+from frost_sta_client.service.retry_policy import RetryPolicy
+from frost_sta_client.service.upsert_cache import UpsertCache
+from frost_sta_client.service.batch import Batch, AsyncBatch, BatchError
 from frost_sta_client.model.ext.entity_type import EntityTypes
 from frost_sta_client.model.ext.entity_list import EntityList
+from frost_sta_client.model.ext.identity_map import IdentityMap
 from frost_sta_client.model.ext.data_array_value import DataArrayValue
 from frost_sta_client.model.ext.data_array_document import DataArrayDocument
-
-import jsonpickle
-
-jsonpickle.load_backend('demjson3', 'encode', 'decode', 'JSONDecodeError')
-jsonpickle.set_preferred_backend('demjson3')
-jsonpickle.set_decoder_options("demjson3", decode_float=float)
+from frost_sta_client.provisioning import Provisioner
 
 from .__version__ import (__title__, __version__, __license__, __author__, __contact__, __url__,
                           __description__, __copyright__)
+
+
+def __getattr__(name):
+    # rarely used parts are only imported on first access, to keep importing frost_sta_client cheap
+    if name == 'AsyncSensorThingsService':
+        from frost_sta_client.service.async_sensorthingsservice import AsyncSensorThingsService
+        return AsyncSensorThingsService
+    if name == 'jsonpickle':
+        from frost_sta_client import utils
+        globals()['jsonpickle'] = utils.configure_jsonpickle()
+        return globals()['jsonpickle']
+    raise AttributeError("module 'frost_sta_client' has no attribute '{}'".format(name))
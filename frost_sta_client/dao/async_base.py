@@ -0,0 +1,284 @@
+# Copyright (C) 2021 Fraunhofer Institut IOSB, Fraunhoferstr. 1, D 76131
+# Karlsruhe, Germany.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import frost_sta_client.model.observation
+import frost_sta_client.query.async_query
+import frost_sta_client.utils
+from frost_sta_client.dao import base
+from frost_sta_client.dao import observation
+from frost_sta_client.model.ext.entity_type import EntityTypes
+
+import asyncio
+import logging
+import requests
+from furl import furl
+
+
+class AsyncBaseDao(base.BaseDao):
+    """
+    The asyncio counterpart of BaseDao. It has to be used with an AsyncSensorThingsService, all operations that
+    send requests are coroutines.
+    """
+
+    async def create(self, entity):
+        url = furl(self.service.url)
+        url.path.add(self.entitytype_plural)
+        logging.debug('Posting to ' + str(url.url))
+        json_dict = frost_sta_client.utils.transform_entity_to_json_dict(entity)
+        try:
+            response = await self.service.execute('post', url, json=json_dict)
+        except requests.exceptions.HTTPError as e:
+            frost_sta_client.utils.handle_server_error(e, 'Creating {}'.format(type(entity).__name__))
+        self.process_create_response(entity, response)
+
+    async def create_many(self, entities, concurrency=1, ordered=False):
+        """
+        Creates all given entities with up to 'concurrency' requests in flight, see BaseDao.create_many
+        """
+        entities = list(entities)
+
+        async def create(entity):
+            try:
+                await self.create(entity)
+            except Exception as e:
+                return e
+            return None
+
+        if ordered:
+            errors = [await create(entity) for entity in entities]
+        else:
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def create_bounded(entity):
+                async with semaphore:
+                    return await create(entity)
+
+            errors = await asyncio.gather(*[create_bounded(entity) for entity in entities])
+        return self.check_many_errors(entities, errors)
+
+    async def patch(self, entity, patches):
+        url = self.entity_url(entity)
+        logging.debug(f'Patching to {url.url}')
+        patches = self.check_patches(patches)
+        try:
+            response = await self.service.execute('patch', url, json=patches, headers=self.APPLICATION_JSON_PATCH)
+        except requests.exceptions.HTTPError as e:
+            frost_sta_client.utils.handle_server_error(e, 'Patching {}'.format(type(entity).__name__))
+        logging.debug(f'Received response: {str(response.status_code)}')
+
+    async def save_changes(self, entities, concurrency=1, patch_format='json-patch'):
+        """
+        Sends the changes of the given entities with up to 'concurrency' requests in flight, see
+        BaseDao.save_changes
+        """
+        entities = list(entities)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def save(entity):
+            async with semaphore:
+                try:
+                    return await self.save_entity_changes(entity, patch_format), None
+                except Exception as e:
+                    return False, e
+
+        results = await asyncio.gather(*[save(entity) for entity in entities])
+        self.check_many_errors(entities, [error for _, error in results], base.SaveChangesError)
+        return [entity for entity, (saved, _) in zip(entities, results) if saved]
+
+    async def save_entity_changes(self, entity, patch_format='json-patch'):
+        changes = entity.get_changes(patch_format)
+        if changes is None:
+            return False
+        if patch_format == 'json-patch':
+            await self.patch(entity, changes)
+        else:
+            await self.merge_patch(entity, changes)
+        entity.mark_clean()
+        return True
+
+    async def merge_patch(self, entity, changes):
+        url = self.entity_url(entity)
+        logging.debug('Patching to {}'.format(url.url))
+        try:
+            await self.service.execute('patch', url, json=changes)
+        except requests.exceptions.HTTPError as e:
+            frost_sta_client.utils.handle_server_error(e, 'Patching {}'.format(type(entity).__name__))
+
+    async def upsert(self, entity, key=('name',)):
+        return (await self.upsert_many([entity], key))[0]
+
+    async def upsert_many(self, entities, key=('name',), chunk_size=50, concurrency=1):
+        """
+        Creates or updates the given entities by their natural key with up to 'concurrency' requests in flight, see
+        BaseDao.upsert_many
+        """
+        entities = list(entities)
+        actions, pending = self.plan_upserts(entities, key)
+        lookup_keys = [item[2] for item in pending if item[4] is None]
+        existing = await self.find_by_keys(lookup_keys, key, chunk_size, concurrency) if lookup_keys else {}
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def write(item):
+            _, entity, natural_key, state, cached, duplicates = item
+            async with semaphore:
+                try:
+                    if cached is not None:
+                        action = await self.upsert_known(entity, cached, state)
+                    else:
+                        action = await self.upsert_found(entity, existing.get(natural_key, None), state)
+                    self.service.upsert_cache.put(self.service.url, self.entitytype, natural_key, entity.id, state)
+                    return [action] + await self.upsert_duplicates(entity, natural_key, state, duplicates), None
+                except Exception as e:
+                    return None, e
+
+        results = await asyncio.gather(*[write(item) for item in pending])
+        return self.finish_upserts(actions, pending, results)
+
+    async def upsert_known(self, entity, cached, state):
+        entity.id = cached[0]
+        entity.service = self.service
+        try:
+            await self.merge_patch(entity, self.service.upsert_cache.changed_properties(cached[1], state))
+        except requests.exceptions.HTTPError as e:
+            if getattr(e.response, 'status_code', None) != 404:
+                raise e
+            entity.id = None
+            await self.create(entity)
+            return 'created'
+        return 'updated'
+
+    async def upsert_found(self, entity, existing, state):
+        if existing is None:
+            await self.create(entity)
+            return 'created'
+        changes = self.adopt_existing(entity, existing, state)
+        if not changes:
+            return 'unchanged'
+        await self.merge_patch(entity, changes)
+        return 'updated'
+
+    async def upsert_duplicates(self, written, natural_key, state, duplicates):
+        actions = []
+        for _, duplicate, duplicate_state in duplicates:
+            changes = self.adopt_existing(duplicate, written, duplicate_state, state)
+            if changes:
+                await self.merge_patch(duplicate, changes)
+                self.service.upsert_cache.put(self.service.url, self.entitytype, natural_key, written.id,
+                                              duplicate_state)
+                state = duplicate_state
+            actions.append('updated' if changes else 'unchanged')
+        return actions
+
+    async def find_by_keys(self, keys, attributes=('name',), chunk_size=50, concurrency=1):
+        """
+        Fetches the entities with the given natural keys with up to 'concurrency' queries in flight, see
+        BaseDao.find_by_keys
+        """
+        keys = list(dict.fromkeys(tuple(key) for key in keys))
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def find_chunk(chunk):
+            async with semaphore:
+                entity_list = await self.keys_query(chunk, attributes).list()
+                return [entity async for entity in entity_list]
+
+        chunks = await asyncio.gather(*[find_chunk(chunk) for chunk in self.chunks(keys, chunk_size)])
+        return self.map_found_keys(chunks, attributes)
+
+    async def update(self, entity):
+        url = self.entity_url(entity)
+        logging.debug('Updating to {}'.format(url.url))
+        json_dict = frost_sta_client.utils.transform_entity_to_json_dict(entity)
+        try:
+            response = await self.service.execute('put', url, json=json_dict)
+        except requests.exceptions.HTTPError as e:
+            frost_sta_client.utils.handle_server_error(e, 'Updating {}'.format(type(entity).__name__))
+        logging.debug('Received response: {}'.format(str(response.status_code)))
+
+    async def find(self, id):
+        url = furl(self.service.url)
+        url.path.add(self.entity_path(id))
+        logging.debug('Fetching: {}'.format(url.url))
+        try:
+            response = await self.service.execute('get', url)
+        except requests.exceptions.HTTPError as e:
+            frost_sta_client.utils.handle_server_error(e, 'Finding {}'.format(id))
+        return self.process_find_response(response)
+
+    async def find_many(self, ids, chunk_size=100, concurrency=1):
+        """
+        Fetches the entities with the given ids with up to 'concurrency' queries in flight, see BaseDao.find_many
+        """
+        ids = list(dict.fromkeys(ids))
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def find_chunk(chunk):
+            async with semaphore:
+                entity_list = await self.ids_query(chunk).list()
+                return [entity async for entity in entity_list]
+
+        chunks = await asyncio.gather(*[find_chunk(chunk) for chunk in self.chunks(ids, chunk_size)])
+        return self.map_found_entities(ids, chunks)
+
+    async def delete(self, entity):
+        url = furl(self.service.url)
+        url.path.add(self.entity_path(entity.id))
+        logging.debug('Deleting: {}'.format(url.url))
+        try:
+            response = await self.service.execute('delete', url)
+        except requests.exceptions.HTTPError as e:
+            frost_sta_client.utils.handle_server_error(e, 'Deleting {}'.format(type(entity).__name__))
+        self.service.upsert_cache.forget(self.service.url, self.entitytype, entity.id)
+        logging.debug('Received response: {}'.format(response.status_code))
+
+    def query(self):
+        return frost_sta_client.query.async_query.AsyncQuery(self.service, self.entitytype, self.entitytype_plural,
+                                                             self.entity_class, self.parent)
+
+
+class AsyncObservationDao(AsyncBaseDao, observation.ObservationDao):
+    """
+    The asyncio counterpart of ObservationDao, supporting DataArrayDocuments in create
+    """
+    def __init__(self, service):
+        AsyncBaseDao.__init__(self, service, EntityTypes['Observation'])
+
+    async def create(self, entity, max_rows=observation.ObservationDao.MAX_ROWS_PER_REQUEST, max_bytes=None, concurrency=1):
+        if isinstance(entity, frost_sta_client.model.observation.Observation):
+            return await super().create(entity)
+        chunks = entity.split(max_rows, max_bytes)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def create_chunk(chunk):
+            async with semaphore:
+                try:
+                    return await self.create_data_array_chunk(chunk), None
+                except Exception as e:
+                    return None, e
+
+        results = await asyncio.gather(*[create_chunk(chunk) for chunk in chunks])
+        return self.merge_chunk_results(chunks, results)
+
+    async def create_data_array_chunk(self, chunk):
+        url = self.service.url.copy()
+        url.path.add(self.CREATE_OBSERVATIONS)
+        logging.debug('Posting {} rows to {}'.format(chunk.row_count(), url.url))
+        json_dict = [frost_sta_client.utils.transform_entity_to_json_dict(dav) for dav in chunk.value]
+        try:
+            response = await self.service.execute('post', url, json=json_dict)
+        except requests.exceptions.HTTPError as e:
+            frost_sta_client.utils.handle_server_error(e, 'Creating Data Array')
+        return self.process_create_observations_response(response)
@@ -15,15 +15,51 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import frost_sta_client.query.query
+import frost_sta_client.query.keyset
 import frost_sta_client.utils
 
 import logging
 import requests
-import jsonpatch
 import json
 from furl import furl
 
 
+class CreateManyError(Exception):
+    """
+    Raised by create_many if some of the entities could not be created.
+    entities: all given entities, the created ones have their id set
+    failed: a list of (entity, exception) tuples, the entities can be passed to create_many again
+    """
+    def __init__(self, entities, failed):
+        super().__init__('{} of {} entities could not be created'.format(len(failed), len(entities)))
+        self.entities = entities
+        self.failed = failed
+
+
+class SaveChangesError(Exception):
+    """
+    Raised by save_changes if the changes of some of the entities could not be saved.
+    entities: all given entities, the saved ones are marked clean
+    failed: a list of (entity, exception) tuples
+    """
+    def __init__(self, entities, failed):
+        super().__init__('the changes of {} of {} entities could not be saved'.format(len(failed), len(entities)))
+        self.entities = entities
+        self.failed = failed
+
+
+class UpsertError(Exception):
+    """
+    Raised by upsert_many if some of the entities could not be created or updated.
+    entities: the entities that had to be written
+    failed: a list of (entity, exception) tuples
+    """
+    def __init__(self, entities, failed):
+        super().__init__('{} of {} entities could not be upserted'.format(len(failed), len(entities)))
+        self.entities = entities
+        self.failed = failed
+
+
 class BaseDao:
     """
     The entity independent implementation of a data access object. Specific entity Daos
@@ -105,8 +141,33 @@ class BaseDao:
             response = self.service.execute('post', url, json=json_dict)
         except requests.exceptions.HTTPError as e:
             frost_sta_client.utils.handle_server_error(e, 'Creating {}'.format(type(entity).__name__))
+        self.process_create_response(entity, response)
+
+    def create_many(self, entities, concurrency=1, ordered=False):
+        """
+        Creates all given entities, with up to 'concurrency' POST requests being sent at the same time over the pooled
+        connections of the service (so pool_maxsize should be at least concurrency). Each created entity gets its id
+        and service. If ordered is True, the entities are created one after another in the given order, so the
+        server assigns its ids in that order.
+        Returns the entities. If some fail, the remaining ones are still sent and a CreateManyError listing the
+        failed entities is raised.
+        """
+        entities = list(entities)
+        results = frost_sta_client.utils.run_concurrently(self.create, entities, 1 if ordered else concurrency)
+        return self.check_many_errors(entities, [error for _, error in results])
+
+    @staticmethod
+    def check_many_errors(entities, errors, error_class=CreateManyError):
+        failed = [(entity, error) for entity, error in zip(entities, errors) if error is not None]
+        if failed:
+            raise error_class(entities, failed)
+        return entities
+
+    def process_create_response(self, entity, response):
         entity.id = frost_sta_client.utils.extract_value(response.headers['location'])
         entity.service = self.service
+        if self.service.track_changes:
+            entity.mark_clean()
         logging.debug('Received response: ' + str(response.status_code))
 
     def patch(self, entity, patches):
@@ -115,12 +176,231 @@ class BaseDao:
         param entity: entity, that the patches should be applied to
         param patches: either a JsonPatch object or list of dictionaries, containing jsonpatch commands
         """
-        url = furl(self.service.url)
-        if entity.id is None or entity.id == '':
-            raise AttributeError('please provide an entity with a valid id')
-        url.path.add(self.entity_path(entity.id))
+        url = self.entity_url(entity)
         logging.debug(f'Patching to {url.url}')
         headers = self.APPLICATION_JSON_PATCH
+        patches = self.check_patches(patches)
+        try:
+            response = self.service.execute('patch', url, json=patches, headers=headers)
+        except requests.exceptions.HTTPError as e:
+            frost_sta_client.utils.handle_server_error(e, 'Patching {}'.format(type(entity).__name__))
+        logging.debug(f'Received response: {str(response.status_code)}')
+
+    def save_changes(self, entities, concurrency=1, patch_format='json-patch'):
+        """
+        Sends the changes of the given entities since they were marked clean (see Entity.mark_clean), as JSON-Patch
+        (patch_format='json-patch') or as a SensorThings PATCH with only the changed properties
+        (patch_format='merge-patch'), with up to 'concurrency' requests at the same time. Entities without changes
+        are skipped, saved ones are marked clean again.
+        Returns the entities that had changes. If some fail, the remaining ones are still sent and a SaveChangesError
+        listing the failed entities is raised.
+        """
+        entities = list(entities)
+
+        def save(entity):
+            return self.save_entity_changes(entity, patch_format)
+
+        results = frost_sta_client.utils.run_concurrently(save, entities, concurrency)
+        self.check_many_errors(entities, [error for _, error in results], SaveChangesError)
+        return [entity for entity, (saved, _) in zip(entities, results) if saved]
+
+    def save_entity_changes(self, entity, patch_format='json-patch'):
+        changes = entity.get_changes(patch_format)
+        if changes is None:
+            return False
+        if patch_format == 'json-patch':
+            self.patch(entity, changes)
+        else:
+            self.merge_patch(entity, changes)
+        entity.mark_clean()
+        return True
+
+    def merge_patch(self, entity, changes):
+        """
+        Sends a SensorThings PATCH, which sets the properties contained in changes and keeps all others
+        """
+        url = self.entity_url(entity)
+        logging.debug('Patching to {}'.format(url.url))
+        try:
+            self.service.execute('patch', url, json=changes)
+        except requests.exceptions.HTTPError as e:
+            frost_sta_client.utils.handle_server_error(e, 'Patching {}'.format(type(entity).__name__))
+
+    def upsert(self, entity, key=('name',)):
+        """
+        Creates the entity, or updates the existing one with the same natural key, see upsert_many. Returns
+        'created', 'updated' or 'unchanged'.
+        """
+        return self.upsert_many([entity], key)[0]
+
+    def upsert_many(self, entities, key=('name',), chunk_size=50, concurrency=1):
+        """
+        Creates the given entities, or updates the existing ones with the same natural key, i.e. the same values of
+        the attributes in key, e.g. the same name. Existing entities are looked up with queries for up to
+        chunk_size keys each, and only their properties that differ are patched. The upsert cache of the service
+        remembers the id and properties of every written entity, so a later upsert of an unchanged entity sends no
+        request, and one of a changed entity only a PATCH.
+        Entities with the same natural key as an earlier one of the call are not created again, but get the id of
+        the earlier one, and the properties in which they differ from it are patched.
+        Afterwards all entities have their id. Returns for each entity whether it was 'created', 'updated' or
+        'unchanged'. If some fail, the remaining ones are still written and an UpsertError is raised.
+        """
+        entities = list(entities)
+        actions, pending = self.plan_upserts(entities, key)
+        lookup_keys = [item[2] for item in pending if item[4] is None]
+        existing = self.find_by_keys(lookup_keys, key, chunk_size, concurrency) if lookup_keys else {}
+
+        def write(item):
+            _, entity, natural_key, state, cached, duplicates = item
+            if cached is not None:
+                action = self.upsert_known(entity, cached, state)
+            else:
+                action = self.upsert_found(entity, existing.get(natural_key, None), state)
+            self.service.upsert_cache.put(self.service.url, self.entitytype, natural_key, entity.id, state)
+            return [action] + self.upsert_duplicates(entity, natural_key, state, duplicates)
+
+        results = frost_sta_client.utils.run_concurrently(write, pending, concurrency)
+        return self.finish_upserts(actions, pending, results)
+
+    def plan_upserts(self, entities, key):
+        """
+        Sets the ids of the entities that the upsert cache knows unchanged. Returns the list of actions, with
+        'unchanged' for these and None for the others, and a (index, entity, natural key, property state, cached
+        (id, fingerprint) or None, duplicates) tuple for each entity that has to be written. duplicates holds an
+        (index, entity, property state) tuple for each later entity with the same natural key.
+        """
+        cache = self.service.upsert_cache
+        actions = [None] * len(entities)
+        pending = []
+        by_key = {}
+        for index, entity in enumerate(entities):
+            natural_key = self.natural_key(entity, key)
+            state = entity.get_property_state()
+            entry_key = cache.entry_key(self.service.url, self.entitytype, natural_key)
+            if entry_key in by_key:
+                by_key[entry_key][5].append((index, entity, state))
+                continue
+            cached = cache.get(self.service.url, self.entitytype, natural_key)
+            if cached is not None and cached[1] == cache.fingerprint(state):
+                entity.id = cached[0]
+                entity.service = self.service
+                actions[index] = 'unchanged'
+            else:
+                by_key[entry_key] = (index, entity, natural_key, state, cached, [])
+                pending.append(by_key[entry_key])
+        return actions, pending
+
+    def finish_upserts(self, actions, pending, results):
+        entities = []
+        errors = []
+        for (index, entity, _, _, _, duplicates), (written, error) in zip(pending, results):
+            group = [(index, entity)] + [(duplicate_index, duplicate) for duplicate_index, duplicate, _ in duplicates]
+            for position, (entity_index, group_entity) in enumerate(group):
+                if written is not None:
+                    actions[entity_index] = written[position]
+                entities.append(group_entity)
+                errors.append(error)
+        self.service.upsert_cache.save()
+        self.check_many_errors(entities, errors, UpsertError)
+        return actions
+
+    def upsert_known(self, entity, cached, state):
+        """
+        Patches the properties that differ from the ones cached for an entity whose id is known from the upsert
+        cache, or creates it if it has been deleted in the meantime
+        """
+        entity.id = cached[0]
+        entity.service = self.service
+        try:
+            self.merge_patch(entity, self.service.upsert_cache.changed_properties(cached[1], state))
+        except requests.exceptions.HTTPError as e:
+            if getattr(e.response, 'status_code', None) != 404:
+                raise e
+            entity.id = None
+            self.create(entity)
+            return 'created'
+        return 'updated'
+
+    def upsert_found(self, entity, existing, state):
+        if existing is None:
+            self.create(entity)
+            return 'created'
+        changes = self.adopt_existing(entity, existing, state)
+        if not changes:
+            return 'unchanged'
+        self.merge_patch(entity, changes)
+        return 'updated'
+
+    def upsert_duplicates(self, written, natural_key, state, duplicates):
+        """
+        Gives the entities with the same natural key as the written one its id, and patches the properties in which
+        each of them differs from the state written before it
+        """
+        actions = []
+        for _, duplicate, duplicate_state in duplicates:
+            changes = self.adopt_existing(duplicate, written, duplicate_state, state)
+            if changes:
+                self.merge_patch(duplicate, changes)
+                self.service.upsert_cache.put(self.service.url, self.entitytype, natural_key, written.id,
+                                              duplicate_state)
+                state = duplicate_state
+            actions.append('updated' if changes else 'unchanged')
+        return actions
+
+    def adopt_existing(self, entity, existing, state, existing_state=None):
+        """
+        Gives the entity the id of the existing entity with the same natural key, and returns the properties in which
+        they differ
+        """
+        entity.id = existing.id
+        entity.service = self.service
+        if existing_state is None:
+            existing_state = existing.get_property_state()
+        return {name: value for name, value in state.items() if existing_state.get(name, None) != value}
+
+    def find_by_keys(self, keys, attributes=('name',), chunk_size=50, concurrency=1):
+        """
+        Fetches the entities whose attributes have the given values, with queries for up to chunk_size keys each,
+        e.g. with the $filter "(name eq 'a') or (name eq 'b')", and up to 'concurrency' queries at the same time.
+        keys: tuples with a value for each of the attributes
+        Returns a dict from each found key to its entity.
+        """
+        keys = list(dict.fromkeys(tuple(key) for key in keys))
+
+        def find_chunk(chunk):
+            return list(self.keys_query(chunk, attributes).list())
+
+        results = frost_sta_client.utils.run_concurrently(find_chunk, self.chunks(keys, chunk_size), concurrency)
+        for _, error in results:
+            if error is not None:
+                raise error
+        return self.map_found_keys([entities for entities, _ in results], attributes)
+
+    def map_found_keys(self, chunks, attributes):
+        found = {}
+        for entities in chunks:
+            for entity in entities:
+                found.setdefault(self.natural_key(entity, attributes), entity)
+        return found
+
+    def keys_query(self, keys, attributes):
+        """
+        Returns a query for the entities whose attributes have one of the given tuples of values, None matching
+        unset attributes
+        """
+        statement = ' or '.join('({})'.format(' and '.join(
+            '{} eq {}'.format(frost_sta_client.utils.camel_case(attribute),
+                              'null' if value is None else frost_sta_client.query.keyset.format_id_literal(value))
+            for attribute, value in zip(attributes, key))) for key in keys)
+        return self.query().filter(statement)
+
+    @staticmethod
+    def natural_key(entity, attributes):
+        return tuple(getattr(entity, attribute) for attribute in attributes)
+
+    @staticmethod
+    def check_patches(patches):
+        import jsonpatch
         if patches is None:
             raise ValueError('please provide a list of patches, either as a jsonpatch object or a '
                              'list of dictionaries')
@@ -130,17 +410,10 @@ class BaseDao:
                              'list of dictionaries')
         if isinstance(patches, jsonpatch.JsonPatch):
             patches = patches.patch
-        try:
-            response = self.service.execute('patch', url, json=patches, headers=headers)
-        except requests.exceptions.HTTPError as e:
-            frost_sta_client.utils.handle_server_error(e, 'Patching {}'.format(type(entity).__name__))
-        logging.debug(f'Received response: {str(response.status_code)}')
+        return patches
 
     def update(self, entity):
-        url = furl(self.service.url)
-        if entity.id is None or entity.id == '':
-            raise AttributeError('please provide an entity with a valid id')
-        url.path.add(self.entity_path(entity.id))
+        url = self.entity_url(entity)
         logging.debug('Updating to {}'.format(url.url))
         json_dict = frost_sta_client.utils.transform_entity_to_json_dict(entity)
         try:
@@ -157,11 +430,53 @@ class BaseDao:
             response = self.service.execute('get', url)
         except requests.exceptions.HTTPError as e:
             frost_sta_client.utils.handle_server_error(e, 'Finding {}'.format(id))
+        return self.process_find_response(response)
+
+    def find_many(self, ids, chunk_size=100, concurrency=1):
+        """
+        Fetches the entities with the given ids with a few collection queries, each filtering for up to chunk_size
+        ids, with up to 'concurrency' queries at the same time. Ids can be int or str.
+        Returns a dict from each id to its entity, or to None if there is no entity with that id.
+        """
+        ids = list(dict.fromkeys(ids))
+        results = frost_sta_client.utils.run_concurrently(self.find_chunk, self.chunks(ids, chunk_size), concurrency)
+        for _, error in results:
+            if error is not None:
+                raise error
+        return self.map_found_entities(ids, [entities for entities, _ in results])
+
+    def find_chunk(self, ids):
+        return list(self.ids_query(ids).list())
+
+    def ids_query(self, ids):
+        """
+        Returns a query for the entities with the given ids, e.g. with the $filter 'id eq 1 or id eq 2'
+        """
+        statement = ' or '.join('id eq {}'.format(frost_sta_client.query.keyset.format_id_literal(id))
+                                for id in ids)
+        return self.query().filter(statement).top(len(ids))
+
+    @staticmethod
+    def chunks(items, chunk_size):
+        if not isinstance(chunk_size, int) or chunk_size < 1:
+            raise ValueError('chunk_size should be a positive int!')
+        return [items[start:start + chunk_size] for start in range(0, len(items), chunk_size)]
+
+    @staticmethod
+    def map_found_entities(ids, chunks):
+        found = {entity.id: entity for entities in chunks for entity in entities}
+        return {id: found.get(id, None) for id in ids}
+
+    def process_find_response(self, response):
         logging.debug('Received response: {}'.format(response.status_code))
-        json_response = response.json()
+        json_response = self.service.decode_json(response)
         json_response['id'] = json_response['@iot.id']
-        entity = frost_sta_client.utils.transform_json_to_entity(json_response, self.entity_class)
+        entity = frost_sta_client.utils.transform_json_to_entity(json_response, self.entity_class,
+                                                                 self.service.trusted_decode,
+                                                                 self.service.identity_map)
         entity.service = self.service
+        if self.service.track_changes:
+            entity.mark_clean()
         return entity
 
     def delete(self, entity):
@@ -172,8 +487,19 @@ class BaseDao:
             response = self.service.execute('delete', url)
         except requests.exceptions.HTTPError as e:
             frost_sta_client.utils.handle_server_error(e, 'Deleting {}'.format(type(entity).__name__))
+        self.service.upsert_cache.forget(self.service.url, self.entitytype, entity.id)
         logging.debug('Received response: {}'.format(response.status_code))
 
+    def entity_url(self, entity):
+        """
+        Returns the url of an existing entity, raises an AttributeError if the entity has no id yet
+        """
+        if entity.id is None or entity.id == '':
+            raise AttributeError('please provide an entity with a valid id')
+        url = furl(self.service.url)
+        url.path.add(self.entity_path(entity.id))
+        return url
+
     def entity_path(self, id):
         if isinstance(id, int):
             return "{}({})".format(self.entitytype_plural, id)
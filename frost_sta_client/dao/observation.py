@@ -21,12 +21,23 @@ import frost_sta_client
 
 import logging
 import requests
-import json
 
 
+class DataArrayUploadError(Exception):
+    """
+    Raised by ObservationDao.create if some chunks of a DataArrayDocument could not be created.
+    observations: the created Observations in the order of the rows, None for the rows of failed chunks
+    failed_chunks: a list of (DataArrayDocument, exception) tuples, the documents can be passed to create again
+    """
+    def __init__(self, observations, failed_chunks):
+        super().__init__('{} of the data array chunks could not be created'.format(len(failed_chunks)))
+        self.observations = observations
+        self.failed_chunks = failed_chunks
+
 
 class ObservationDao(base.BaseDao):
     CREATE_OBSERVATIONS = "CreateObservations"
+    MAX_ROWS_PER_REQUEST = 10000
 
     def __init__(self, service):
         """
@@ -34,19 +45,49 @@ class ObservationDao(base.BaseDao):
         """
         base.BaseDao.__init__(self, service, EntityTypes["Observation"])
 
-    def create(self, entity):
+    def create(self, entity, max_rows=MAX_ROWS_PER_REQUEST, max_bytes=None, concurrency=1):
+        """
+        Creates an Observation, or all Observations of a DataArrayDocument using CreateObservations.
+        A DataArrayDocument is uploaded in chunks of at most max_rows rows and about max_bytes bytes (see
+        DataArrayDocument.split), with up to 'concurrency' chunks being sent at the same time.
+        Returns the created Observations (containing only their self links) in the order of the rows. If chunks
+        fail, the remaining chunks are still sent and a DataArrayUploadError listing the failed chunks is raised.
+        """
         if isinstance(entity, frost_sta_client.model.observation.Observation):
             super().create(entity)
         else:
             # entity is probably a data array
-            url = self.service.url.copy()
-            url.path.add(self.CREATE_OBSERVATIONS)
-            logging.debug('Posting to ' + str(url.url))
-            json_dict = [transform_entity_to_json_dict(dav) for dav in entity.value]
-            try:
-                response = self.service.execute('post', url, json=json_dict)
-            except requests.exceptions.HTTPError as e:
-                frost_sta_client.utils.handle_server_error(e, 'Creating Data Array')
-            response_text_as_list = json.loads(response.text)
-            result = [frost_sta_client.model.observation.Observation(self_link=link) for link in response_text_as_list]
-            return result
+            chunks = entity.split(max_rows, max_bytes)
+            results = frost_sta_client.utils.run_concurrently(self.create_data_array_chunk, chunks, concurrency)
+            return self.merge_chunk_results(chunks, results)
+
+    def create_data_array_chunk(self, chunk):
+        url = self.service.url.copy()
+        url.path.add(self.CREATE_OBSERVATIONS)
+        logging.debug('Posting {} rows to {}'.format(chunk.row_count(), url.url))
+        json_dict = [transform_entity_to_json_dict(dav) for dav in chunk.value]
+        try:
+            response = self.service.execute('post', url, json=json_dict)
+        except requests.exceptions.HTTPError as e:
+            frost_sta_client.utils.handle_server_error(e, 'Creating Data Array')
+        return self.process_create_observations_response(response)
+
+    def process_create_observations_response(self, response):
+        response_text_as_list = self.service.decode_json(response)
+        result = [frost_sta_client.model.observation.Observation(self_link=link) for link in response_text_as_list]
+        return result
+
+    @staticmethod
+    def merge_chunk_results(chunks, results):
+        observations = []
+        failed_chunks = []
+        for chunk, (result, error) in zip(chunks, results):
+            if error is None:
+                observations.extend(result)
+            else:
+                observations.extend([None] * chunk.row_count())
+                failed_chunks.append((chunk, error))
+        if failed_chunks:
+            raise DataArrayUploadError(observations, failed_chunks)
+        return observations
+
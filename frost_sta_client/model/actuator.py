@@ -22,10 +22,10 @@ from . import tasking_capability
 
 from .ext import entity_list
 from .ext import entity_type
-from frost_sta_client import utils
 
 
 class Actuator(entity.Entity):
+    __slots__ = ('_name', '_description', '_properties', '_encoding_type', '_metadata', '_tasking_capabilities')
 
     def __init__(self,
                  name='',
@@ -50,7 +50,7 @@ class Actuator(entity.Entity):
         attributes = {'_id': None, '_name': '', '_description': '', '_properties': {}, '_encoding_type': '',
                       '_metadata': '', '_self_link': '', '_service': None, '_tasking_capabilities': None}
         for key, value in attributes.items():
-            new_actuator.__dict__[key] = value
+            setattr(new_actuator, key, value)
         return new_actuator
 
     @property
@@ -109,7 +109,7 @@ class Actuator(entity.Entity):
 
     @property
     def tasking_capabilities(self):
-        return self._tasking_capabilities
+        return self.materialize_relation('_tasking_capabilities')
 
     @tasking_capabilities.setter
     def tasking_capabilities(self, values):
@@ -131,8 +131,8 @@ class Actuator(entity.Entity):
         return result
 
     def ensure_service_on_children(self, service):
-        if self.tasking_capabilities is not None:
-            self.tasking_capabilities.set_service(service)
+        if self._tasking_capabilities is not None:
+            self._tasking_capabilities.set_service(service)
 
     def __eq__(self, other):
         if not super().__eq__(other):
@@ -175,11 +175,7 @@ class Actuator(entity.Entity):
         self.encoding_type = state.get("encodingType", "")
         self.metadata = state.get("metadata", "")
         self.properties = state.get("properties", None)
-        if state.get("TaskingCapabilities", None) is not None and isinstance(state["TaskingCapabilities"], list):
-            entity_class = entity_type.EntityTypes['TaskingCapability']['class']
-            self.tasking_capabilities = utils.transform_json_to_entity_list(state['TaskingCapabilities'], entity_class)
-            self.tasking_capabilities.next_link = state.get("TaskingCapabilities@iot.nextLink", None)
-            self.tasking_capabilities.count = state.get("TaskingCapabilities@iot.count", None)
+        self.set_lazy_relation('_tasking_capabilities', state, 'TaskingCapabilities', 'TaskingCapability', many=True)
 
     def get_dao(self, service):
         return ActuatorDao(service)
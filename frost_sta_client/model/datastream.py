@@ -30,10 +30,11 @@ from .ext import entity_type
 
 from frost_sta_client import utils
 
-import geojson.geometry
-
 
 class Datastream(entity.Entity):
+    __slots__ = ('_name', '_description', '_properties', '_observation_type', '_unit_of_measurement',
+                 '_observed_area', '_phenomenon_time', '_result_time', '_thing', '_sensor', '_observed_property',
+                 '_observations')
 
     def __init__(self,
                  name='',
@@ -86,7 +87,7 @@ class Datastream(entity.Entity):
                           _thing=None, _sensor=None, _observed_property=None, _observations=None, _self_link='',
                           _service=None)
         for key, value in attributes.items():
-            new_datastream.__dict__[key] = value
+            setattr(new_datastream, key, value)
         return new_datastream
 
     @property
@@ -148,6 +149,7 @@ class Datastream(entity.Entity):
         if value is None:
             self._observed_area = None
             return
+        import geojson
         geo_classes = [obj for _, obj in inspect.getmembers(geojson) if inspect.isclass(obj) and
                        obj.__module__ == 'geojson.geometry']
         if type(value) in geo_classes:
@@ -191,7 +193,7 @@ class Datastream(entity.Entity):
 
     @property
     def thing(self):
-        return self._thing
+        return self.materialize_relation('_thing')
 
     @thing.setter
     def thing(self, value):
@@ -202,7 +204,7 @@ class Datastream(entity.Entity):
 
     @property
     def sensor(self):
-        return self._sensor
+        return self.materialize_relation('_sensor')
 
     @sensor.setter
     def sensor(self, value):
@@ -213,7 +215,7 @@ class Datastream(entity.Entity):
 
     @property
     def observed_property(self):
-        return self._observed_property
+        return self.materialize_relation('_observed_property')
 
     @observed_property.setter
     def observed_property(self, value):
@@ -224,7 +226,7 @@ class Datastream(entity.Entity):
 
     @property
     def observations(self):
-        return self._observations
+        return self.materialize_relation('_observations')
 
     @observations.setter
     def observations(self, values):
@@ -247,14 +249,14 @@ class Datastream(entity.Entity):
         return result
 
     def ensure_service_on_children(self, service):
-        if self.thing is not None:
-            self.thing.set_service(service)
-        if self.sensor is not None:
-            self.sensor.set_service(service)
-        if self.observed_property is not None:
-            self.observed_property.set_service(service)
-        if self.observations is not None:
-            self.observations.set_service(service)
+        if self._thing is not None:
+            self._thing.set_service(service)
+        if self._sensor is not None:
+            self._sensor.set_service(service)
+        if self._observed_property is not None:
+            self._observed_property.set_service(service)
+        if self._observations is not None:
+            self._observations.set_service(service)
 
     def __eq__(self, other):
         if not super().__eq__(other):
@@ -319,20 +321,28 @@ class Datastream(entity.Entity):
             self.phenomenon_time = state["phenomenonTime"]
         if state.get("resultTime", None) is not None:
             self.result_time = state["resultTime"]
-        if state.get("Thing", None) is not None:
-            self.thing = frost_sta_client.model.thing.Thing()
-            self.thing.__setstate__(state["Thing"])
-        if state.get("ObservedProperty", None) is not None:
-            self.observed_property = frost_sta_client.model.observedproperty.ObservedProperty()
-            self.observed_property.__setstate__(state["ObservedProperty"])
-        if state.get("Sensor", None) is not None:
-            self.sensor = frost_sta_client.model.sensor.Sensor()
-            self.sensor.__setstate__(state["Sensor"])
-        if state.get("Observations", None) is not None and isinstance(state["Observations"], list):
-            entity_class = entity_type.EntityTypes['Observation']['class']
-            self.observations = utils.transform_json_to_entity_list(state['Observations'], entity_class)
-            self.observations.next_link = state.get("Observations@iot.nextLink", None)
-            self.observations.count = state.get("Observations@iot.count", None)
+        self.set_lazy_relation('_thing', state, 'Thing', 'Thing')
+        self.set_lazy_relation('_observed_property', state, 'ObservedProperty', 'ObservedProperty')
+        self.set_lazy_relation('_sensor', state, 'Sensor', 'Sensor')
+        self.set_lazy_relation('_observations', state, 'Observations', 'Observation', many=True)
+
+    def set_trusted_state(self, state):
+        self.set_trusted_base_state(state)
+        self._name = state.get("name", None)
+        self._description = state.get("description", None)
+        self._observation_type = state.get("observationType", None)
+        self._properties = state.get("properties", {})
+        if state.get("unitOfMeasurement", None) is not None:
+            self._unit_of_measurement = unitofmeasurement.UnitOfMeasurement()
+            self._unit_of_measurement.__setstate__(state["unitOfMeasurement"])
+        if state.get("observedArea", None) is not None:
+            self._observed_area = utils.process_area(state["observedArea"])
+        self._phenomenon_time = state.get("phenomenonTime", None)
+        self._result_time = state.get("resultTime", None)
+        self.set_lazy_relation('_thing', state, 'Thing', 'Thing', trusted=True)
+        self.set_lazy_relation('_observed_property', state, 'ObservedProperty', 'ObservedProperty', trusted=True)
+        self.set_lazy_relation('_sensor', state, 'Sensor', 'Sensor', trusted=True)
+        self.set_lazy_relation('_observations', state, 'Observations', 'Observation', many=True, trusted=True)
 
     def get_dao(self, service):
         return DatastreamDao(service)
@@ -14,14 +14,19 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import copy
 from abc import ABC
 from frost_sta_client.service.sensorthingsservice import SensorThingsService
+from .ext import entity_list
+from .ext import lazy_relation
 
 
 class Entity(ABC):
     """
     An abstract representation of an entity.
     """
+    __slots__ = ('_id', '_self_link', '_service', '_clean_state', '__weakref__')
+
     def __init__(self,
                  id=None,
                  self_link='',
@@ -126,3 +131,86 @@ class Entity(ABC):
     def __setstate__(self, state):
         self.id = state.get('@iot.id', None)
         self.self_link = state.get('@iot.selfLink', '')
+
+    def set_trusted_state(self, state):
+        """
+        Fills the entity from json received from the server, storing the values without the validation of the
+        property setters. Entity types without a specialised implementation fall back to __setstate__.
+        Time strings are stored as the server sent them, while the setters store them normalized, so an entity decoded
+        trusted does not compare equal to the same entity decoded with validation if the server's format differs
+        from the normalized one (e.g. '2023-01-01T00:00:00Z' and '2023-01-01T00:00:00+00:00'). Both serialize to
+        the same instant.
+        """
+        self.__setstate__(state)
+
+    def set_trusted_base_state(self, state):
+        self._id = state.get('@iot.id', None)
+        self._self_link = state.get('@iot.selfLink', '')
+
+    def get_property_state(self):
+        """
+        Returns the json of the entity's own properties, without its id and related entities.
+        """
+        properties_only = type(self).__new__(type(self))
+        for attribute in type(self).__slots__:
+            value = getattr(self, attribute, None)
+            if not isinstance(value, (Entity, entity_list.EntityList, lazy_relation.LazyRelation)):
+                setattr(properties_only, attribute, value)
+        state = properties_only.__getstate__()
+        state.pop('@iot.id', None)
+        return state
+
+    def mark_clean(self):
+        """
+        Remembers the current properties as the state known to the server, which get_changes compares against.
+        """
+        self._clean_state = copy.deepcopy(self.get_property_state())
+
+    def get_changes(self, patch_format='json-patch'):
+        """
+        Returns the changes of the entity's own properties since mark_clean was called, either as a list of JSON-Patch
+        operations (patch_format='json-patch') or as a merge-patch document with the changed top level properties
+        (patch_format='merge-patch'). Returns None if nothing changed, raises a ValueError if the entity was never
+        marked clean.
+        """
+        clean_state = getattr(self, '_clean_state', None)
+        if clean_state is None:
+            raise ValueError('the changes of {} are not tracked, call mark_clean first'.format(type(self).__name__))
+        state = self.get_property_state()
+        if patch_format == 'json-patch':
+            import jsonpatch
+            changes = jsonpatch.make_patch(clean_state, state).patch
+        elif patch_format == 'merge-patch':
+            changes = {key: value for key, value in state.items() if clean_state.get(key, None) != value}
+            changes.update({key: None for key in clean_state if key not in state})
+        else:
+            raise ValueError("patch_format should be either 'json-patch' or 'merge-patch'")
+        return changes or None
+
+    def set_lazy_relation(self, attribute, state, relation, entity_type_name, many=False, trusted=False):
+        """
+        Stores the expanded relation of the given json in attribute, without decoding it yet. Leaves the attribute
+        untouched if the relation is not expanded.
+        """
+        value = lazy_relation.LazyRelation.from_state(state, relation, entity_type_name, many, trusted)
+        if value is not None:
+            setattr(self, attribute, value)
+
+    def set_identity_map(self, identity_map):
+        """
+        Makes the relations that are not decoded yet resolve their entities through the given IdentityMap.
+        """
+        for attribute in type(self).__slots__:
+            value = getattr(self, attribute, None)
+            if isinstance(value, lazy_relation.LazyRelation):
+                value.set_identity_map(identity_map)
+
+    def materialize_relation(self, attribute):
+        """
+        Returns the value of a relation attribute, decoding it first if it is still a LazyRelation.
+        """
+        value = getattr(self, attribute)
+        if isinstance(value, lazy_relation.LazyRelation):
+            value = value.materialize()
+            setattr(self, attribute, value)
+        return value
@@ -13,6 +13,8 @@
 #
 # You should have received a copy of the GNU Lesser General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import json
+
 from .data_array_value import DataArrayValue
 
 
@@ -65,3 +67,78 @@ class DataArrayDocument:
 
     def add_data_array_value(self, dav):
         self.value.append(dav)
+
+    def extend(self, other):
+        """
+        Appends the rows of another document, e.g. the next page of a query, to the DataArrayValues of the same
+        (Multi)Datastream and components, and takes over its next_link
+        """
+        for dav in other.value:
+            match = next((own for own in self.value if own.components == dav.components and
+                          self.related_id(own) == self.related_id(dav)), None)
+            if match is None:
+                self.value.append(dav)
+            else:
+                match.data_array.extend(dav.data_array)
+        self.next_link = other.next_link
+
+    @staticmethod
+    def related_id(dav):
+        if dav.datastream is not None:
+            return 'Datastream', dav.datastream.id
+        if dav.multi_datastream is not None:
+            return 'MultiDatastream', dav.multi_datastream.id
+        return None
+
+    def __getstate__(self):
+        data = {'value': [dav.__getstate__() for dav in self.value]}
+        if self.next_link is not None:
+            data['@iot.nextLink'] = self.next_link
+        return data
+
+    def __setstate__(self, state):
+        self.count = state.get('@iot.count', None)
+        self.next_link = state.get('@iot.nextLink', None)
+        value = []
+        for item in state.get('value', []):
+            dav = DataArrayValue()
+            dav.__setstate__(item)
+            value.append(dav)
+        self.value = value
+
+    def row_count(self):
+        return sum(len(dav.data_array) for dav in self.value)
+
+    def split(self, max_rows=None, max_bytes=None):
+        """
+        Splits the document into DataArrayDocuments of at most max_rows rows and, estimated from the json encoded
+        rows, of at most max_bytes bytes. A DataArrayValue is split into several parts if necessary, and small
+        DataArrayValues are combined into one document. The order of the rows is kept.
+        """
+        chunks = []
+        current = []
+        current_rows = 0
+        current_bytes = 0
+        for dav in self.value:
+            header_bytes = len(json.dumps(dav.with_rows([]).__getstate__())) if max_bytes is not None else 0
+            part = None
+            for row in dav.data_array:
+                row_bytes = len(json.dumps(row)) + 1 if max_bytes is not None else 0
+                needed = row_bytes if part is not None else row_bytes + header_bytes
+                if current_rows > 0 and ((max_rows is not None and current_rows >= max_rows) or
+                                         (max_bytes is not None and current_bytes + needed > max_bytes)):
+                    chunks.append(DataArrayDocument(value=current))
+                    current = []
+                    current_rows = 0
+                    current_bytes = 0
+                    part = None
+                    needed = row_bytes + header_bytes
+                if part is None:
+                    part = dav.with_rows([])
+                    current.append(part)
+                part.data_array.append(row)
+                current_rows += 1
+                current_bytes += needed
+        if current:
+            chunks.append(DataArrayDocument(value=current))
+        return chunks
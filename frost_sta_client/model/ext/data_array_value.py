@@ -95,7 +95,7 @@ class DataArrayValue:
             return components
 
 
-        def from_observation(self, o: frost_sta_client.Observation):
+        def from_observation(self, o: 'frost_sta_client.model.observation.Observation'):
             value = []
             if self.id:
                 value.append(o.id)
@@ -158,10 +158,89 @@ class DataArrayValue:
     def data_array(self, value):
         self._data_array = value
 
+    COLUMN_PROPERTIES = [('id', Property.ID), ('phenomenon_time', Property.PHENOMENON_TIME),
+                         ('result', Property.RESULT), ('result_time', Property.RESULT_TIME),
+                         ('result_quality', Property.RESULT_QUALITY), ('valid_time', Property.VALID_TIME),
+                         ('parameters', Property.PARAMETERS), ('feature_of_interest', Property.FEATURE_OF_INTEREST)]
+    TIME_COLUMNS = {'phenomenon_time', 'result_time', 'valid_time'}
+
+    @classmethod
+    def from_columns(cls, datastream, **columns):
+        """
+        Creates a DataArrayValue directly from one sequence per component, without creating an Observation per row.
+        Accepted keywords are id, phenomenon_time, result, result_time, result_quality, valid_time, parameters
+        and feature_of_interest (ids or FeatureOfInterest entities). All given sequences must have the same length.
+        Columns may be lists, tuples or NumPy arrays. Time columns may contain ISO 8601 strings, which are passed on
+        unchecked, datetimes or, as NumPy datetime64 arrays, are formatted as UTC.
+
+        Example: DataArrayValue.from_columns(datastream, phenomenon_time=times, result=values)
+        """
+        unknown = set(columns) - {name for name, _ in cls.COLUMN_PROPERTIES}
+        if unknown:
+            raise ValueError('unknown columns: {}'.format(', '.join(sorted(unknown))))
+        selected = [(name, prop) for name, prop in cls.COLUMN_PROPERTIES if columns.get(name) is not None]
+        if not selected:
+            raise ValueError('at least one column has to be given')
+        values = [cls.column_values(name, columns[name]) for name, _ in selected]
+        if len({len(column) for column in values}) > 1:
+            raise ValueError('all columns should have the same length')
+        dav = cls()
+        dav.datastream = datastream
+        dav.components = {prop for _, prop in selected}
+        dav.data_array = list(map(list, zip(*values)))
+        return dav
+
+    @classmethod
+    def column_values(cls, name, column):
+        if hasattr(column, 'dtype'):
+            if column.dtype.kind == 'M':
+                import numpy
+                return numpy.datetime_as_string(column, timezone='UTC').tolist()
+            return column.tolist()
+        column = list(column)
+        if name in cls.TIME_COLUMNS:
+            return [v.isoformat() if isinstance(v, datetime.datetime) else v for v in column]
+        if name == 'feature_of_interest':
+            return [v.id if isinstance(v, frost_sta_client.model.entity.Entity) else v for v in column]
+        return column
+
+    def with_rows(self, rows):
+        """
+        Returns a DataArrayValue for the same (Multi)Datastream and components, containing only the given rows
+        """
+        result = DataArrayValue()
+        result.datastream = self.datastream
+        result.multi_datastream = self.multi_datastream
+        result.visible_properties = self.visible_properties
+        result._components = self.components
+        result.data_array = rows
+        return result
+
     def add_observation(self, o):
         self.data_array.append(self.visible_properties.from_observation(o))
         self.observations.append(o)
 
+    def column(self, component):
+        """
+        Returns the values of one component (e.g. 'result' or 'phenomenonTime') as a list
+        """
+        if self.components is None or component not in self.components:
+            raise KeyError('{} is not a component of this data array'.format(component))
+        index = self.components.index(component)
+        return [row[index] for row in self.data_array]
+
+    def columns(self, as_numpy=False):
+        """
+        Returns a dict mapping each component to the list, or with as_numpy to the NumPy array, of its values
+        """
+        if self.components is None:
+            return {}
+        transposed = list(zip(*self.data_array)) if self.data_array else [() for _ in self.components]
+        if as_numpy:
+            import numpy
+            return {component: numpy.asarray(values) for component, values in zip(self.components, transposed)}
+        return {component: list(values) for component, values in zip(self.components, transposed)}
+
     def __getstate__(self):
         data = {"Datastream": {
                 "@iot.id": self.datastream.id
@@ -170,3 +249,23 @@ class DataArrayValue:
                 "dataArray": self.data_array}
         return data
 
+    def __setstate__(self, state):
+        self.datastream = self.related_entity(state, 'Datastream', frost_sta_client.model.datastream.Datastream)
+        self.multi_datastream = self.related_entity(state, 'MultiDatastream',
+                                                    frost_sta_client.model.multi_datastream.MultiDatastream)
+        by_name = {prop.to_string(): prop for prop in DataArrayValue.Property}
+        components = state.get('components', [])
+        self.visible_properties = self.VisibleProperties({by_name[c] for c in components if c in by_name})
+        self._components = list(components)
+        self.data_array = state.get('dataArray', [])
+
+    @staticmethod
+    def related_entity(state, name, entity_class):
+        if state.get(name, None) is not None:
+            return entity_class(id=state[name].get('@iot.id', None))
+        navigation_link = state.get(name + '@iot.navigationLink', None)
+        if navigation_link is not None:
+            return entity_class(id=frost_sta_client.utils.extract_value(navigation_link.rsplit('/', 1)[-1]),
+                                self_link=navigation_link)
+        return None
+
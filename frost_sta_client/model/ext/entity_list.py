@@ -15,10 +15,84 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import logging
+import queue
+import threading
+import weakref
+
 import requests
 import frost_sta_client
 
 
+def fetch_page(service, entity_class, url, pager=None, trusted=False, identity_map=None):
+    """
+    Fetches and decodes one page of an entity collection. Returns the page as an EntityList whose next_link points
+    to the following page. Does not touch any shared state, so it can be called from a background thread.
+    """
+    try:
+        response = service.execute('get', url)
+    except requests.exceptions.HTTPError as e:
+        frost_sta_client.utils.handle_server_error(e, 'Query')
+    return decode_page(service, entity_class, response, url, pager, trusted, identity_map)
+
+
+def decode_page(service, entity_class, response, url, pager=None, trusted=False, identity_map=None):
+    logging.debug('Received response: {} from {}'.format(response.status_code, url))
+    try:
+        json_response = service.decode_json(response)
+    except ValueError:
+        raise ValueError('Cannot find json in http response')
+    page = frost_sta_client.utils.transform_json_to_entity_list(json_response, entity_class, trusted, identity_map)
+    page.set_service(service)
+    if service.track_changes:
+        page.mark_clean()
+    if pager is not None:
+        page.next_link = pager.next_link(page)
+    return page
+
+
+class PagePrefetcher:
+    """
+    Follows a chain of nextLinks on a daemon thread, keeping up to 'depth' fetched and decoded pages in a queue
+    """
+
+    def __init__(self, service, entity_class, next_link, depth, pager=None, trusted=False, identity_map=None):
+        self.pages = queue.Queue()
+        # a page is only fetched after a slot is free, so at most 'depth' pages are fetched ahead of the consumer
+        self.slots = threading.Semaphore(depth)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run,
+                                       args=(service, entity_class, next_link, pager, trusted, identity_map),
+                                       daemon=True)
+        self.thread.start()
+
+    def run(self, service, entity_class, next_link, pager, trusted, identity_map):
+        while next_link is not None and self.acquire_slot():
+            try:
+                page = fetch_page(service, entity_class, next_link, pager, trusted, identity_map)
+            except Exception as e:
+                self.pages.put((None, e))
+                return
+            self.pages.put((page, None))
+            next_link = page.next_link
+
+    def acquire_slot(self):
+        while not self.stopped.is_set():
+            if self.slots.acquire(timeout=0.1):
+                return True
+        return False
+
+    def get(self):
+        page, error = self.pages.get()
+        self.slots.release()
+        if error is not None:
+            self.stop()
+            raise error
+        return page
+
+    def stop(self):
+        self.stopped.set()
+
+
 class EntityList:
     def __init__(self, entity_class, entities=None):
         if entities is None:
@@ -31,51 +105,103 @@ class EntityList:
         self.count = None
         self.callback = None
         self.step_size = None
+        self.prefetch = 0
+        self.streaming = False
+        self.pager = None
+        self.resume_key = None
+        self.trusted = False
+        self.identity_map = None
 
     def __new__(cls, *args, **kwargs):
         new_entity_list = super().__new__(cls)
         attributes = {'_entities': None, '_entity_class': '', '_next_link': '', '_service': {}, '_count': '',
                       '_iterable_entities': None, '_callback': None,
-                      '_step_size': None}
+                      '_step_size': None, '_prefetch': 0, '_prefetcher': None, '_offset': 0,
+                      'streaming': False, 'pager': None, 'resume_key': None, '_last_entity': None,
+                      'trusted': False, 'identity_map': None}
         for key, value in attributes.items():
             new_entity_list.__dict__[key] = value
         return new_entity_list
 
     def __iter__(self):
-        self.iterable_entities = iter(enumerate(self.entities))
+        self.iterable_entities = iter(enumerate(self.entities, start=self._offset))
+        self.start_prefetching()
         return self
 
+    def start_prefetching(self):
+        if self.prefetch > 0 and self.next_link is not None and self._prefetcher is None:
+            self._prefetcher = PagePrefetcher(self.service, self.entity_class, self.next_link, self.prefetch,
+                                              self.pager, self.trusted, self.identity_map)
+            weakref.finalize(self, self._prefetcher.stop)
+
     def __next__(self):
         idx, next_entity = next(self.iterable_entities, (None, None))
         # Only trigger callback when returning a real entity, not on sentinel indices
-        if next_entity is None:
+        while next_entity is None:
             # If current page is exhausted, try to load the next page
             if self.next_link is None:
                 raise StopIteration
-            try:
-                response = self.service.execute('get', self.next_link)
-            except requests.exceptions.HTTPError as e:
-                frost_sta_client.utils.handle_server_error(e, 'Query')
-            logging.debug('Received response: {} from {}'.format(response.status_code, self.next_link))
-            try:
-                json_response = response.json()
-            except ValueError:
-                raise ValueError('Cannot find json in http response')
-
-            result_list = frost_sta_client.utils.transform_json_to_entity_list(json_response, self.entity_class)
-            # Append new entities and reset iterator to iterate over the newly fetched page
-            start_index = len(self.entities)
-            self.entities += result_list.entities
-            self.set_service(self.service)
-            self.next_link = json_response.get("@iot.nextLink", None)
-            self.iterable_entities = iter(enumerate(self.entities[start_index:], start=start_index))
-            idx, next_entity = next(self.iterable_entities, (None, None))
-            if next_entity is None:
-                raise StopIteration
+            idx, next_entity = self.append_page(self.next_page())
         if self.step_size is not None and self.callback is not None and idx % self.step_size == 0:
             self.callback(idx)
+        if self.pager is not None:
+            self._last_entity = next_entity
         return next_entity
-        raise StopIteration
+
+    def next_page(self):
+        """
+        Returns the page behind next_link, either from the prefetching thread or by fetching it directly
+        """
+        if self._prefetcher is None:
+            return fetch_page(self.service, self.entity_class, self.next_link, self.pager, self.trusted,
+                              self.identity_map)
+        try:
+            return self._prefetcher.get()
+        except Exception:
+            self._prefetcher = None
+            raise
+
+    def append_page(self, page):
+        """
+        Appends the entities of a fetched page, resets the iterator to the new page and returns its first
+        (index, entity) pair, or (None, None) if the page is empty.
+        In streaming mode the new page replaces the previous one instead.
+        """
+        start_index = self._offset + len(self.entities)
+        if self.streaming:
+            self._entities = page.entities
+            self._offset = start_index
+        else:
+            self._entities.extend(page.entities)
+        self.next_link = page.next_link
+        if self.next_link is None:
+            self._prefetcher = None
+        self.iterable_entities = iter(enumerate(page.entities, start=start_index))
+        return next(self.iterable_entities, (None, None))
+
+    def iter_pages(self):
+        """
+        Yields the current page and all following pages as EntityLists. The pages are not added to this list, so
+        only the page that is currently processed is kept in memory.
+        """
+        page = self.current_page()
+        yield page
+        self.start_prefetching()
+        while self.next_link is not None:
+            if self.pager is not None and len(page.entities) > 0:
+                self._last_entity = page.entities[-1]
+            page = self.next_page()
+            self.next_link = page.next_link
+            if self.next_link is None:
+                self._prefetcher = None
+            yield page
+
+    def current_page(self):
+        page = EntityList(self.entity_class, self.entities)
+        page.next_link = self.next_link
+        page.count = self.count
+        page.service = self.service
+        return page
 
     def get(self, index):
         if not isinstance(index, int):
@@ -128,6 +254,31 @@ class EntityList:
             return
         raise ValueError('step_size should be of type int')
 
+    @property
+    def cursor(self):
+        """
+        For lists of a keyset paged query: a token to resume the iteration after the last returned entity with
+        Query.keyset(key, cursor=token). None if the list is not keyset paged or nothing has been returned yet.
+        """
+        if self.pager is None:
+            return None
+        if self._last_entity is not None:
+            return self.pager.cursor(self.pager.last_key(self._last_entity))
+        if self.resume_key is not None:
+            return self.pager.cursor(self.resume_key)
+        return None
+
+    @property
+    def prefetch(self):
+        return self._prefetch
+
+    @prefetch.setter
+    def prefetch(self, value):
+        if isinstance(value, int) and value >= 0:
+            self._prefetch = value
+            return
+        raise ValueError('prefetch should be a non-negative int')
+
     @property
     def next_link(self):
         return self._next_link
@@ -155,6 +306,10 @@ class EntityList:
         for entity in self.entities:
             entity.set_service(service)
 
+    def mark_clean(self):
+        for entity in self.entities:
+            entity.mark_clean()
+
     def __getstate__(self):
         data = []
         for entity in self.entities:
@@ -164,3 +319,62 @@ class EntityList:
     def __setstate__(self, state):
         self._next_link = state.get(self.entities + '@nextLink')
         pass
+
+
+class AsyncEntityList(EntityList):
+    """
+    An EntityList whose remaining pages are fetched asynchronously. It has to be iterated with 'async for', which
+    follows the @iot.nextLink of each page.
+    """
+
+    @classmethod
+    def from_entity_list(cls, entity_list):
+        result = cls(entity_list.entity_class, entity_list.entities)
+        result.next_link = entity_list.next_link
+        result.count = entity_list.count
+        result.service = entity_list.service
+        result.callback = entity_list.callback
+        result.step_size = entity_list.step_size
+        result.pager = entity_list.pager
+        result.resume_key = entity_list.resume_key
+        result.trusted = entity_list.trusted
+        result.identity_map = entity_list.identity_map
+        return result
+
+    async def next_page(self):
+        try:
+            response = await self.service.execute('get', self.next_link)
+        except requests.exceptions.HTTPError as e:
+            frost_sta_client.utils.handle_server_error(e, 'Query')
+        return decode_page(self.service, self.entity_class, response, self.next_link, self.pager, self.trusted,
+                           self.identity_map)
+
+    async def iter_pages(self):
+        """
+        The async counterpart of EntityList.iter_pages, to be iterated with 'async for'
+        """
+        page = self.current_page()
+        yield page
+        while self.next_link is not None:
+            if self.pager is not None and len(page.entities) > 0:
+                self._last_entity = page.entities[-1]
+            page = await self.next_page()
+            self.next_link = page.next_link
+            yield page
+
+    def __aiter__(self):
+        self.iterable_entities = iter(enumerate(self.entities, start=self._offset))
+        return self
+
+    async def __anext__(self):
+        idx, next_entity = next(self.iterable_entities, (None, None))
+        # like __next__, keep following the nextLinks of empty pages
+        while next_entity is None:
+            if self.next_link is None:
+                raise StopAsyncIteration
+            idx, next_entity = self.append_page(await self.next_page())
+        if self.step_size is not None and self.callback is not None and idx % self.step_size == 0:
+            self.callback(idx)
+        if self.pager is not None:
+            self._last_entity = next_entity
+        return next_entity
@@ -0,0 +1,78 @@
+# Copyright (C) 2021 Fraunhofer Institut IOSB, Fraunhoferstr. 1, D 76131
+# Karlsruhe, Germany.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import threading
+import weakref
+
+
+class IdentityMap:
+    """
+    Maps entity class and @iot.id to the entity decoded first, so that entities decoded again, e.g. the same
+    Datastream expanded in every Observation of a list, resolve to one shared instance instead of a copy each. The
+    shared instance is updated with the properties and relations of every later decode of the same entity. From the
+    second decode on, the json an entity was last decoded from is kept as well, so that a decode repeating it leaves
+    the entity untouched and a changed one only applies the keys that differ. Local changes to a shared entity are
+    then only overwritten by keys the server changed.
+    The entities are referenced weakly, an entity is dropped from the map once nothing else references it.
+    """
+
+    def __init__(self):
+        self.entities = weakref.WeakValueDictionary()
+        self.states = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entities)
+
+    def get(self, entity_class, state):
+        """
+        Returns the known entity of the given class with the @iot.id of state, or None
+        """
+        if not isinstance(state, dict) or state.get('@iot.id', None) is None:
+            return None
+        return self.entities.get((entity_class, state['@iot.id']), None)
+
+    def add(self, entity):
+        """
+        Adds an entity and returns the instance to use for it, which is an already known one with the same id if
+        another thread added it in between
+        """
+        if entity.id is None:
+            return entity
+        with self.lock:
+            return self.entities.setdefault((type(entity), entity.id), entity)
+
+    def get_state(self, entity):
+        """
+        Returns the json the known entity was last decoded from, or None if it was not decoded again since it was
+        added
+        """
+        return self.states.get((type(entity), entity.id), None)
+
+    def set_state(self, entity, state):
+        """
+        Remembers the json the known entity was last decoded from, until the entity is dropped
+        """
+        key = (type(entity), entity.id)
+        if self.states.setdefault(key, state) is not state:
+            self.states[key] = state
+        else:
+            weakref.finalize(entity, self.states.pop, key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entities.clear()
+            self.states.clear()
@@ -0,0 +1,68 @@
+# Copyright (C) 2021 Fraunhofer Institut IOSB, Fraunhoferstr. 1, D 76131
+# Karlsruhe, Germany.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import frost_sta_client
+
+
+class LazyRelation:
+    """
+    The raw json of an expanded navigation property (e.g. the Observations of a Datastream). It is only decoded
+    into entities when the property is accessed for the first time.
+    """
+
+    def __init__(self, state, relation, entity_type_name, many=False, trusted=False):
+        self.state = state
+        self.relation = relation
+        self.entity_type_name = entity_type_name
+        self.many = many
+        self.trusted = trusted
+        self.service = None
+        self.identity_map = None
+
+    @classmethod
+    def from_state(cls, state, relation, entity_type_name, many=False, trusted=False):
+        """
+        Keeps the part of an entity's json that belongs to the given relation, including its nextLink and count.
+        Returns None if the relation is not expanded.
+        """
+        value = state.get(relation, None)
+        if value is None or (many and not isinstance(value, list)):
+            return None
+        relation_state = {relation: value}
+        if many:
+            for annotation in ('@iot.nextLink', '@iot.count'):
+                if relation + annotation in state:
+                    relation_state[relation + annotation] = state[relation + annotation]
+        return cls(relation_state, relation, entity_type_name, many, trusted)
+
+    def set_service(self, service):
+        self.service = service
+
+    def set_identity_map(self, identity_map):
+        self.identity_map = identity_map
+
+    def materialize(self):
+        if self.many:
+            value = frost_sta_client.utils.transform_json_to_related_entity_list(self.state, self.relation,
+                                                                              self.entity_type_name, self.trusted,
+                                                                              self.identity_map)
+        else:
+            value = frost_sta_client.utils.transform_json_to_related_entity(self.state, self.relation,
+                                                                         self.entity_type_name, self.trusted,
+                                                                         self.identity_map)
+        if self.service is not None:
+            value.set_service(self.service)
+        return value
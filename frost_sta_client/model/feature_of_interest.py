@@ -22,10 +22,11 @@ from .ext import entity_list, entity_type
 
 import json
 
-from .. import utils
 
 
 class FeatureOfInterest(entity.Entity):
+    __slots__ = ('_name', '_description', '_properties', '_encoding_type', '_feature', '_observations')
+
     def __init__(self,
                  name='',
                  description='',
@@ -49,7 +50,7 @@ class FeatureOfInterest(entity.Entity):
         attributes = {'_id': None, '_name': '', '_description': '', '_properties': {}, '_encoding_type': '',
                       '_feature': '', '_observations': None, '_self_link': '', '_service': None}
         for key, value in attributes.items():
-            new_foi.__dict__[key] = value
+            setattr(new_foi, key, value)
         return new_foi
 
     @property
@@ -106,7 +107,7 @@ class FeatureOfInterest(entity.Entity):
 
     @property
     def observations(self):
-        return self._observations
+        return self.materialize_relation('_observations')
 
     @observations.setter
     def observations(self, values):
@@ -145,8 +146,8 @@ class FeatureOfInterest(entity.Entity):
         return result
 
     def ensure_service_on_children(self, service):
-        if self.observations is not None:
-            self.observations.set_service(service)
+        if self._observations is not None:
+            self._observations.set_service(service)
 
     def __eq__(self, other):
         if not super().__eq__(other):
@@ -189,11 +190,16 @@ class FeatureOfInterest(entity.Entity):
         self.properties = state.get("properties", {})
         self.encoding_type = state.get("encodingType", None)
         self.feature = state.get("feature", None)
-        if state.get("Observations", None) is not None and isinstance(state["Observations"], list):
-            entity_class = entity_type.EntityTypes['Observation']['class']
-            self.observations = utils.transform_json_to_entity_list(state['Observations'], entity_class)
-            self.observations.next_link = state.get("Observations@iot.nextLink", None)
-            self.observations.count = state.get("Observations@iot.count", None)
+        self.set_lazy_relation('_observations', state, 'Observations', 'Observation', many=True)
+
+    def set_trusted_state(self, state):
+        self.set_trusted_base_state(state)
+        self._name = state.get("name", None)
+        self._description = state.get("description", None)
+        self._properties = state.get("properties", {})
+        self._encoding_type = state.get("encodingType", None)
+        self._feature = state.get("feature", None)
+        self.set_lazy_relation('_observations', state, 'Observations', 'Observation', many=True, trusted=True)
 
     def get_dao(self, service):
         return frost_sta_client.dao.features_of_interest.FeaturesOfInterestDao(service)
@@ -27,6 +27,7 @@ from .ext import entity_type
 
 
 class HistoricalLocation(entity.Entity):
+    __slots__ = ('_locations', '_time', '_thing')
 
     def __init__(self,
                  locations=None,
@@ -40,10 +41,10 @@ class HistoricalLocation(entity.Entity):
 
     def __new__(cls, *args, **kwargs):
         new_h_loc = super().__new__(cls)
-        attributes = {'_id': None, '_location': None, '_time': None, '_thing': None, '_self_link': None,
+        attributes = {'_id': None, '_locations': None, '_time': None, '_thing': None, '_self_link': None,
                       '_service': None}
         for key, value in attributes.items():
-            new_h_loc.__dict__[key] = value
+            setattr(new_h_loc, key, value)
         return new_h_loc
 
     @property
@@ -56,7 +57,7 @@ class HistoricalLocation(entity.Entity):
 
     @property
     def locations(self):
-        return self._locations
+        return self.materialize_relation('_locations')
 
     @locations.setter
     def locations(self, values):
@@ -75,7 +76,7 @@ class HistoricalLocation(entity.Entity):
 
     @property
     def thing(self):
-        return self._thing
+        return self.materialize_relation('_thing')
 
     @thing.setter
     def thing(self, value):
@@ -85,10 +86,10 @@ class HistoricalLocation(entity.Entity):
         raise ValueError('thing should be of type Thing!')
 
     def ensure_service_on_children(self, service):
-        if self.locations is not None:
-            self.locations.set_service(service)
-        if self.thing is not None:
-            self.thing.set_service(service)
+        if self._locations is not None:
+            self._locations.set_service(service)
+        if self._thing is not None:
+            self._thing.set_service(service)
 
     def __eq__(self, other):
         if not super().__eq__(other):
@@ -113,14 +114,8 @@ class HistoricalLocation(entity.Entity):
     def __setstate__(self, state):
         super().__setstate__(state)
         self.time = state.get("time", None)
-        if state.get("Thing", None) is not None:
-            self.thing = frost_sta_client.model.thing.Thing()
-            self.thing.__setstate__(state["Thing"])
-        if state.get("Locations", None) is not None and isinstance(state["Locations"], list):
-            entity_class = entity_type.EntityTypes['Location']['class']
-            self.locations = utils.transform_json_to_entity_list(state['Locations'], entity_class)
-            self.locations.next_link = state.get("Locations@iot.nextLink", None)
-            self.locations.count = state.get("Locations@iot.count", None)
+        self.set_lazy_relation('_thing', state, 'Thing', 'Thing')
+        self.set_lazy_relation('_locations', state, 'Locations', 'Location', many=True)
 
 
     def get_dao(self, service):
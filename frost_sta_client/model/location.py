@@ -23,14 +23,14 @@ from . import historical_location
 
 import inspect
 import json
-import geojson
 
-from frost_sta_client import utils
 from .ext import entity_type
 from .ext import entity_list
 
 
 class Location(entity.Entity):
+    __slots__ = ('_name', '_description', '_properties', '_encoding_type', '_location', '_things',
+                 '_historical_locations')
 
     def __init__(self,
                  name='',
@@ -54,11 +54,11 @@ class Location(entity.Entity):
 
     def __new__(cls, *args, **kwargs):
         new_loc = super().__new__(cls)
-        attributes = {'_id': None, '_name': '', '_description': '', '_properties': {}, '_encodingType': '',
+        attributes = {'_id': None, '_name': '', '_description': '', '_properties': {}, '_encoding_type': '',
                       '_location': None, '_things': None, '_historical_locations': None, '_self_link': '',
                       '_service': None}
         for key, value in attributes.items():
-            new_loc.__dict__[key] = value
+            setattr(new_loc, key, value)
         return new_loc
 
     @property
@@ -122,6 +122,7 @@ class Location(entity.Entity):
         if value is None:
             self._location = None
             return
+        import geojson
         geo_classes = [obj for _, obj in inspect.getmembers(geojson) if inspect.isclass(obj) and
                        obj.__module__ == 'geojson.geometry']
         if type(value) in geo_classes:
@@ -136,7 +137,7 @@ class Location(entity.Entity):
 
     @property
     def things(self):
-        return self._things
+        return self.materialize_relation('_things')
 
     @things.setter
     def things(self, values):
@@ -154,7 +155,7 @@ class Location(entity.Entity):
 
     @property
     def historical_locations(self):
-        return self._historical_locations
+        return self.materialize_relation('_historical_locations')
 
     @historical_locations.setter
     def historical_locations(self, values):
@@ -182,10 +183,10 @@ class Location(entity.Entity):
         return result
 
     def ensure_service_on_children(self, service):
-        if self.things is not None:
-            self.things.set_service(service)
-        if self.historical_locations is not None:
-            self.historical_locations.set_service(service)
+        if self._things is not None:
+            self._things.set_service(service)
+        if self._historical_locations is not None:
+            self._historical_locations.set_service(service)
 
     def __eq__(self, other):
         if not super().__eq__(other):
@@ -229,18 +230,21 @@ class Location(entity.Entity):
         self.description = state.get("description", None)
         self.encoding_type = state.get("encodingType", None)
         self.properties = state.get("properties", {})
-        if state.get("Things", None) is not None:
-            entity_class = entity_type.EntityTypes['Thing']['class']
-            self.things = utils.transform_json_to_entity_list(state['Things'], entity_class)
-            self.things.next_link = state.get('Things@iot.nextLink', None)
-            self.things.count = state.get('Things@iot.count', None)
+        self.set_lazy_relation('_things', state, 'Things', 'Thing', many=True)
         if state.get("location", None) is not None:
             self.location = state["location"]
-        if state.get("HistoricalLocations", None) is not None:
-            entity_class = entity_type.EntityTypes['HistoricalLocation']['class']
-            self.historical_locations = utils.transform_json_to_entity_list(state['HistoricalLocations'], entity_class)
-            self.historical_locations.next_link = state.get('HistoricalLocations@iot.nextLink', None)
-            self.historical_locations.count = state.get('HistoricalLocations@iot.count', None)
+        self.set_lazy_relation('_historical_locations', state, 'HistoricalLocations', 'HistoricalLocation', many=True)
+
+    def set_trusted_state(self, state):
+        self.set_trusted_base_state(state)
+        self._name = state.get("name", None)
+        self._description = state.get("description", None)
+        self._encoding_type = state.get("encodingType", None)
+        self._properties = state.get("properties", {})
+        self._location = state.get("location", None)
+        self.set_lazy_relation('_things', state, 'Things', 'Thing', many=True, trusted=True)
+        self.set_lazy_relation('_historical_locations', state, 'HistoricalLocations', 'HistoricalLocation',
+                               many=True, trusted=True)
 
     def get_dao(self, service):
         return LocationDao(service)
@@ -28,10 +28,12 @@ from frost_sta_client import utils
 from .ext import entity_list
 from .ext import entity_type
 
-import geojson.geometry
-
 
 class MultiDatastream(entity.Entity):
+    __slots__ = ('_name', '_description', '_properties', '_observation_type', '_multi_observation_data_types',
+                 '_unit_of_measurements', '_observed_area', '_phenomenon_time', '_result_time', '_thing', '_sensor',
+                 '_observed_properties', '_observations')
+
     def __init__(self,
                  name='',
                  description='',
@@ -73,7 +75,7 @@ class MultiDatastream(entity.Entity):
                           _thing=None, _sensor=None, _observed_properties=None, _observations=None, _self_link='',
                           _service=None)
         for key, value in attributes.items():
-            new_mds.__dict__[key] = value
+            setattr(new_mds, key, value)
         return new_mds
 
     @property
@@ -155,6 +157,7 @@ class MultiDatastream(entity.Entity):
         if value is None:
             self._observed_area = None
             return
+        import geojson.geometry
         if not isinstance(value, geojson.geometry.Polygon):
             raise ValueError('observedArea should be geojson object')
         self._observed_area = value
@@ -177,7 +180,7 @@ class MultiDatastream(entity.Entity):
 
     @property
     def thing(self):
-        return self._thing
+        return self.materialize_relation('_thing')
 
     @thing.setter
     def thing(self, value):
@@ -187,7 +190,7 @@ class MultiDatastream(entity.Entity):
 
     @property
     def sensor(self):
-        return self._sensor
+        return self.materialize_relation('_sensor')
 
     @sensor.setter
     def sensor(self, value):
@@ -197,7 +200,7 @@ class MultiDatastream(entity.Entity):
 
     @property
     def observed_properties(self):
-        return self._observed_properties
+        return self.materialize_relation('_observed_properties')
 
     @observed_properties.setter
     def observed_properties(self, values):
@@ -215,7 +218,7 @@ class MultiDatastream(entity.Entity):
 
     @property
     def observations(self):
-        return self._observations
+        return self.materialize_relation('_observations')
 
     @observations.setter
     def observations(self, values):
@@ -242,14 +245,14 @@ class MultiDatastream(entity.Entity):
         return result
 
     def ensure_service_on_children(self, service):
-        if self.thing is not None:
-            self.thing.set_service(service)
-        if self.sensor is not None:
-            self.sensor.set_service(service)
-        if self.observations is not None:
-            self.observations.set_service(service)
-        if self.observed_properties is not None:
-            self.observed_properties.set_service(service)
+        if self._thing is not None:
+            self._thing.set_service(service)
+        if self._sensor is not None:
+            self._sensor.set_service(service)
+        if self._observations is not None:
+            self._observations.set_service(service)
+        if self._observed_properties is not None:
+            self._observed_properties.set_service(service)
 
     def __eq__(self, other):
         if not super().__eq__(other):
@@ -315,12 +318,8 @@ class MultiDatastream(entity.Entity):
         self.phenomenon_time = state.get('phenomenonTime', None)
         self.result_time = state.get('resultTime', None)
         self.properties = state.get('properties', None)
-        if state.get('Thing', None) is not None:
-            self.thing = frost_sta_client.model.thing.Thing()
-            self.thing.__setstate__(state['Thing'])
-        if state.get('Sensor', None) is not None:
-            self.sensor = frost_sta_client.model.sensor.Sensor()
-            self.sensor.__setstate__(state['Sensor'])
+        self.set_lazy_relation('_thing', state, 'Thing', 'Thing')
+        self.set_lazy_relation('_sensor', state, 'Sensor', 'Sensor')
         if state.get('unitOfMeasurements', None) is not None \
                 and isinstance(state['unitOfMeasurements'], list):
             self.unit_of_measurements = []
@@ -331,16 +330,28 @@ class MultiDatastream(entity.Entity):
             self.multi_observation_data_types = []
             for value in state['multiObservationDataTypes']:
                 self.multi_observation_data_types.append(value)
-        if state.get('ObservedProperties', None) is not None and isinstance(state['ObservedProperties'], list):
-            entity_class = entity_type.EntityTypes['ObservedProperty']['class']
-            self.observed_properties = utils.transform_json_to_entity_list(state['ObservedProperties'], entity_class)
-            self.observed_properties.next_link = state.get('ObservedProperties@iot.nextLink')
-            self.observed_properties.count = state.get('ObservedProperties@iot.count')
-        if state.get('Observations', None) is not None and isinstance(state['Observations'], list):
-            entity_class = entity_type.EntityTypes['Observation']['class']
-            self.observations = utils.transform_json_to_entity_list(state['Observations'], entity_class)
-            self.observations.next_link = state.get('Observations@iot.nextLink')
-            self.observations.count = state.get('Observations@iot.count')
+        self.set_lazy_relation('_observed_properties', state, 'ObservedProperties', 'ObservedProperty', many=True)
+        self.set_lazy_relation('_observations', state, 'Observations', 'Observation', many=True)
+
+    def set_trusted_state(self, state):
+        self.set_trusted_base_state(state)
+        self._name = state.get('name', None)
+        self._description = state.get('description', None)
+        self._observation_type = state.get('observationType', None)
+        if state.get('observedArea', None) is not None:
+            self._observed_area = utils.process_area(state['observedArea'])
+        self._phenomenon_time = state.get('phenomenonTime', None)
+        self._result_time = state.get('resultTime', None)
+        self._properties = state.get('properties', None)
+        self.set_lazy_relation('_thing', state, 'Thing', 'Thing', trusted=True)
+        self.set_lazy_relation('_sensor', state, 'Sensor', 'Sensor', trusted=True)
+        if isinstance(state.get('unitOfMeasurements', None), list):
+            self._unit_of_measurements = list(state['unitOfMeasurements'])
+        if isinstance(state.get('multiObservationDataTypes', None), list):
+            self._multi_observation_data_types = list(state['multiObservationDataTypes'])
+        self.set_lazy_relation('_observed_properties', state, 'ObservedProperties', 'ObservedProperty',
+                               many=True, trusted=True)
+        self.set_lazy_relation('_observations', state, 'Observations', 'Observation', many=True, trusted=True)
 
     def get_dao(self, service):
         return MultiDatastreamDao(service)
@@ -29,6 +29,8 @@ from frost_sta_client import utils
 
 
 class Observation(entity.Entity):
+    __slots__ = ('_phenomenon_time', '_result', '_result_time', '_result_quality', '_valid_time', '_parameters',
+                 '_datastream', '_multi_datastream', '_feature_of_interest')
 
     def __init__(self,
                  phenomenon_time=None,
@@ -60,7 +62,7 @@ class Observation(entity.Entity):
                       '_result_quality': None, '_valid_time': None, '_parameters': {}, '_datastream': None,
                       '_multi_datastream': None, '_feature_of_interest': None, '_self_link': '', '_service': None}
         for key, value in attributes.items():
-            new_observation.__dict__[key] = value
+            setattr(new_observation, key, value)
         return new_observation
 
     @property
@@ -139,7 +141,7 @@ class Observation(entity.Entity):
 
     @property
     def feature_of_interest(self):
-        return self._feature_of_interest
+        return self.materialize_relation('_feature_of_interest')
 
     @feature_of_interest.setter
     def feature_of_interest(self, value):
@@ -152,7 +154,7 @@ class Observation(entity.Entity):
 
     @property
     def datastream(self):
-        return self._datastream
+        return self.materialize_relation('_datastream')
 
     @datastream.setter
     def datastream(self, value):
@@ -165,7 +167,7 @@ class Observation(entity.Entity):
 
     @property
     def multi_datastream(self):
-        return self._multi_datastream
+        return self.materialize_relation('_multi_datastream')
 
     @multi_datastream.setter
     def multi_datastream(self, value):
@@ -178,12 +180,12 @@ class Observation(entity.Entity):
         raise ValueError('multi_datastream should be of type MultiDatastream!')
 
     def ensure_service_on_children(self, service):
-        if self.datastream is not None:
-            self.datastream.set_service(service)
-        if self.multi_datastream is not None:
-            self.multi_datastream.set_service(service)
-        if self.feature_of_interest is not None:
-            self.feature_of_interest.set_service(service)
+        if self._datastream is not None:
+            self._datastream.set_service(service)
+        if self._multi_datastream is not None:
+            self._multi_datastream.set_service(service)
+        if self._feature_of_interest is not None:
+            self._feature_of_interest.set_service(service)
 
     def __eq__(self, other):
         if not super().__eq__(other):
@@ -235,15 +237,21 @@ class Observation(entity.Entity):
         self.phenomenon_time = state.get("phenomenonTime", None)
         self.result_time = state.get("resultTime", None)
         self.valid_time = state.get("validTime", None)
-        if state.get('Datastream', None) is not None:
-            self.datastream = frost_sta_client.model.datastream.Datastream()
-            self.datastream.__setstate__(state['Datastream'])
-        if state.get('MultiDatastream', None) is not None:
-            self.multi_datastream = frost_sta_client.model.multi_datastream.MultiDatastream()
-            self.multi_datastream.__setstate__(state['MultiDatastream'])
-        if state.get("FeatureOfInterest", None) is not None:
-            self.feature_of_interest = frost_sta_client.model.feature_of_interest.FeatureOfInterest()
-            self.feature_of_interest.__setstate__(state['FeatureOfInterest'])
+        self.set_lazy_relation('_datastream', state, 'Datastream', 'Datastream')
+        self.set_lazy_relation('_multi_datastream', state, 'MultiDatastream', 'MultiDatastream')
+        self.set_lazy_relation('_feature_of_interest', state, 'FeatureOfInterest', 'FeatureOfInterest')
+
+    def set_trusted_state(self, state):
+        self.set_trusted_base_state(state)
+        self._parameters = state.get("parameters", {})
+        self._result = state.get("result", None)
+        self._result_quality = state.get("resultQuality", None)
+        self._phenomenon_time = state.get("phenomenonTime", None)
+        self._result_time = state.get("resultTime", None)
+        self._valid_time = state.get("validTime", None)
+        self.set_lazy_relation('_datastream', state, 'Datastream', 'Datastream', trusted=True)
+        self.set_lazy_relation('_multi_datastream', state, 'MultiDatastream', 'MultiDatastream', trusted=True)
+        self.set_lazy_relation('_feature_of_interest', state, 'FeatureOfInterest', 'FeatureOfInterest', trusted=True)
 
     def get_dao(self, service):
         return ObservationDao(service)
@@ -20,12 +20,12 @@ from . import entity
 from . import datastream
 from . import multi_datastream
 
-from frost_sta_client import utils
 from .ext import entity_type
 from .ext import entity_list
 
 
 class ObservedProperty(entity.Entity):
+    __slots__ = ('_name', '_definition', '_description', '_datastreams', '_multi_datastreams', '_properties')
 
     def __init__(self,
                  name='',
@@ -50,7 +50,7 @@ class ObservedProperty(entity.Entity):
         attributes = {'_id': None, '_name': '', '_definition': '', '_description': '',
                       '_datastreams': None, '_multi_datastreams': None, '_self_link': None, '_service': None}
         for key, value in attributes.items():
-            new_observed_property.__dict__[key] = value
+            setattr(new_observed_property, key, value)
         return new_observed_property
 
     @property
@@ -107,7 +107,7 @@ class ObservedProperty(entity.Entity):
 
     @property
     def datastreams(self):
-        return self._datastreams
+        return self.materialize_relation('_datastreams')
 
     @datastreams.setter
     def datastreams(self, value):
@@ -125,7 +125,7 @@ class ObservedProperty(entity.Entity):
 
     @property
     def multi_datastreams(self):
-        return self._multi_datastreams
+        return self.materialize_relation('_multi_datastreams')
 
     @multi_datastreams.setter
     def multi_datastreams(self, values):
@@ -152,10 +152,10 @@ class ObservedProperty(entity.Entity):
         return result
 
     def ensure_service_on_children(self, service):
-        if self.datastreams is not None:
-            self.datastreams.set_service(service)
-        if self.multi_datastreams is not None:
-            self.multi_datastreams.set_service(service)
+        if self._datastreams is not None:
+            self._datastreams.set_service(service)
+        if self._multi_datastreams is not None:
+            self._multi_datastreams.set_service(service)
 
     def __eq__(self, other):
         if not super().__eq__(other):
@@ -195,16 +195,8 @@ class ObservedProperty(entity.Entity):
         self.description = state.get("description", None)
         self.definition = state.get("definition", None)
         self.properties = state.get("properties", {})
-        if state.get("Datastreams", None) is not None and isinstance(state["Datastreams"], list):
-            entity_class = entity_type.EntityTypes['Datastream']['class']
-            self.datastreams = utils.transform_json_to_entity_list(state['Datastreams'], entity_class)
-            self.datastreams.next_link = state.get('Datastreams@iot.nextLink', None)
-            self.datastreams.count = state.get('Datastreams@iot.count', None)
-        if state.get("MultiDatastreams", None) is not None and isinstance(state["MultiDatastreams"], list):
-            entity_class = entity_type.EntityTypes['MultiDatastream']['class']
-            self.multi_datastreams = utils.transform_json_to_entity_list(state['MultiDatastreams'], entity_class)
-            self.multi_datastreams.next_link = state.get('MultiDatastreams@iot.nextLink', None)
-            self.multi_datastreams.count = state.get('MultiDatastreams@iot.count', None)
+        self.set_lazy_relation('_datastreams', state, 'Datastreams', 'Datastream', many=True)
+        self.set_lazy_relation('_multi_datastreams', state, 'MultiDatastreams', 'MultiDatastream', many=True)
 
     def get_dao(self, service):
         return ObservedPropertyDao(service)
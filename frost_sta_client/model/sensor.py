@@ -21,12 +21,13 @@ from . import entity
 from . import datastream
 from . import multi_datastream
 
-from frost_sta_client import utils
 from .ext import entity_type
 from .ext import entity_list
 
 
 class Sensor(entity.Entity):
+    __slots__ = ('_name', '_description', '_properties', '_encoding_type', '_metadata', '_datastreams',
+                 '_multi_datastreams')
 
     def __init__(self,
                  name='',
@@ -54,7 +55,7 @@ class Sensor(entity.Entity):
                       '_metadata': '', '_datastreams': None, '_multi_datastreams': None, '_self_link': '',
                       '_service': None}
         for key, value in attributes.items():
-            new_sensor.__dict__[key] = value
+            setattr(new_sensor, key, value)
         return new_sensor
 
     @property
@@ -114,7 +115,7 @@ class Sensor(entity.Entity):
 
     @property
     def datastreams(self):
-        return self._datastreams
+        return self.materialize_relation('_datastreams')
 
     @datastreams.setter
     def datastreams(self, values):
@@ -132,7 +133,7 @@ class Sensor(entity.Entity):
 
     @property
     def multi_datastreams(self):
-        return self._multi_datastreams
+        return self.materialize_relation('_multi_datastreams')
 
     @multi_datastreams.setter
     def multi_datastreams(self, values):
@@ -159,10 +160,10 @@ class Sensor(entity.Entity):
         return result
 
     def ensure_service_on_children(self, service):
-        if self.datastreams is not None:
-            self.datastreams.set_service(service)
-        if self.multi_datastreams is not None:
-            self.multi_datastreams.set_service(service)
+        if self._datastreams is not None:
+            self._datastreams.set_service(service)
+        if self._multi_datastreams is not None:
+            self._multi_datastreams.set_service(service)
 
     def __eq__(self, other):
         if not super().__eq__(other):
@@ -207,16 +208,8 @@ class Sensor(entity.Entity):
         self.encoding_type = state.get('encodingType', '')
         self.metadata = state.get('metadata', '')
         self.properties = state.get('properties', {})
-        if state.get('Datastreams', None) is not None:
-            entity_class = entity_type.EntityTypes['Datastream']['class']
-            self.datastreams = utils.transform_json_to_entity_list(state['Datastreams'], entity_class)
-            self.datastreams.next_link = state.get('Datastreams@iot.nextLink', None)
-            self.datastreams.count = state.get('Datastreams@iot.count', None)
-        if state.get('MultiDatastreams', None) is not None:
-            entity_class = entity_type.EntityTypes['MultiDatastream']['class']
-            self.multi_datastreams = utils.transform_json_to_entity_list(state['MultiDatastreams'], entity_class)
-            self.multi_datastreams.next_link = state.get('MultiDatastreams@iot.nextLink', None)
-            self.multi_datastreams.count = state.get('MultiDatastreams@iot.count', None)
+        self.set_lazy_relation('_datastreams', state, 'Datastreams', 'Datastream', many=True)
+        self.set_lazy_relation('_multi_datastreams', state, 'MultiDatastreams', 'MultiDatastream', many=True)
 
     def get_dao(self, service):
         return SensorDao(service)
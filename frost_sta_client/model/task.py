@@ -24,6 +24,8 @@ from frost_sta_client import utils
 
 
 class Task(entity.Entity):
+    __slots__ = ('_tasking_parameters', '_creation_time', '_tasking_capability')
+
     def __init__(self,
                  tasking_parameters=None,
                  creation_time=None,
@@ -41,7 +43,7 @@ class Task(entity.Entity):
         attributes = {'_id': None, '_tasking_parameters': {}, '_creation_time': None, '_tasking_capability': None,
                       '_self_link': '', '_service': None}
         for key, value in attributes.items():
-            new_task.__dict__[key] = value
+            setattr(new_task, key, value)
         return new_task
 
     @property
@@ -64,7 +66,7 @@ class Task(entity.Entity):
 
     @property
     def tasking_capability(self):
-        return self._tasking_capability
+        return self.materialize_relation('_tasking_capability')
 
     @tasking_capability.setter
     def tasking_capability(self, value):
@@ -76,8 +78,8 @@ class Task(entity.Entity):
         self._tasking_capability = value
 
     def ensure_service_on_children(self, service):
-        if self.tasking_capability is not None:
-            self.tasking_capability.set_service(service)
+        if self._tasking_capability is not None:
+            self._tasking_capability.set_service(service)
 
     def __eq__(self, other):
         if not super().__eq__(other):
@@ -105,9 +107,7 @@ class Task(entity.Entity):
         super().__setstate__(state)
         self.tasking_parameters = state.get('taskingParameters', {})
         self.creation_time = state.get('creationTime', None)
-        if state.get('TaskingCapability', None) is not None:
-            self.tasking_capability = frost_sta_client.model.tasking_capability.TaskingCapability()
-            self.tasking_capability.__setstate__(state['TaskingCapability'])
+        self.set_lazy_relation('_tasking_capability', state, 'TaskingCapability', 'TaskingCapability')
 
     def get_dao(self, service):
         return TaskDao(service)
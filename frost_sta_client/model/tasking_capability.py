@@ -19,7 +19,6 @@ from . import entity
 from . import thing
 from . import actuator
 
-from frost_sta_client import utils
 from .ext import entity_type
 from .ext import entity_list
 
@@ -27,6 +26,7 @@ from frost_sta_client.dao.tasking_capability import TaskingCapabilityDao
 
 
 class TaskingCapability(entity.Entity):
+    __slots__ = ('_name', '_description', '_properties', '_tasking_parameters', '_tasks', '_thing', '_actuator')
 
     def __init__(self,
                  name='',
@@ -55,7 +55,7 @@ class TaskingCapability(entity.Entity):
         attributes = {'_id': None, '_name': '', '_description': '', '_properties': {}, '_tasking_parameters': {},
                       '_tasks': None, '_thing': None, '_actuator': None, '_self_link': '', '_service': None}
         for key, value in attributes.items():
-            new_tc.__dict__[key] = value
+            setattr(new_tc, key, value)
         return new_tc
 
     @property
@@ -103,7 +103,7 @@ class TaskingCapability(entity.Entity):
 
     @property
     def tasks(self):
-        return self._tasks
+        return self.materialize_relation('_tasks')
 
     @tasks.setter
     def tasks(self, value):
@@ -122,7 +122,7 @@ class TaskingCapability(entity.Entity):
 
     @property
     def thing(self):
-        return self._thing
+        return self.materialize_relation('_thing')
 
     @thing.setter
     def thing(self, value):
@@ -135,7 +135,7 @@ class TaskingCapability(entity.Entity):
 
     @property
     def actuator(self):
-        return self._actuator
+        return self.materialize_relation('_actuator')
 
     @actuator.setter
     def actuator(self, value):
@@ -152,12 +152,12 @@ class TaskingCapability(entity.Entity):
         return result
 
     def ensure_service_on_children(self, service):
-        if self.actuator is not None:
-            self.actuator.set_service(service)
-        if self.thing is not None:
-            self.thing.set_service(service)
-        if self.tasks is not None:
-            self.thing.set_service(service)
+        if self._actuator is not None:
+            self._actuator.set_service(service)
+        if self._thing is not None:
+            self._thing.set_service(service)
+        if self._tasks is not None:
+            self._tasks.set_service(service)
 
     def __eq__(self, other):
         if not super().__eq__(other):
@@ -199,17 +199,9 @@ class TaskingCapability(entity.Entity):
         self.description = state.get('description', '')
         self.tasking_parameters = state.get('taskingParameters', {})
         self.properties = state.get('properties', {})
-        if state.get('Tasks', None) is not None:
-            entity_class = entity_type.EntityTypes['Task']['class']
-            self.tasks = utils.transform_json_to_entity_list(state['Tasks'], entity_class)
-            self.tasks.next_link = state.get('Tasks@iot.nextLink', None)
-            self.tasks.count = state.get('Tasks@iot.count', None)
-        if state.get('Actuator', None) is not None:
-            self.actuator = frost_sta_client.model.actuator.Actuator()
-            self.actuator.__setstate__(state['Actuator'])
-        if state.get('Thing', None) is not None:
-            self.thing = frost_sta_client.model.thing.Thing()
-            self.thing.__setstate__(state['Thing'])
+        self.set_lazy_relation('_tasks', state, 'Tasks', 'Task', many=True)
+        self.set_lazy_relation('_actuator', state, 'Actuator', 'Actuator')
+        self.set_lazy_relation('_thing', state, 'Thing', 'Thing')
 
     def get_dao(self, service):
         return TaskingCapabilityDao(service)
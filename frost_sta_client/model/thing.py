@@ -22,12 +22,13 @@ from . import historical_location
 from . import tasking_capability
 
 from frost_sta_client.dao.thing import ThingDao
-from frost_sta_client import utils
 from .ext import entity_list
 from .ext import entity_type
 
 
 class Thing(entity.Entity):
+    __slots__ = ('_name', '_description', '_properties', '_locations', '_historical_locations', '_datastreams',
+                 '_multi_datastreams', '_tasking_capabilities')
 
     def __init__(self,
                  name='',
@@ -57,7 +58,7 @@ class Thing(entity.Entity):
                       '_historical_locations': None, '_datastreams': None, '_multi_datastreams': None,
                       '_tasking_capabilities': None, '_self_link': '', '_service': None}
         for key, value in attributes.items():
-            new_thing.__dict__[key] = value
+            setattr(new_thing, key, value)
         return new_thing
 
     @property
@@ -101,7 +102,7 @@ class Thing(entity.Entity):
 
     @property
     def locations(self):
-        return self._locations
+        return self.materialize_relation('_locations')
 
     @locations.setter
     def locations(self, values):
@@ -119,7 +120,7 @@ class Thing(entity.Entity):
 
     @property
     def historical_locations(self):
-        return self._historical_locations
+        return self.materialize_relation('_historical_locations')
 
     @historical_locations.setter
     def historical_locations(self, values):
@@ -137,7 +138,7 @@ class Thing(entity.Entity):
 
     @property
     def datastreams(self):
-        return self._datastreams
+        return self.materialize_relation('_datastreams')
 
     @datastreams.setter
     def datastreams(self, values):
@@ -155,7 +156,7 @@ class Thing(entity.Entity):
 
     @property
     def multi_datastreams(self):
-        return self._multi_datastreams
+        return self.materialize_relation('_multi_datastreams')
 
     @multi_datastreams.setter
     def multi_datastreams(self, values):
@@ -173,7 +174,7 @@ class Thing(entity.Entity):
 
     @property
     def tasking_capabilities(self):
-        return self._tasking_capabilities
+        return self.materialize_relation('_tasking_capabilities')
 
     @tasking_capabilities.setter
     def tasking_capabilities(self, values):
@@ -215,14 +216,14 @@ class Thing(entity.Entity):
         return result
 
     def ensure_service_on_children(self, service):
-        if self.locations is not None:
-            self.locations.set_service(service)
-        if self.datastreams is not None:
-            self.datastreams.set_service(service)
-        if self.multi_datastreams is not None:
-            self.multi_datastreams.set_service(service)
-        if self.tasking_capabilities is not None:
-            self.tasking_capabilities.set_service(service)
+        if self._locations is not None:
+            self._locations.set_service(service)
+        if self._datastreams is not None:
+            self._datastreams.set_service(service)
+        if self._multi_datastreams is not None:
+            self._multi_datastreams.set_service(service)
+        if self._tasking_capabilities is not None:
+            self._tasking_capabilities.set_service(service)
 
     def __eq__(self, other):
         if not super().__eq__(other):
@@ -264,31 +265,25 @@ class Thing(entity.Entity):
         self.description = state.get("description", None)
         self.properties = state.get("properties", {})
 
-        if state.get("Locations", None) is not None and isinstance(state["Locations"], list):
-            entity_class = entity_type.EntityTypes['Location']['class']
-            self.locations = utils.transform_json_to_entity_list(state['Locations'], entity_class)
-            self.locations.next_link = state.get("Locations@iot.nextLink", None)
-            self.locations.count = state.get("Locations@iot.count", None)
-        if state.get("HistoricalLocations", None) is not None and isinstance(state["HistoricalLocations"], list):
-            entity_class = entity_type.EntityTypes['HistoricalLocation']['class']
-            self.historical_locations = utils.transform_json_to_entity_list(state['HistoricalLocations'], entity_class)
-            self.historical_locations.next_link = state.get("HistoricalLocations@iot.nextLink", None)
-            self.historical_locations.count = state.get("HistoricalLocations@iot.count", None)
-        if state.get("Datastreams", None) is not None and isinstance(state["Datastreams"], list):
-            entity_class = entity_type.EntityTypes['Datastream']['class']
-            self.datastreams = utils.transform_json_to_entity_list(state['Datastreams'], entity_class)
-            self.datastreams.next_link = state.get("Datastreams@iot.nextLink", None)
-            self.datastreams.count = state.get("Datastreams@iot.count", None)
-        if state.get("MultiDatastreams", None) is not None and isinstance(state["MultiDatastreams"], list):
-            entity_class = entity_type.EntityTypes['MultiDatastream']['class']
-            self.multi_datastreams = utils.transform_json_to_entity_list(state['MultiDatastreams'], entity_class)
-            self.multi_datastreams.next_link = state.get("MultiDatastreams@iot.nextLink", None)
-            self.multi_datastreams.count = state.get("MultiDatastreams@iot.count", None)
-        if state.get("TaskingCapabilities", None) is not None and isinstance(state["TaskingCapabilities"], list):
-            entity_class = entity_type.EntityTypes['TaskingCapability']['class']
-            self.tasking_capabilities = utils.transform_json_to_entity_list(state['TaskingCapabilities'], entity_class)
-            self.tasking_capabilities.next_link = state.get("TaskingCapabilities@iot.nextLink", None)
-            self.tasking_capabilities.count = state.get("TaskingCapabilities@iot.count", None)
+        self.set_lazy_relation('_locations', state, 'Locations', 'Location', many=True)
+        self.set_lazy_relation('_historical_locations', state, 'HistoricalLocations', 'HistoricalLocation', many=True)
+        self.set_lazy_relation('_datastreams', state, 'Datastreams', 'Datastream', many=True)
+        self.set_lazy_relation('_multi_datastreams', state, 'MultiDatastreams', 'MultiDatastream', many=True)
+        self.set_lazy_relation('_tasking_capabilities', state, 'TaskingCapabilities', 'TaskingCapability', many=True)
+
+    def set_trusted_state(self, state):
+        self.set_trusted_base_state(state)
+        self._name = state.get("name", None)
+        self._description = state.get("description", None)
+        self._properties = state.get("properties", {})
+        self.set_lazy_relation('_locations', state, 'Locations', 'Location', many=True, trusted=True)
+        self.set_lazy_relation('_historical_locations', state, 'HistoricalLocations', 'HistoricalLocation',
+                               many=True, trusted=True)
+        self.set_lazy_relation('_datastreams', state, 'Datastreams', 'Datastream', many=True, trusted=True)
+        self.set_lazy_relation('_multi_datastreams', state, 'MultiDatastreams', 'MultiDatastream',
+                               many=True, trusted=True)
+        self.set_lazy_relation('_tasking_capabilities', state, 'TaskingCapabilities', 'TaskingCapability',
+                               many=True, trusted=True)
 
     def get_dao(self, service):
         return ThingDao(service)
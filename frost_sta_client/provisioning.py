@@ -0,0 +1,248 @@
+# Copyright (C) 2021 Fraunhofer Institut IOSB, Fraunhoferstr. 1, D 76131
+# Karlsruhe, Germany.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+
+import requests
+
+import frost_sta_client.utils
+from frost_sta_client.dao import base
+from frost_sta_client.model.ext.entity_type import EntityTypes
+
+
+class Provisioner:
+    """
+    Creates whole Things, with their Locations, Datastreams and MultiDatastreams and the Sensors and
+    ObservedProperties these use, with as few requests as possible:
+
+    1. Sensors and ObservedProperties (the entity types in keys) are deduplicated by their natural key, e.g. the name,
+       and the ones that already exist on the server are looked up with batched $filter queries.
+    2. New ones that are used by more than one (Multi)Datastream are created first, in parallel.
+    3. Every Thing is created with one deep insert POST, in parallel, which links existing entities by id and
+       contains the new ones that are used only once.
+
+    Things that already have an id are skipped. Afterwards the Things and the shared entities have their ids.
+    Entities of the graph should not link back to their parents (e.g. Datastream.thing), those links are given by
+    the graph.
+    """
+    DEFAULT_KEYS = {'Sensor': ('name',), 'ObservedProperty': ('name',)}
+
+    def __init__(self, service, keys=None, concurrency=4, chunk_size=50):
+        """
+        Parameters
+        ----------
+        service: SensorThingsService
+        keys: dict
+            maps the names of the deduplicated entity types ('Sensor', 'ObservedProperty' and optionally 'Location')
+            to the attributes forming their natural key
+        concurrency: int
+            the maximum number of requests sent at the same time
+        chunk_size: int
+            the maximum number of entities looked up with one query
+        """
+        self.service = service
+        self.keys = dict(self.DEFAULT_KEYS if keys is None else keys)
+        self.concurrency = concurrency
+        self.chunk_size = chunk_size
+
+    def provision(self, things):
+        """
+        Creates the given Thing objects with their related entities. Returns the Things, raises a CreateManyError
+        listing the ones that could not be created.
+        """
+        things = list(things)
+        new_things = [thing for thing in things if thing.id is None]
+        groups = self.collect_shared(new_things)
+        self.resolve_existing(groups)
+        self.create_shared(groups)
+        results = frost_sta_client.utils.run_concurrently(self.create_thing, new_things, self.concurrency)
+        base.BaseDao.check_many_errors(new_things, [error for _, error in results])
+        return things
+
+    def provision_topology(self, topology):
+        """
+        Creates the Things of a topology dict, see things_from_topology
+        """
+        return self.provision(self.things_from_topology(topology))
+
+    def provision_yaml(self, source):
+        """
+        Creates the Things of a topology in YAML, given as path or open file, see things_from_topology.
+        Requires PyYAML.
+        """
+        import yaml
+        if hasattr(source, 'read'):
+            return self.provision_topology(yaml.safe_load(source))
+        with open(source, 'r', encoding='utf-8') as f:
+            return self.provision_topology(yaml.safe_load(f))
+
+    @staticmethod
+    def things_from_topology(topology):
+        """
+        Creates the Thing objects of a topology: a dict with a list of 'things' in SensorThings json, and optionally
+        lists of 'sensors', 'observedProperties' and 'locations', which the things can refer to by name, e.g.
+        {'Sensor': 'DHT22'} in a Datastream.
+        """
+        named = {}
+        for section, type_name in (('sensors', 'Sensor'), ('observedProperties', 'ObservedProperty'),
+                                   ('locations', 'Location')):
+            for item in topology.get(section, None) or []:
+                named[(type_name, item['name'])] = item
+
+        def resolve(value, type_name):
+            if not isinstance(value, str):
+                return value
+            if (type_name, value) not in named:
+                raise ValueError('the topology contains no {} named {}'.format(type_name, value))
+            return named[(type_name, value)]
+
+        def resolve_stream(stream, relations):
+            stream = dict(stream)
+            for relation, type_name in relations:
+                if isinstance(stream.get(relation, None), list):
+                    stream[relation] = [resolve(value, type_name) for value in stream[relation]]
+                elif relation in stream:
+                    stream[relation] = resolve(stream[relation], type_name)
+            return stream
+
+        things = []
+        for item in topology.get('things', None) or []:
+            item = dict(item)
+            if 'Locations' in item:
+                item['Locations'] = [resolve(value, 'Location') for value in item['Locations']]
+            if 'Datastreams' in item:
+                item['Datastreams'] = [resolve_stream(stream, [('Sensor', 'Sensor'),
+                                                               ('ObservedProperty', 'ObservedProperty')])
+                                       for stream in item['Datastreams']]
+            if 'MultiDatastreams' in item:
+                item['MultiDatastreams'] = [resolve_stream(stream, [('Sensor', 'Sensor'),
+                                                                    ('ObservedProperties', 'ObservedProperty')])
+                                            for stream in item['MultiDatastreams']]
+            things.append(frost_sta_client.utils.transform_json_to_entity(item, EntityTypes['Thing']['class']))
+        return things
+
+    def related_entities(self, thing):
+        """
+        Yields the entities of the given Thing that can be shared with other Things: its Locations and the Sensors and
+        ObservedProperties of its (Multi)Datastreams, once per use
+        """
+        if thing.locations is not None:
+            yield from thing.locations.entities
+        if thing.datastreams is not None:
+            for datastream in thing.datastreams.entities:
+                yield from (e for e in (datastream.sensor, datastream.observed_property) if e is not None)
+        if thing.multi_datastreams is not None:
+            for multi_datastream in thing.multi_datastreams.entities:
+                if multi_datastream.sensor is not None:
+                    yield multi_datastream.sensor
+                if multi_datastream.observed_properties is not None:
+                    yield from multi_datastream.observed_properties.entities
+
+    def natural_key(self, entity):
+        return base.BaseDao.natural_key(entity, self.keys[type(entity).__name__])
+
+    def collect_shared(self, things):
+        """
+        Groups the shared entities of the things by entity type and natural key. Returns a dict from
+        (type name, key) to the list of entity objects, one entry per use.
+        """
+        groups = {}
+        for thing in things:
+            for entity in self.related_entities(thing):
+                if type(entity).__name__ in self.keys:
+                    groups.setdefault((type(entity).__name__, self.natural_key(entity)), []).append(entity)
+        for entities in groups.values():
+            known_id = next((entity.id for entity in entities if entity.id is not None), None)
+            if known_id is not None:
+                self.set_ids(entities, known_id)
+        return groups
+
+    @staticmethod
+    def set_ids(entities, entity_id):
+        for entity in entities:
+            entity.id = entity_id
+
+    def resolve_existing(self, groups):
+        """
+        Looks up the entities of the groups without id on the server, by their natural key, and sets the ids of the
+        found ones
+        """
+        for type_name, attributes in self.keys.items():
+            missing = [key for (name, key), entities in groups.items() if name == type_name and entities[0].id is None]
+            if not missing:
+                continue
+            dao = base.BaseDao(self.service, EntityTypes[type_name])
+            found = dao.find_by_keys(missing, attributes, self.chunk_size, self.concurrency)
+            for key, entity in found.items():
+                self.set_ids(groups[(type_name, key)], entity.id)
+
+    def create_shared(self, groups):
+        """
+        Creates the new entities that are used more than once, and sets their id on all their uses
+        """
+        shared = [entities for entities in groups.values() if entities[0].id is None and len(entities) > 1]
+        canonical = [entities[0] for entities in shared]
+        results = frost_sta_client.utils.run_concurrently(self.create_entity, canonical, self.concurrency)
+        base.BaseDao.check_many_errors(canonical, [error for _, error in results])
+        for entities in shared:
+            self.set_ids(entities, entities[0].id)
+
+    def create_entity(self, entity):
+        entity.get_dao(self.service).create(entity)
+
+    def create_thing(self, thing):
+        dao = thing.get_dao(self.service)
+        url = self.service.url.copy()
+        url.path.add(dao.entitytype_plural)
+        logging.debug('Provisioning {} with a deep insert to {}'.format(thing.name, url.url))
+        try:
+            response = self.service.execute('post', url, json=self.thing_payload(thing))
+        except requests.exceptions.HTTPError as e:
+            frost_sta_client.utils.handle_server_error(e, 'Provisioning Thing {}'.format(thing.name))
+        dao.process_create_response(thing, response)
+
+    def thing_payload(self, thing):
+        """
+        Returns the deep insert json of a Thing, in which entities that already have an id are linked by it
+        """
+        payload = thing.get_property_state()
+        if thing.locations is not None and len(thing.locations.entities) > 0:
+            payload['Locations'] = [self.entity_payload(location) for location in thing.locations.entities]
+        if thing.datastreams is not None and len(thing.datastreams.entities) > 0:
+            payload['Datastreams'] = [self.stream_payload(datastream) for datastream in thing.datastreams.entities]
+        if thing.multi_datastreams is not None and len(thing.multi_datastreams.entities) > 0:
+            payload['MultiDatastreams'] = [self.stream_payload(multi_datastream)
+                                           for multi_datastream in thing.multi_datastreams.entities]
+        return payload
+
+    def stream_payload(self, stream):
+        payload = self.entity_payload(stream)
+        if '@iot.id' in payload:
+            return payload
+        if stream.sensor is not None:
+            payload['Sensor'] = self.entity_payload(stream.sensor)
+        if getattr(stream, 'observed_property', None) is not None:
+            payload['ObservedProperty'] = self.entity_payload(stream.observed_property)
+        if getattr(stream, 'observed_properties', None) is not None:
+            payload['ObservedProperties'] = [self.entity_payload(observed_property)
+                                             for observed_property in stream.observed_properties.entities]
+        return payload
+
+    @staticmethod
+    def entity_payload(entity):
+        if entity.id is not None:
+            return {'@iot.id': entity.id}
+        return entity.get_property_state()
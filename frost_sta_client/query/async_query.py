@@ -0,0 +1,137 @@
+# Copyright (C) 2021 Fraunhofer Institut IOSB, Fraunhoferstr. 1, D 76131
+# Karlsruhe, Germany.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import frost_sta_client.utils
+import frost_sta_client.model.ext.entity_list
+from frost_sta_client.query import query
+
+import asyncio
+import logging
+import requests
+
+
+class AsyncQuery(query.Query):
+    """
+    The asyncio counterpart of Query, to be used with an AsyncSensorThingsService. The list and delete functions are
+    coroutines, list returns an AsyncEntityList which can be iterated with 'async for'.
+    """
+
+    async def list(self, callback=None, step_size=None):
+        url, pager = self.list_url()
+        try:
+            response = await self.service.execute('get', url)
+        except requests.exceptions.HTTPError as e:
+            frost_sta_client.utils.handle_server_error(e, 'Query')
+        logging.debug('Received response: {} from {}'.format(response.status_code, url))
+        entity_list = self.process_list_response(response, callback, step_size, pager)
+        return frost_sta_client.model.ext.entity_list.AsyncEntityList.from_entity_list(entity_list)
+
+    async def data_array(self, follow_next_links=True):
+        """
+        The coroutine version of Query.data_array
+        """
+        document = await self.fetch_data_array(self.data_array_url())
+        while follow_next_links and document.next_link is not None:
+            document.extend(await self.fetch_data_array(document.next_link))
+        return document
+
+    async def fetch_data_array(self, url):
+        try:
+            response = await self.service.execute('get', url)
+        except requests.exceptions.HTTPError as e:
+            frost_sta_client.utils.handle_server_error(e, 'Query')
+        return self.decode_data_array(response, url)
+
+    async def stream(self, callback=None, step_size=None):
+        """
+        The coroutine version of Query.stream: iterating the returned AsyncEntityList with 'async for' replaces each
+        page by the following one. Pages are not prefetched.
+        """
+        entity_list = await self.list(callback, step_size)
+        entity_list.streaming = True
+        return entity_list
+
+    async def list_parallel(self, workers=4, partition_by='id', ordered=True, slices=None):
+        """
+        The coroutine version of Query.list_parallel: the slices are paged through concurrently with asyncio.gather,
+        at most 'workers' of them at the same time
+        """
+        if partition_by not in ('id', 'phenomenonTime'):
+            raise ValueError("partition_by should be either 'id' or 'phenomenonTime'")
+        entity_list = frost_sta_client.model.ext.entity_list.AsyncEntityList(self.entity_class)
+        entity_list.service = self.service
+        lower = await self.partition_bound(partition_by, 'asc')
+        if lower is None:
+            entity_list.count = 0
+            return entity_list
+        upper = await self.partition_bound(partition_by, 'desc')
+        arrived = []
+        semaphore = asyncio.Semaphore(workers)
+
+        async def fetch_slice(slice_query):
+            entities = []
+            async with semaphore:
+                async for page in (await slice_query.list()).iter_pages():
+                    entities.extend(page.entities)
+                    if not ordered:
+                        arrived.extend(page.entities)
+            return entities
+
+        slice_queries = self.slice_queries(partition_by, lower, upper, slices or workers)
+        results = await asyncio.gather(*[fetch_slice(slice_query) for slice_query in slice_queries])
+        if ordered:
+            entity_list.entities = [entity for slice_entities in results for entity in slice_entities]
+        else:
+            entity_list.entities = arrived
+        entity_list.count = len(entity_list.entities)
+        return entity_list
+
+    async def partition_bound(self, partition_by, order):
+        entities = (await self.partition_bound_query(partition_by, order).list()).entities
+        return self.partition_bound_value(partition_by, entities)
+
+    async def delete(self, workers=4, fallback=True):
+        """
+        The coroutine version of Query.delete
+        """
+        url = self.delete_url()
+        try:
+            await self.service.execute('delete', url)
+            self.service.upsert_cache.forget_type(self.service.url, self.entity)
+            return None
+        except requests.exceptions.HTTPError as e:
+            self.check_delete_fallback(e, fallback)
+        return await self.delete_one_by_one(workers)
+
+    async def delete_one_by_one(self, workers=4):
+        entity_list = await self.id_query().list()
+        entity_list.streaming = True
+        deleted = 0
+        chunk = []
+        async for entity in entity_list:
+            chunk.append(entity)
+            if len(chunk) == workers:
+                deleted += await self.delete_entities(chunk)
+                chunk = []
+        return deleted + await self.delete_entities(chunk)
+
+    async def delete_entities(self, entities):
+        results = await asyncio.gather(*[self.service.get_dao(entity).delete(entity) for entity in entities],
+                                       return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return len(entities)
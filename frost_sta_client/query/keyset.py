@@ -0,0 +1,115 @@
+# Copyright (C) 2021 Fraunhofer Institut IOSB, Fraunhoferstr. 1, D 76131
+# Karlsruhe, Germany.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import base64
+import datetime
+import json
+
+from furl import furl
+
+import frost_sta_client.utils
+
+
+def format_datetime_literal(value):
+    """
+    Formats a datetime, or the start of an ISO 8601 time (interval) string, as UTC literal for $filter expressions
+    """
+    if isinstance(value, str):
+        value = frost_sta_client.utils.parse_iso_datetime(value.split('/')[0])
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.astimezone(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def format_id_literal(value):
+    if isinstance(value, int):
+        return str(value)
+    return "'{}'".format(str(value).replace("'", "''"))
+
+
+class KeysetPager:
+    """
+    Builds the request for the page following a given entity from a $filter on the sort key of that entity, instead
+    of following the $skip based @iot.nextLink of the server. Every page is thus as cheap for the server as the
+    first one, no matter how deep it is.
+    Supported keys are 'id' (ordered by id) and 'phenomenonTime' (ordered by phenomenonTime, then id).
+    """
+    KEYS = {'id': ['id'], 'phenomenonTime': ['phenomenonTime', 'id']}
+
+    def __init__(self, url, params, key='id'):
+        if key not in self.KEYS:
+            raise ValueError("keyset paging supports the keys 'id' and 'phenomenonTime'")
+        self.key = key
+        self.url = furl(str(url))
+        self.params = dict(params)
+        self.params.pop('$skip', None)
+        self.base_filter = self.params.pop('$filter', None)
+        self.params['$orderby'] = ','.join(field + ' asc' for field in self.KEYS[key])
+        select = self.params.get('$select')
+        if select is not None:
+            fields = select.split(',')
+            self.params['$select'] = ','.join(fields + [f for f in self.KEYS[key] if f not in fields])
+
+    def last_key(self, entity):
+        if self.key == 'id':
+            return [entity.id]
+        return [entity.phenomenon_time_as_str(), entity.id]
+
+    def key_filter(self, last_key):
+        if self.key == 'id':
+            return 'id gt {}'.format(format_id_literal(last_key[0]))
+        time_literal = format_datetime_literal(last_key[0])
+        id_literal = format_id_literal(last_key[1])
+        return '(phenomenonTime gt {time} or (phenomenonTime eq {time} and id gt {id}))'.format(
+            time=time_literal, id=id_literal)
+
+    def args(self, last_key=None):
+        """
+        The query parameters of the page following last_key, or of the first page if last_key is None
+        """
+        args = dict(self.params)
+        filters = [] if self.base_filter is None else ['({})'.format(self.base_filter)]
+        if last_key is not None:
+            filters.append(self.key_filter(last_key))
+        if filters:
+            args['$filter'] = ' and '.join(filters)
+        return args
+
+    def url_after(self, entity):
+        url = self.url.copy()
+        url.args = self.args(self.last_key(entity))
+        return url.url
+
+    def next_link(self, page):
+        """
+        Returns the link to the page after the given EntityList page, or None if the server did not report any
+        further page
+        """
+        if page.next_link is None or len(page.entities) == 0:
+            return None
+        return self.url_after(page.entities[-1])
+
+    def cursor(self, last_key):
+        """
+        Encodes last_key as an opaque token, which Query.keyset accepts to resume after that entity
+        """
+        data = json.dumps({'key': self.key, 'last': last_key})
+        return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii')
+
+    @staticmethod
+    def decode_cursor(token):
+        data = json.loads(base64.urlsafe_b64decode(token.encode('ascii')).decode('utf-8'))
+        return data['key'], data['last']
@@ -16,14 +16,23 @@
 
 import frost_sta_client.utils
 import frost_sta_client.model.ext.entity_list
+import frost_sta_client.model.ext.data_array_document
+import frost_sta_client.model.ext.identity_map
+from frost_sta_client.query.keyset import KeysetPager, format_datetime_literal
 
 
+import datetime
 import logging
+import math
+import threading
+
 import requests
-from requests.exceptions import JSONDecodeError
 
 
 class Query:
+    # status codes with which servers reject a DELETE on a collection
+    UNSUPPORTED_DELETE_STATUS = (400, 404, 405, 501)
+
     def __init__(self, service, entity, entitytype_plural, entity_class, parent):
         self.service = service
         self.entity = entity
@@ -31,6 +40,10 @@ class Query:
         self.entity_class = entity_class
         self.params = {}
         self.parent = parent
+        self.keyset_key = None
+        self.keyset_cursor = None
+        self.trusted_decode = None
+        self.identity_map = None
 
     @property
     def service(self):
@@ -86,6 +99,18 @@ class Query:
     def parent(self, value):
         self._parent = value
 
+    def copy(self):
+        """
+        Returns a new Query for the same collection with a copy of the current parameters
+        """
+        result = type(self)(self.service, self.entity, self.entitytype_plural, self.entity_class, self.parent)
+        result.params = dict(self.params)
+        result.keyset_key = self.keyset_key
+        result.keyset_cursor = self.keyset_cursor
+        result.trusted_decode = self.trusted_decode
+        result.identity_map = self.identity_map
+        return result
+
     def remove_all_params(self, key):
         self.params.pop(key, None)
 
@@ -134,28 +159,323 @@ class Query:
         self.params['$expand'] = expansion
         return self
 
+    def trusted(self, value=True):
+        """
+        Decodes the entities of this query without the validation of the property setters (value=True), or with it
+        (value=False), overriding the trusted_decode setting of the service
+        """
+        self.trusted_decode = value
+        return self
+
+    def is_trusted(self):
+        if self.trusted_decode is not None:
+            return self.trusted_decode
+        return self.service.trusted_decode
+
+    def deduplicate(self, value=True):
+        """
+        Resolves decoded entities of the same type and id, e.g. the Datastream expanded in every Observation, to one
+        shared instance for all lists of this query and its copies (value=True), or decodes a separate instance
+        each time (value=False), overriding the identity map of the service
+        """
+        self.identity_map = frost_sta_client.model.ext.identity_map.IdentityMap() if value else False
+        return self
+
+    def get_identity_map(self):
+        if self.identity_map is None:
+            return self.service.identity_map
+        if self.identity_map is False:
+            return None
+        return self.identity_map
+
+    def keyset(self, key='id', cursor=None):
+        """
+        Pages through the collection by the sort key instead of the $skip based @iot.nextLinks of the server.
+        The collection is ordered by id (key='id') or, for Observations, by phenomenonTime and id
+        (key='phenomenonTime'), and each following page is requested with a $filter for the entities after the last
+        one of the previous page, so late pages cost the server as much as the first one. $skip and $orderby are
+        ignored.
+        cursor: a token of EntityList.cursor, to resume an interrupted iteration after the last returned entity
+        """
+        if key not in KeysetPager.KEYS:
+            raise ValueError("keyset paging supports the keys 'id' and 'phenomenonTime'")
+        if key == 'phenomenonTime' and self.entity != 'Observation':
+            raise ValueError("keyset paging by 'phenomenonTime' is only supported for Observations")
+        if cursor is not None and KeysetPager.decode_cursor(cursor)[0] != key:
+            raise ValueError('the cursor was created for a different keyset key')
+        self.keyset_key = key
+        self.keyset_cursor = cursor
+        return self
+
     # exception: similar functions in basedao
-    def list(self, callback=None, step_size=None):
+    def list(self, callback=None, step_size=None, prefetch=0):
         """
         Get an entity collection as a dictionary
         callbacks so far only work in combination with step_size. If step_size is set, then the callback function
         is called at every iteration of the step_size
+        If prefetch is set to N > 0, iterating the returned list fetches and decodes up to N following pages on a
+        background thread while the current page is processed
+        """
+        url, pager = self.list_url()
+        try:
+            response = self.service.execute('get', url)
+        except requests.exceptions.HTTPError as e:
+            frost_sta_client.utils.handle_server_error(e, 'Query')
+        logging.debug('Received response: {} from {}'.format(response.status_code, url))
+        entity_list = self.process_list_response(response, callback, step_size, pager)
+        entity_list.prefetch = prefetch
+        return entity_list
+
+    def list_url(self):
+        """
+        Returns the url of the first page of this query, and the KeysetPager if keyset paging is used
         """
         url = self.service.get_full_path(self.parent, self.entitytype_plural)
-        url.args = self.params
+        if self.keyset_key is None:
+            url.args = self.params
+            return url, None
+        pager = KeysetPager(url, self.params, self.keyset_key)
+        last_key = None if self.keyset_cursor is None else KeysetPager.decode_cursor(self.keyset_cursor)[1]
+        url.args = pager.args(last_key)
+        return url, pager
+
+    def data_array(self, follow_next_links=True):
+        """
+        Requests the collection with $resultFormat=dataArray (Observations only) and returns it as a
+        DataArrayDocument, whose DataArrayValues hold the components and rows as plain lists, without creating an
+        Observation per row. DataArrayValue.column and DataArrayValue.columns give access per component.
+        If follow_next_links is True, all following pages are fetched and their rows appended, otherwise the
+        next_link of the returned document points to the next page.
+        """
+        document = self.fetch_data_array(self.data_array_url())
+        while follow_next_links and document.next_link is not None:
+            document.extend(self.fetch_data_array(document.next_link))
+        return document
+
+    def data_array_url(self):
+        url = self.service.get_full_path(self.parent, self.entitytype_plural)
+        url.args = dict(self.params, **{'$resultFormat': 'dataArray'})
+        return url
+
+    def fetch_data_array(self, url):
         try:
             response = self.service.execute('get', url)
         except requests.exceptions.HTTPError as e:
             frost_sta_client.utils.handle_server_error(e, 'Query')
+        return self.decode_data_array(response, url)
+
+    def decode_data_array(self, response, url):
         logging.debug('Received response: {} from {}'.format(response.status_code, url))
         try:
-            json_response = response.json()
-        except JSONDecodeError:
+            json_response = self.service.decode_json(response)
+        except ValueError:
+            raise ValueError('Cannot find json in http response')
+        document = frost_sta_client.model.ext.data_array_document.DataArrayDocument()
+        document.__setstate__(json_response)
+        return document
+
+    def stream(self, callback=None, step_size=None, prefetch=0):
+        """
+        Like list, but the returned EntityList is in streaming mode: when it is iterated, each fetched page replaces
+        the previous one instead of being appended, so memory use stays bounded by the page size.
+        The callback receives the overall index of the entity, count still holds the total count of the collection.
+        """
+        entity_list = self.list(callback=callback, step_size=step_size, prefetch=prefetch)
+        entity_list.streaming = True
+        return entity_list
+
+    def process_list_response(self, response, callback=None, step_size=None, pager=None):
+        try:
+            json_response = self.service.decode_json(response)
+        except ValueError:
             raise ValueError('Cannot find json in http response')
-        entity_list = frost_sta_client.utils.transform_json_to_entity_list(json_response, self.entity_class)
+        trusted = self.is_trusted()
+        identity_map = self.get_identity_map()
+        entity_list = frost_sta_client.utils.transform_json_to_entity_list(json_response, self.entity_class, trusted,
+                                                                           identity_map)
         entity_list.set_service(self.service)
+        if self.service.track_changes:
+            entity_list.mark_clean()
+        entity_list.trusted = trusted
+        entity_list.identity_map = identity_map
+        if pager is not None:
+            entity_list.pager = pager
+            if self.keyset_cursor is not None:
+                entity_list.resume_key = KeysetPager.decode_cursor(self.keyset_cursor)[1]
+            entity_list.next_link = pager.next_link(entity_list)
 
         entity_list.callback = callback
         entity_list.step_size = step_size
 
         return entity_list
+
+    def list_parallel(self, workers=4, partition_by='id', ordered=True, slices=None):
+        """
+        Downloads the complete collection with several requests in flight at the same time.
+        The collection is split into independent slices by ranges of @iot.id (partition_by='id', requires numeric
+        ids) or of phenomenonTime (partition_by='phenomenonTime', Observations only). Each slice is a copy of this
+        query with an additional $filter for its range, and is paged through on one of 'workers' threads over the
+        connection pool of the service, which should therefore allow at least 'workers' connections.
+        $skip is ignored, a $top is used as the page size of the slice requests.
+        Returns an EntityList with all entities, sorted by the partition key if ordered is True, otherwise in the
+        order in which the pages arrived.
+        """
+        if partition_by not in ('id', 'phenomenonTime'):
+            raise ValueError("partition_by should be either 'id' or 'phenomenonTime'")
+        entity_list = frost_sta_client.model.ext.entity_list.EntityList(self.entity_class)
+        entity_list.service = self.service
+        lower = self.partition_bound(partition_by, 'asc')
+        if lower is None:
+            entity_list.count = 0
+            return entity_list
+        upper = self.partition_bound(partition_by, 'desc')
+        arrived = []
+        lock = threading.Lock()
+
+        def fetch_slice(slice_query):
+            entities = []
+            for page in slice_query.list().iter_pages():
+                entities.extend(page.entities)
+                if not ordered:
+                    with lock:
+                        arrived.extend(page.entities)
+            return entities
+
+        slice_queries = self.slice_queries(partition_by, lower, upper, slices or workers)
+        results = frost_sta_client.utils.run_concurrently(fetch_slice, slice_queries, workers)
+        for _, error in results:
+            if error is not None:
+                raise error
+        if ordered:
+            entity_list.entities = [entity for slice_entities, _ in results for entity in slice_entities]
+        else:
+            entity_list.entities = arrived
+        entity_list.count = len(entity_list.entities)
+        return entity_list
+
+    def delete(self, workers=4, fallback=True):
+        """
+        Deletes all entities matched by this query with one DELETE request on the collection url with the current
+        $filter. If the server does not support deleting a collection and fallback is True, the entities are paged
+        through by id (fetching only their ids, one page at a time) and deleted one by one, with up to 'workers'
+        requests in flight at the same time.
+        To avoid accidentally deleting a whole entity set, a query without a $filter is only allowed on a related
+        collection, e.g. the Observations of a Datastream.
+        Returns the number of entities deleted one by one, or None if the server deleted them with one request.
+        """
+        url = self.delete_url()
+        try:
+            self.service.execute('delete', url)
+            self.service.upsert_cache.forget_type(self.service.url, self.entity)
+            return None
+        except requests.exceptions.HTTPError as e:
+            self.check_delete_fallback(e, fallback)
+        return self.delete_one_by_one(workers)
+
+    def delete_url(self):
+        if self.params.get('$filter') is None and self.parent is None:
+            raise ValueError('deleting requires a $filter, unless the query is on a related collection')
+        url = self.service.get_full_path(self.parent, self.entitytype_plural)
+        if self.params.get('$filter') is not None:
+            url.args = {'$filter': self.params['$filter']}
+        logging.debug('Deleting: {}'.format(url.url))
+        return url
+
+    def check_delete_fallback(self, error, fallback):
+        """
+        Re-raises the error of a collection DELETE, unless it tells that the server does not support it and the
+        entities may be deleted one by one instead
+        """
+        status_code = getattr(error.response, 'status_code', None)
+        if not fallback or status_code not in self.UNSUPPORTED_DELETE_STATUS:
+            frost_sta_client.utils.handle_server_error(error, 'Deleting {}'.format(self.entitytype_plural))
+        logging.debug('Deleting the collection failed with status-code {}, deleting the entities one by one'
+                      .format(status_code))
+
+    def id_query(self):
+        """
+        Returns a copy of this query that only fetches the ids of the matched entities, paged by id
+        """
+        id_query = self.copy()
+        for key in ('$expand', '$orderby', '$skip', '$count', '$select'):
+            id_query.remove_all_params(key)
+        return id_query.select('id').keyset('id')
+
+    def delete_one_by_one(self, workers=4):
+        def delete_entity(entity):
+            entity.get_dao(self.service).delete(entity)
+
+        deleted = 0
+        for page in self.id_query().stream().iter_pages():
+            results = frost_sta_client.utils.run_concurrently(delete_entity, page.entities, workers)
+            for _, error in results:
+                if error is not None:
+                    raise error
+            deleted += len(page.entities)
+        return deleted
+
+    def slice_queries(self, partition_by, lower, upper, slices):
+        """
+        Returns a copy of this query for each slice of the range [lower, upper] of the partition key, ordered by the
+        partition key and without $skip and $count
+        """
+        base = self.copy()
+        base.remove_all_params('$skip')
+        base.remove_all_params('$count')
+        base.params['$orderby'] = 'id asc' if partition_by == 'id' else 'phenomenonTime asc,id asc'
+        queries = []
+        for range_filter in self.partition_filters(partition_by, lower, upper, slices):
+            slice_query = base.copy()
+            statement = range_filter if self.params.get('$filter') is None \
+                else '({}) and ({})'.format(self.params['$filter'], range_filter)
+            queries.append(slice_query.filter(statement))
+        return queries
+
+    def partition_bound(self, partition_by, order):
+        """
+        Returns the smallest (order='asc') or largest (order='desc') value of the partition key within the current
+        filter, or None if the collection is empty
+        """
+        entities = self.partition_bound_query(partition_by, order).list().entities
+        return self.partition_bound_value(partition_by, entities)
+
+    def partition_bound_query(self, partition_by, order):
+        bound_query = self.copy()
+        bound_query.keyset_key = None
+        for key in ('$skip', '$count', '$expand'):
+            bound_query.remove_all_params(key)
+        return bound_query.top(1).orderby(partition_by, order).select(partition_by)
+
+    @staticmethod
+    def partition_bound_value(partition_by, entities):
+        if len(entities) == 0:
+            return None
+        if partition_by == 'id':
+            return entities[0].id
+        phenomenon_time = entities[0].phenomenon_time
+        if isinstance(phenomenon_time, str):
+            phenomenon_time = frost_sta_client.utils.parse_iso_datetime(phenomenon_time.split('/')[0])
+        return phenomenon_time
+
+    @staticmethod
+    def partition_filters(partition_by, lower, upper, slices):
+        """
+        Splits the closed range [lower, upper] into at most 'slices' $filter expressions on the partition key
+        """
+        if partition_by == 'id':
+            if not isinstance(lower, int) or not isinstance(upper, int):
+                raise ValueError('partitioning by id requires numeric ids')
+            step = max(1, math.ceil((upper - lower + 1) / slices))
+            bounds = list(range(lower, upper + 1, step))
+            formatted = [str(b) for b in bounds] + [str(upper)]
+        else:
+            lower = lower if lower.tzinfo is not None else lower.replace(tzinfo=datetime.timezone.utc)
+            upper = upper if upper.tzinfo is not None else upper.replace(tzinfo=datetime.timezone.utc)
+            step = (upper - lower) / slices
+            bounds = [lower] if step.total_seconds() <= 0 else [lower + step * i for i in range(slices)]
+            formatted = [format_datetime_literal(b) for b in bounds + [upper]]
+        filters = ['{key} ge {} and {key} lt {}'.format(formatted[i], formatted[i + 1], key=partition_by)
+                   for i in range(len(bounds) - 1)]
+        filters.append('{key} ge {} and {key} le {}'.format(formatted[len(bounds) - 1], formatted[-1],
+                                                            key=partition_by))
+        return filters
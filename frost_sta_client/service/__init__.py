@@ -1,2 +1,16 @@
 from frost_sta_client.service import sensorthingsservice
 from frost_sta_client.service import auth_handler
+from frost_sta_client.service import batch
+from frost_sta_client.service import json_codec
+from frost_sta_client.service import response_cache
+from frost_sta_client.service import retry_policy
+from frost_sta_client.service import upsert_cache
+
+import importlib
+
+
+def __getattr__(name):
+    # the asyncio based service is only imported when it is used
+    if name == 'async_sensorthingsservice':
+        return importlib.import_module('frost_sta_client.service.async_sensorthingsservice')
+    raise AttributeError("module 'frost_sta_client.service' has no attribute '{}'".format(name))
@@ -0,0 +1,221 @@
+# Copyright (C) 2021 Fraunhofer Institut IOSB, Fraunhoferstr. 1, D 76131
+# Karlsruhe, Germany.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from frost_sta_client.dao import async_base
+from frost_sta_client.model.ext.entity_type import EntityTypes
+from frost_sta_client.service import batch
+from frost_sta_client.service.sensorthingsservice import SensorThingsService
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# the connection errors of both transports, which the retry policy of the service may retry
+CONNECTION_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout, asyncio.TimeoutError)
+if aiohttp is not None:
+    CONNECTION_ERRORS += (aiohttp.ClientConnectionError,)
+
+
+class AsyncSensorThingsService(SensorThingsService):
+    """
+    An asyncio based SensorThingsService. All DAO operations (create, find, update, patch, delete and Query.list)
+    are coroutines, and at most max_concurrency requests are in flight at the same time.
+
+    If aiohttp is installed, requests are sent over a pooled aiohttp ClientSession. Otherwise they are sent over
+    the pooled requests session of SensorThingsService, running in a thread pool of max_concurrency workers.
+    """
+
+    def __init__(self, url, auth_handler=None, proxies=None, max_concurrency=100, pool_maxsize=100,
+                 keep_alive=True, **kwargs):
+        super().__init__(url, auth_handler=auth_handler, proxies=proxies, pool_maxsize=pool_maxsize,
+                         keep_alive=keep_alive, **kwargs)
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+        self._client_session = None
+        self._executor = None
+
+    @property
+    def max_concurrency(self):
+        return self._max_concurrency
+
+    @max_concurrency.setter
+    def max_concurrency(self, value):
+        if not isinstance(value, int) or value < 1:
+            raise ValueError('max_concurrency should be a positive int!')
+        self._max_concurrency = value
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+    async def aclose(self):
+        """
+        Closes the aiohttp session, the thread pool and the pooled requests session
+        """
+        if self._client_session is not None:
+            await self._client_session.close()
+            self._client_session = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        self.close()
+
+    async def execute(self, method, url, **kwargs):
+        if self.cache is None:
+            return await self.send(method, url, **kwargs)
+        if method.lower() != 'get':
+            try:
+                return await self.send(method, url, **kwargs)
+            finally:
+                self.cache.invalidate(str(url), kwargs.get('json', None))
+        cached, validators = self.cache.lookup(str(url))
+        if cached is not None:
+            return cached
+        if validators:
+            kwargs['headers'] = dict(kwargs.get('headers', None) or {}, **validators)
+        return self.cache.update(str(url), await self.send(method, url, **kwargs))
+
+    async def send(self, method, url, **kwargs):
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            try:
+                response = await self.send_once(method, url, **kwargs)
+            except CONNECTION_ERRORS as e:
+                delay = self.retry_delay(method, url, attempt, started, error=e)
+                if delay is None:
+                    raise e
+            else:
+                delay = None
+                if response.status_code >= 400:
+                    delay = self.retry_delay(method, url, attempt, started, response=response)
+                if delay is None:
+                    response.raise_for_status()
+                    return response
+            attempt += 1
+            # the backoff is waited outside of the semaphore, so other requests can use the slot meanwhile
+            await asyncio.sleep(delay)
+
+    async def send_once(self, method, url, **kwargs):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            if aiohttp is None:
+                return await self._execute_in_executor(method, url, **kwargs)
+            return await self._execute_aiohttp(method, url, **kwargs)
+
+    async def _execute_in_executor(self, method, url, **kwargs):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        loop = asyncio.get_running_loop()
+        request = functools.partial(self.request, method, url, **self.encode_json_body(kwargs))
+        return await loop.run_in_executor(self._executor, request)
+
+    async def _execute_aiohttp(self, method, url, **kwargs):
+        if self._client_session is None:
+            connector = aiohttp.TCPConnector(limit=self.pool_maxsize, force_close=not self.keep_alive)
+            self._client_session = aiohttp.ClientSession(connector=connector)
+        url = str(url)
+        kwargs = self.encode_json_body(kwargs)
+        if self.auth_handler is not None and self.auth_handler.add_auth_header() is not None:
+            kwargs['auth'] = aiohttp.BasicAuth(self.auth_handler.username, self.auth_handler.password)
+        if self.proxies is not None:
+            proxy = self.proxies.get(url.split(':', 1)[0])
+            if proxy is not None:
+                kwargs['proxy'] = proxy
+        async with self._client_session.request(method.upper(), url, **kwargs) as client_response:
+            content = await client_response.read()
+        # wrap the result into a requests Response, so DAOs and error handling work the same as in the sync service
+        response = requests.models.Response()
+        response.status_code = client_response.status
+        response.reason = client_response.reason
+        response.headers = CaseInsensitiveDict(client_response.headers)
+        response.url = str(client_response.url)
+        response.encoding = client_response.charset or 'utf-8'
+        response._content = content
+        return response
+
+    def batch(self, max_requests=100):
+        """
+        Returns an AsyncBatch, which sends the operations queued on it when it is used with 'async with' and the
+        context is left, or when its send coroutine is awaited
+        """
+        return batch.AsyncBatch(self, max_requests)
+
+    def get_dao(self, entity):
+        entitytype = EntityTypes[type(entity).__name__]
+        if entitytype['singular'] == 'Observation':
+            return self.observations()
+        return async_base.AsyncBaseDao(self, entitytype)
+
+    async def create(self, entity):
+        return await self.get_dao(entity).create(entity)
+
+    async def update(self, entity):
+        await self.get_dao(entity).update(entity)
+
+    async def patch(self, entity, patches):
+        await self.get_dao(entity).patch(entity, patches)
+
+    async def delete(self, entity):
+        await self.get_dao(entity).delete(entity)
+
+    def actuators(self):
+        return async_base.AsyncBaseDao(self, EntityTypes['Actuator'])
+
+    def datastreams(self):
+        return async_base.AsyncBaseDao(self, EntityTypes['Datastream'])
+
+    def features_of_interest(self):
+        return async_base.AsyncBaseDao(self, EntityTypes['FeatureOfInterest'])
+
+    def historical_locations(self):
+        return async_base.AsyncBaseDao(self, EntityTypes['HistoricalLocation'])
+
+    def locations(self):
+        return async_base.AsyncBaseDao(self, EntityTypes['Location'])
+
+    def multi_datastreams(self):
+        return async_base.AsyncBaseDao(self, EntityTypes['MultiDatastream'])
+
+    def observations(self):
+        return async_base.AsyncObservationDao(self)
+
+    def observed_properties(self):
+        return async_base.AsyncBaseDao(self, EntityTypes['ObservedProperty'])
+
+    def sensors(self):
+        return async_base.AsyncBaseDao(self, EntityTypes['Sensor'])
+
+    def tasks(self):
+        return async_base.AsyncBaseDao(self, EntityTypes['Task'])
+
+    def tasking_capabilities(self):
+        return async_base.AsyncBaseDao(self, EntityTypes['TaskingCapability'])
+
+    def things(self):
+        return async_base.AsyncBaseDao(self, EntityTypes['Thing'])
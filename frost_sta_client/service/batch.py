@@ -0,0 +1,258 @@
+# Copyright (C) 2021 Fraunhofer Institut IOSB, Fraunhoferstr. 1, D 76131
+# Karlsruhe, Germany.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+import frost_sta_client.utils
+
+
+class BatchError(Exception):
+    """
+    Raised when a Batch is sent and some of its requests failed.
+    failed: the failed BatchRequests, each with its status and error
+    """
+    def __init__(self, failed):
+        super().__init__('{} of the batch requests failed'.format(len(failed)))
+        self.failed = failed
+
+
+class BatchRequest:
+    """
+    One operation of a Batch. After the batch has been sent, status holds the http status the server answered the
+    operation with, response the answer as a requests.Response and error the exception if it failed.
+    """
+
+    def __init__(self, id, method, url, body=None, headers=None, entity=None, on_success=None):
+        self.id = id
+        self.method = method
+        self.url = url
+        self.body = body
+        self.headers = headers
+        self.entity = entity
+        self.on_success = on_success
+        self.status = None
+        self.response = None
+        self.error = None
+
+    def to_json_dict(self):
+        data = {'id': self.id, 'method': self.method, 'url': self.url}
+        if self.headers:
+            data['headers'] = dict(self.headers)
+        if self.body is not None:
+            data['body'] = self.body
+        return data
+
+
+class Batch:
+    """
+    Collects create, update, patch and delete operations and sends them in OData JSON $batch requests of at most
+    max_requests operations each, instead of one http request per operation. Used as a context manager, the
+    operations are sent when the context is left:
+
+        with service.batch() as batch:
+            batch.create(thing)
+            batch.patch(datastream, patches)
+
+    Afterwards created entities have their id and service set, and every BatchRequest has its status. If
+    operations failed, a BatchError listing them is raised after all of them have been sent.
+    """
+
+    BATCH_HEADERS = {'Prefer': 'odata.continue-on-error'}
+
+    def __init__(self, service, max_requests=100):
+        self.service = service
+        self.max_requests = max_requests
+        self.requests = []
+        self.sent = []
+
+    @property
+    def max_requests(self):
+        return self._max_requests
+
+    @max_requests.setter
+    def max_requests(self, value):
+        if not isinstance(value, int) or value < 1:
+            raise ValueError('max_requests should be a positive int!')
+        self._max_requests = value
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None:
+            self.requests = []
+            return
+        self.send()
+
+    def __len__(self):
+        return len(self.requests)
+
+    def create(self, entity):
+        dao = entity.get_dao(self.service)
+        url = self.service.url.copy()
+        url.path.add(dao.entitytype_plural)
+        json_dict = frost_sta_client.utils.transform_entity_to_json_dict(entity)
+        return self.add('post', url, json_dict, entity=entity,
+                        on_success=lambda response: dao.process_create_response(entity, response))
+
+    def update(self, entity):
+        dao = entity.get_dao(self.service)
+        json_dict = frost_sta_client.utils.transform_entity_to_json_dict(entity)
+        return self.add('put', dao.entity_url(entity), json_dict, entity=entity)
+
+    def patch(self, entity, patches):
+        dao = entity.get_dao(self.service)
+        return self.add('patch', dao.entity_url(entity), dao.check_patches(patches), dao.APPLICATION_JSON_PATCH,
+                        entity=entity)
+
+    def delete(self, entity):
+        dao = entity.get_dao(self.service)
+
+        def forget(response):
+            self.service.upsert_cache.forget(self.service.url, dao.entitytype, entity.id)
+
+        return self.add('delete', dao.entity_url(entity), entity=entity, on_success=forget)
+
+    def add(self, method, url, body=None, headers=None, entity=None, on_success=None):
+        """
+        Queues a request to url, which is either absolute or relative to the service url. on_success is called with
+        the response of the request, if it succeeds. Returns the queued BatchRequest.
+        """
+        request = BatchRequest(str(len(self.sent) + len(self.requests) + 1), method, self.relative_url(url), body,
+                               headers, entity, on_success)
+        self.requests.append(request)
+        return request
+
+    def relative_url(self, url):
+        url = str(url)
+        base = str(self.service.url).rstrip('/') + '/'
+        if url.startswith(base):
+            return url[len(base):]
+        return url
+
+    def send(self):
+        """
+        Sends all queued requests, in $batch requests of at most max_requests operations. Raises a BatchError if
+        operations failed.
+        """
+        queued, self.requests = self.requests, []
+        for chunk in self.chunks(queued):
+            self.send_chunk(chunk)
+        return self.finish(queued)
+
+    def chunks(self, queued):
+        return [queued[start:start + self.max_requests] for start in range(0, len(queued), self.max_requests)]
+
+    def finish(self, queued):
+        self.sent.extend(queued)
+        failed = [request for request in queued if request.error is not None]
+        if failed:
+            raise BatchError(failed)
+        return queued
+
+    def send_chunk(self, chunk):
+        url, json_dict = self.chunk_request(chunk)
+        try:
+            response = self.service.execute('post', url, json=json_dict, headers=self.BATCH_HEADERS)
+            responses = self.service.decode_json(response).get('responses', [])
+        except (requests.exceptions.HTTPError, ValueError, AttributeError) as e:
+            self.fail_chunk(chunk, e)
+            return
+        self.process_responses(chunk, responses)
+
+    def chunk_request(self, chunk):
+        url = self.service.url.copy()
+        url.path.add('$batch')
+        logging.debug('Posting {} batch requests to {}'.format(len(chunk), url.url))
+        return url, {'requests': [request.to_json_dict() for request in chunk]}
+
+    @staticmethod
+    def fail_chunk(chunk, error):
+        logging.error('Sending a batch of {} requests failed: {}'.format(len(chunk), error))
+        for request in chunk:
+            request.status = getattr(getattr(error, 'response', None), 'status_code', None)
+            request.error = error
+
+    def process_responses(self, chunk, responses):
+        by_id = {str(part.get('id')): part for part in responses if isinstance(part, dict)}
+        for request in chunk:
+            self.process_part(request, by_id.get(request.id, None))
+
+    def process_part(self, request, part):
+        if part is None:
+            request.error = ValueError('the server sent no response for batch request {}'.format(request.id))
+            return
+        response = requests.models.Response()
+        response.status_code = part.get('status', None)
+        response.headers = CaseInsensitiveDict(part.get('headers', None) or {})
+        response._content = b'' if part.get('body', None) is None else self.service.codec.dumps(part['body'])
+        response.encoding = 'utf-8'
+        request.status = response.status_code
+        request.response = response
+        try:
+            response.raise_for_status()
+            if request.on_success is not None:
+                request.on_success(response)
+        except requests.exceptions.HTTPError as e:
+            logging.error('Batch request {} {} failed with status-code {}'.format(request.method, request.url,
+                                                                                 request.status))
+            request.error = e
+        except (KeyError, ValueError, TypeError) as e:
+            request.error = e
+
+
+class AsyncBatch(Batch):
+    """
+    The asyncio counterpart of Batch, returned by AsyncSensorThingsService.batch. The operations are queued the same
+    way, send is a coroutine, and used as an async context manager the operations are sent when the context is left:
+
+        async with service.batch() as batch:
+            batch.create(thing)
+    """
+
+    def __enter__(self):
+        raise TypeError("the batch of an AsyncSensorThingsService is used with 'async with'")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None:
+            self.requests = []
+            return
+        await self.send()
+
+    async def send(self):
+        """
+        The coroutine version of Batch.send. The $batch requests are sent one after the other, like in Batch.
+        """
+        queued, self.requests = self.requests, []
+        for chunk in self.chunks(queued):
+            await self.send_chunk(chunk)
+        return self.finish(queued)
+
+    async def send_chunk(self, chunk):
+        url, json_dict = self.chunk_request(chunk)
+        try:
+            response = await self.service.execute('post', url, json=json_dict, headers=self.BATCH_HEADERS)
+            responses = self.service.decode_json(response).get('responses', [])
+        except (requests.exceptions.HTTPError, ValueError, AttributeError) as e:
+            self.fail_chunk(chunk, e)
+            return
+        self.process_responses(chunk, responses)
@@ -0,0 +1,110 @@
+# Copyright (C) 2021 Fraunhofer Institut IOSB, Fraunhoferstr. 1, D 76131
+# Karlsruhe, Germany.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+class JsonCodec:
+    """
+    Encodes request bodies and decodes response bodies, using the json module of the standard library.
+    loads raises a ValueError if the data is not valid json.
+    """
+    name = 'json'
+    module = json
+
+    def dumps(self, value):
+        return json.dumps(value).encode('utf-8')
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class OrjsonCodec(JsonCodec):
+    name = 'orjson'
+    module = orjson
+
+    def dumps(self, value):
+        try:
+            return orjson.dumps(value)
+        except TypeError:
+            # e.g. integers beyond 64 bit, which only the standard library encodes
+            return super().dumps(value)
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+
+class MsgspecCodec(JsonCodec):
+    name = 'msgspec'
+    module = msgspec
+
+    def __init__(self):
+        self.encoder = msgspec.json.Encoder()
+        self.decoder = msgspec.json.Decoder()
+
+    def dumps(self, value):
+        return self.encoder.encode(value)
+
+    def loads(self, data):
+        try:
+            return self.decoder.decode(data)
+        except msgspec.DecodeError as e:
+            raise ValueError(str(e)) from e
+
+
+class UjsonCodec(JsonCodec):
+    name = 'ujson'
+    module = ujson
+
+    def dumps(self, value):
+        return ujson.dumps(value, ensure_ascii=False).encode('utf-8')
+
+    def loads(self, data):
+        return ujson.loads(data)
+
+
+CODECS = {codec_class.name: codec_class for codec_class in (OrjsonCodec, MsgspecCodec, UjsonCodec, JsonCodec)}
+
+
+def create_codec(codec=None):
+    """
+    Returns the codec with the given name ('orjson', 'msgspec', 'ujson' or 'json'). If codec is None, the fastest
+    installed one is selected in this order. Codec instances are returned as they are.
+    """
+    if isinstance(codec, JsonCodec):
+        return codec
+    if codec is None:
+        return next(codec_class() for codec_class in CODECS.values() if codec_class.module is not None)
+    if codec not in CODECS:
+        raise ValueError('codec should be one of {} or a JsonCodec'.format(', '.join(CODECS)))
+    if CODECS[codec].module is None:
+        raise ValueError('codec {} is not installed'.format(codec))
+    return CODECS[codec]()
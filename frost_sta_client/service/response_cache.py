@@ -0,0 +1,314 @@
+# Copyright (C) 2021 Fraunhofer Institut IOSB, Fraunhoferstr. 1, D 76131
+# Karlsruhe, Germany.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import base64
+import collections
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from furl import furl
+
+from frost_sta_client.model.ext.entity_type import EntityTypes
+
+
+class CacheEntry:
+    """
+    A cached GET response: the status, headers and body received from the server and the time it was stored at
+    """
+
+    def __init__(self, url, status_code, headers, content, encoding=None, stored_at=None):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.encoding = encoding
+        self.stored_at = time.time() if stored_at is None else stored_at
+
+    @classmethod
+    def from_response(cls, url, response):
+        return cls(url, response.status_code, dict(response.headers), response.content,
+                   getattr(response, 'encoding', None))
+
+    def is_fresh(self, ttl):
+        return time.time() - self.stored_at < ttl
+
+    def validators(self):
+        """
+        Returns the headers to revalidate this entry with a conditional request, empty if the server sent neither
+        an ETag nor a Last-Modified header
+        """
+        headers = CaseInsensitiveDict(self.headers)
+        validators = {}
+        if headers.get('ETag') is not None:
+            validators['If-None-Match'] = headers['ETag']
+        if headers.get('Last-Modified') is not None:
+            validators['If-Modified-Since'] = headers['Last-Modified']
+        return validators
+
+    def to_response(self):
+        response = requests.models.Response()
+        response.status_code = self.status_code
+        response.headers = CaseInsensitiveDict(self.headers)
+        response.url = self.url
+        response.encoding = self.encoding
+        response._content = self.content
+        return response
+
+    def to_json_dict(self):
+        return {'url': self.url, 'status_code': self.status_code, 'headers': self.headers,
+                'content': base64.b64encode(self.content).decode('ascii'), 'encoding': self.encoding,
+                'stored_at': self.stored_at}
+
+    @classmethod
+    def from_json_dict(cls, value):
+        return cls(value['url'], value['status_code'], value['headers'], base64.b64decode(value['content']),
+                   value.get('encoding'), value['stored_at'])
+
+
+class ResponseCache:
+    """
+    Caches the responses of GET requests sent by a SensorThingsService, e.g. of find() and Query.list().
+
+    A response is served from the cache for ttl seconds. After that it is revalidated with If-None-Match and
+    If-Modified-Since if the server sent an ETag or Last-Modified header, otherwise it is fetched again. At most
+    max_entries responses are kept in memory, the least recently used ones are dropped first. If a directory is
+    given, the responses are also stored there, so they outlive the process.
+
+    Requests other than GET that are sent through the service invalidate all cached responses related to the
+    entity types they modify, including the ones created by a deep insert.
+    """
+
+    def __init__(self, ttl=60, max_entries=1024, directory=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        # maps the files in directory to the url they cache, so invalidating does not need to read them
+        self._files = {}
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self._index_directory()
+
+    @property
+    def ttl(self):
+        return self._ttl
+
+    @ttl.setter
+    def ttl(self, value):
+        if not isinstance(value, (int, float)) or value < 0:
+            raise ValueError('ttl should be a non-negative number of seconds!')
+        self._ttl = value
+
+    @property
+    def max_entries(self):
+        return self._max_entries
+
+    @max_entries.setter
+    def max_entries(self, value):
+        if not isinstance(value, int) or value < 1:
+            raise ValueError('max_entries should be a positive int!')
+        self._max_entries = value
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, url):
+        """
+        Returns a tuple of the cached response, if it is still fresh, and the headers to revalidate a stale one
+        """
+        entry = self.get(url)
+        if entry is None:
+            self.misses += 1
+            return None, {}
+        if entry.is_fresh(self.ttl):
+            self.hits += 1
+            return entry.to_response(), {}
+        self.misses += 1
+        return None, entry.validators()
+
+    def update(self, url, response):
+        """
+        Stores the response received for url and returns the response to hand to the caller, which is the cached
+        one if the server answered with 304 Not Modified
+        """
+        if response.status_code == 304:
+            entry = self.get(url)
+            if entry is None:
+                return response
+            entry.stored_at = time.time()
+            self.put(entry)
+            return entry.to_response()
+        if response.status_code != 200 or not isinstance(getattr(response, 'content', None), bytes):
+            return response
+        if 'no-store' in CaseInsensitiveDict(response.headers).get('Cache-Control', ''):
+            return response
+        self.put(CacheEntry.from_response(url, response))
+        return response
+
+    def get(self, url):
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+                return entry
+        entry = self._read(url)
+        if entry is not None:
+            with self._lock:
+                self._store(entry)
+        return entry
+
+    def put(self, entry):
+        with self._lock:
+            self._store(entry)
+        self._write(entry)
+
+    def _store(self, entry):
+        self._entries[entry.url] = entry
+        self._entries.move_to_end(entry.url)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, url, body=None):
+        """
+        Removes all responses that may contain entities of the types modified by a request to url with the given json
+        body, e.g. for a patch of Things(1) every cached url mentioning a Thing, including Things(1)/Datastreams or
+        Datastreams?$expand=Thing. The entity types nested in the body of a deep insert are invalidated as well. If
+        the entity type can not be told from url, the whole cache is cleared.
+        """
+        name = self.entity_type_of(url)
+        if name is None:
+            self.clear()
+            return
+        names = {name} | self.entity_types_in(body)
+        if 'Thing' in names and 'Location' in names:
+            # linking Things and Locations makes the server create HistoricalLocations
+            names.add('HistoricalLocation')
+        # both names, since e.g. 'ObservedProperties' does not contain 'ObservedProperty'
+        terms = [entity_type[form] for entity_type in EntityTypes.values() if entity_type['singular'] in names
+                 for form in ('singular', 'plural')]
+        with self._lock:
+            for key in [key for key in self._entries if any(term in key for term in terms)]:
+                del self._entries[key]
+            paths = [path for path, url in self._files.items() if any(term in url for term in terms)]
+        for path in paths:
+            self._remove_file(path)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            paths = list(self._files)
+        for path in paths:
+            self._remove_file(path)
+
+    @staticmethod
+    def entity_types_in(body):
+        """
+        Returns the singular names of the entity types nested in a json body, e.g. {'Datastream', 'Sensor'} for a
+        Thing with Datastreams and their Sensors
+        """
+        names = set()
+        values = [body]
+        while values:
+            value = values.pop()
+            if isinstance(value, list):
+                values.extend(value)
+            elif isinstance(value, dict):
+                for key, nested in value.items():
+                    for entity_type in EntityTypes.values():
+                        if key in (entity_type['singular'], entity_type['plural']):
+                            names.add(entity_type['singular'])
+                            values.append(nested)
+        return names
+
+    @staticmethod
+    def entity_type_of(url):
+        """
+        Returns the singular name of the entity type a request to url operates on, or None if it is unknown
+        """
+        segments = [segment for segment in furl(str(url)).path.segments if segment]
+        if not segments:
+            return None
+        name = segments[-1].split('(', 1)[0]
+        if name == 'CreateObservations':
+            return 'Observation'
+        for entity_type in EntityTypes.values():
+            if name in (entity_type['singular'], entity_type['plural']):
+                return entity_type['singular']
+        return None
+
+    def _path(self, url):
+        return os.path.join(self.directory, hashlib.sha256(url.encode('utf-8')).hexdigest() + '.json')
+
+    def _read(self, url):
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(url), 'r', encoding='utf-8') as f:
+                entry = CacheEntry.from_json_dict(json.load(f))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning('Ignoring unreadable cache file for {}: {}'.format(url, e))
+            return None
+        if entry.url != url:
+            return None
+        with self._lock:
+            self._files[self._path(url)] = url
+        return entry
+
+    def _write(self, entry):
+        if self.directory is None:
+            return
+        path = self._path(entry.url)
+        try:
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(entry.to_json_dict(), f)
+            os.replace(path + '.tmp', path)
+            with self._lock:
+                self._files[path] = entry.url
+        except OSError as e:
+            logging.warning('Could not write cache file for {}: {}'.format(entry.url, e))
+
+    def _index_directory(self):
+        """
+        Reads the urls of the files already in directory, once, when the cache is created
+        """
+        for file_name in os.listdir(self.directory):
+            if not file_name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, file_name)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._files[path] = json.load(f)['url']
+            except (OSError, ValueError, KeyError, TypeError):
+                continue
+
+    def _remove_file(self, path):
+        with self._lock:
+            self._files.pop(path, None)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
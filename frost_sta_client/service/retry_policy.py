@@ -0,0 +1,141 @@
+# Copyright (C) 2021 Fraunhofer Institut IOSB, Fraunhoferstr. 1, D 76131
+# Karlsruhe, Germany.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import datetime
+import email.utils
+import random
+
+
+class RetryPolicy:
+    """
+    Decides whether and when a failed request is sent again. Requests are retried if the server answers with one of
+    the status_codes, or if the connection fails. The n-th retry waits backoff_factor * 2 ** (n - 1) seconds, at most
+    max_backoff, or as long as the Retry-After header of the response asks for. With jitter, a random part of that
+    time is waited instead, so clients that failed together do not retry together.
+
+    Only idempotent methods (GET, HEAD, PUT, DELETE, OPTIONS) are retried by default, since a POST or PATCH whose
+    answer got lost may already have been applied. retry_non_idempotent can be True, or a function
+    (method, url, response, error) -> bool deciding it per request, e.g. for POSTs that are safe to repeat.
+    """
+    IDEMPOTENT_METHODS = frozenset(['get', 'head', 'put', 'delete', 'options'])
+    STATUS_CODES = (429, 502, 503, 504)
+
+    def __init__(self, max_retries=3, backoff_factor=0.5, max_backoff=30, jitter=True, max_elapsed=120,
+                 status_codes=STATUS_CODES, respect_retry_after=True, retry_non_idempotent=False):
+        """
+        Parameters
+        ----------
+        max_retries: int
+            the maximum number of retries of one request
+        backoff_factor: float
+            the number of seconds waited before the first retry, doubled for every further one
+        max_backoff: float
+            the maximum number of seconds waited between two attempts
+        jitter: bool
+            if True, a random time between 0 and the backoff is waited
+        max_elapsed: float
+            no retry is started if it would end later than max_elapsed seconds after the first attempt. None for no
+            limit
+        status_codes: tuple
+            the http status codes that are retried
+        respect_retry_after: bool
+            if True, the Retry-After header of a response is waited for, even if it is longer than max_backoff
+        retry_non_idempotent: bool or callable
+            whether POST and PATCH requests are retried
+        """
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.max_elapsed = max_elapsed
+        self.status_codes = frozenset(status_codes)
+        self.respect_retry_after = respect_retry_after
+        self.retry_non_idempotent = retry_non_idempotent
+
+    @property
+    def max_retries(self):
+        return self._max_retries
+
+    @max_retries.setter
+    def max_retries(self, value):
+        if not isinstance(value, int) or value < 0:
+            raise ValueError('max_retries should be a non-negative int!')
+        self._max_retries = value
+
+    @property
+    def retry_non_idempotent(self):
+        return self._retry_non_idempotent
+
+    @retry_non_idempotent.setter
+    def retry_non_idempotent(self, value):
+        if not isinstance(value, bool) and not callable(value):
+            raise ValueError('retry_non_idempotent should be a bool or callable!')
+        self._retry_non_idempotent = value
+
+    def next_delay(self, method, url, attempt, elapsed, response=None, error=None):
+        """
+        Returns the number of seconds to wait before the request is sent again, or None if it should not be retried.
+        attempt: the number of retries already made
+        elapsed: the number of seconds since the first attempt
+        response: the response, if the server answered
+        error: the connection error, if it did not
+        """
+        if attempt >= self.max_retries:
+            return None
+        if response is not None and response.status_code not in self.status_codes:
+            return None
+        if not self.may_retry(method, url, response, error):
+            return None
+        delay = self.backoff(attempt)
+        retry_after = self.retry_after(response) if self.respect_retry_after else None
+        if retry_after is not None:
+            delay = retry_after
+        if self.max_elapsed is not None and elapsed + delay > self.max_elapsed:
+            return None
+        return delay
+
+    def may_retry(self, method, url, response, error):
+        if method.lower() in self.IDEMPOTENT_METHODS:
+            return True
+        if callable(self.retry_non_idempotent):
+            return bool(self.retry_non_idempotent(method, url, response, error))
+        return self.retry_non_idempotent
+
+    def backoff(self, attempt):
+        delay = min(self.max_backoff, self.backoff_factor * 2 ** attempt)
+        if self.jitter:
+            return random.uniform(0, delay)
+        return delay
+
+    @staticmethod
+    def retry_after(response):
+        """
+        Returns the number of seconds the Retry-After header of the response asks to wait, either given directly or as
+        http date, or None
+        """
+        value = getattr(response, 'headers', None) and response.headers.get('Retry-After', None)
+        if not value:
+            return None
+        value = value.strip()
+        if value.isdigit():
+            return float(value)
+        try:
+            date = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if date.tzinfo is None:
+            date = date.replace(tzinfo=datetime.timezone.utc)
+        return max(0.0, (date - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
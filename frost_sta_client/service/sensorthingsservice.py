@@ -15,20 +15,124 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import requests
+from requests.adapters import HTTPAdapter
 from furl import furl
 import logging
+import threading
+import time
 
 from frost_sta_client.dao import *
 from frost_sta_client.service import auth_handler
+from frost_sta_client.service import batch
+from frost_sta_client.service import json_codec
+from frost_sta_client.service import response_cache
+from frost_sta_client.service import retry_policy
+from frost_sta_client.service import upsert_cache
 from frost_sta_client.model.ext import entity_type
+from frost_sta_client.model.ext import identity_map
 
 
 class SensorThingsService:
 
-    def __init__(self, url, auth_handler=None, proxies=None):
+    def __init__(self, url, auth_handler=None, proxies=None, pool_connections=10, pool_maxsize=10,
+                 pool_block=False, keep_alive=True, adapter=None, trusted_decode=False, codec=None, cache=None,
+                 identity_map=None, track_changes=False, upsert_cache=None,
+                 retry_policy=None):
+        """
+        Parameters
+        ----------
+        url: str
+            the base url of the SensorThings service, e.g. 'https://example.org/FROST-Server/v1.1'
+        auth_handler: AuthHandler
+        proxies: dict
+        pool_connections: int
+            the number of per-host connection pools to cache
+        pool_maxsize: int
+            the maximum number of connections kept alive per host
+        pool_block: bool
+            whether to block instead of opening extra connections when a pool is exhausted
+        keep_alive: bool
+            if False, every request asks the server to close the connection afterwards
+        adapter: requests.adapters.BaseAdapter
+            a custom transport adapter, mounted instead of the default pooled HTTPAdapter
+        trusted_decode: bool
+            if True, entities received from the server are filled without the validation of the property setters.
+            Can be overridden per query with Query.trusted
+        codec: str or JsonCodec
+            the json codec for request and response bodies: 'orjson', 'msgspec', 'ujson' or 'json'. By default the
+            fastest installed one is used
+        cache: ResponseCache
+            if given, the responses of GET requests are cached and revalidated with it
+        identity_map: IdentityMap or bool
+            if given (or True, for a new one), decoded entities of the same type and id resolve to one shared
+            instance. Can be overridden per query with Query.deduplicate
+        track_changes: bool
+            if True, entities loaded with find or a query and created entities are marked clean, so their changes can
+            be sent with save_changes of their DAO
+        upsert_cache: UpsertCache
+            remembers the ids and properties of the entities written with upsert of a DAO. By default a new one is
+            kept in memory, give an UpsertCache with a path to persist it
+        retry_policy: RetryPolicy or bool
+            if given (or True, for the default one), requests failing with a connection error or a status like 503
+            are sent again after a backoff
+        """
         self.url = url
         self.auth_handler = auth_handler
         self.proxies = proxies
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.keep_alive = keep_alive
+        self.adapter = adapter
+        self.trusted_decode = trusted_decode
+        self.codec = codec
+        self.cache = cache
+        self.identity_map = identity_map
+        self.track_changes = track_changes
+        self.upsert_cache = upsert_cache
+        self.retry_policy = retry_policy
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def session(self):
+        """
+        The requests.Session used for all requests of this service. It is created on first use and keeps its
+        connections alive, so consecutive requests to the same host reuse them.
+        """
+        if self._session is None:
+            with self._session_lock:
+                # threads like prefetchers and create_many workers may ask for the session at the same time
+                if self._session is None:
+                    self._session = self.create_session()
+        return self._session
+
+    def create_session(self):
+        session = requests.Session()
+        adapter = self.adapter
+        if adapter is None:
+            adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize,
+                                  pool_block=self.pool_block)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        if not self.keep_alive:
+            session.headers['Connection'] = 'close'
+        return session
+
+    def close(self):
+        """
+        Closes the connection pool. A new one is created if the service is used again afterwards.
+        """
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
 
     @property
     def url(self):
@@ -72,19 +176,163 @@ class SensorThingsService:
         elif not isinstance(value, dict):
             raise ValueError('Proxies must be a Dictionary!')
         self._proxies = value
-    
-    
+
+    @property
+    def adapter(self):
+        return self._adapter
+
+    @adapter.setter
+    def adapter(self, value):
+        if value is None or isinstance(value, requests.adapters.BaseAdapter):
+            self._adapter = value
+            return
+        raise ValueError('adapter should be of type requests.adapters.BaseAdapter!')
+
+    @property
+    def codec(self):
+        return self._codec
+
+    @codec.setter
+    def codec(self, value):
+        self._codec = json_codec.create_codec(value)
+
+    @property
+    def cache(self):
+        return self._cache
+
+    @cache.setter
+    def cache(self, value):
+        if value is None or isinstance(value, response_cache.ResponseCache):
+            self._cache = value
+            return
+        raise ValueError('cache should be of type ResponseCache!')
+
+    @property
+    def identity_map(self):
+        return self._identity_map
+
+    @identity_map.setter
+    def identity_map(self, value):
+        if value is None or value is False:
+            self._identity_map = None
+            return
+        if value is True:
+            value = identity_map.IdentityMap()
+        if isinstance(value, identity_map.IdentityMap):
+            self._identity_map = value
+            return
+        raise ValueError('identity_map should be of type IdentityMap or bool!')
+
+    @property
+    def upsert_cache(self):
+        return self._upsert_cache
+
+    @upsert_cache.setter
+    def upsert_cache(self, value):
+        if value is None:
+            value = upsert_cache.UpsertCache()
+        if not isinstance(value, upsert_cache.UpsertCache):
+            raise ValueError('upsert_cache should be of type UpsertCache!')
+        self._upsert_cache = value
+
+    @property
+    def retry_policy(self):
+        return self._retry_policy
+
+    @retry_policy.setter
+    def retry_policy(self, value):
+        if value is None or value is False:
+            self._retry_policy = None
+            return
+        if value is True:
+            value = retry_policy.RetryPolicy()
+        if isinstance(value, retry_policy.RetryPolicy):
+            self._retry_policy = value
+            return
+        raise ValueError('retry_policy should be of type RetryPolicy or bool!')
+
+    def encode_json_body(self, kwargs):
+        """
+        Replaces the json argument of a request by the body encoded with the codec of the service
+        """
+        if kwargs.get('json', None) is None:
+            return kwargs
+        kwargs = dict(kwargs)
+        headers = dict(kwargs.get('headers', None) or {})
+        if not any(key.lower() == 'content-type' for key in headers):
+            headers['Content-Type'] = 'application/json'
+        kwargs['headers'] = headers
+        kwargs['data'] = self.codec.dumps(kwargs.pop('json'))
+        return kwargs
+
+    def decode_json(self, response):
+        """
+        Decodes the json body of a response with the codec of the service. Raises a ValueError if the body is no
+        valid json.
+        """
+        content = getattr(response, 'content', None)
+        if not isinstance(content, bytes):
+            return response.json()
+        return self.codec.loads(content)
+
     def execute(self, method, url, **kwargs):
+        if self.cache is None:
+            return self.send(method, url, **kwargs)
+        if method.lower() != 'get':
+            try:
+                return self.send(method, url, **kwargs)
+            finally:
+                self.cache.invalidate(str(url), kwargs.get('json', None))
+        cached, validators = self.cache.lookup(str(url))
+        if cached is not None:
+            return cached
+        if validators:
+            kwargs['headers'] = dict(kwargs.get('headers', None) or {}, **validators)
+        return self.cache.update(str(url), self.send(method, url, **kwargs))
+
+    def send(self, method, url, **kwargs):
+        """
+        Sends a request to the server, bypassing the response cache. Failed requests are retried as the retry policy
+        allows.
+        """
+        kwargs = self.encode_json_body(kwargs)
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            try:
+                response = self.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                delay = self.retry_delay(method, url, attempt, started, error=e)
+                if delay is None:
+                    raise e
+            else:
+                delay = None
+                if response.status_code >= 400:
+                    delay = self.retry_delay(method, url, attempt, started, response=response)
+                if delay is None:
+                    response.raise_for_status()
+                    return response
+                response.close()
+            attempt += 1
+            time.sleep(delay)
+
+    def request(self, method, url, **kwargs):
         if self.auth_handler is not None:
-            response = requests.request(method, url, proxies=self.proxies, auth=self.auth_handler.add_auth_header(), **kwargs)
-        else:
-            response = requests.request(method, url, proxies=self.proxies, **kwargs)
-        try:
-            response.raise_for_status()
-        except requests.exceptions.HTTPError as e:
-            raise e
+            return self.session.request(method, url, proxies=self.proxies, auth=self.auth_handler.add_auth_header(),
+                                        **kwargs)
+        return self.session.request(method, url, proxies=self.proxies, **kwargs)
 
-        return response
+    def retry_delay(self, method, url, attempt, started, response=None, error=None):
+        """
+        Returns the number of seconds to wait before retrying a failed request, or None if it is not retried
+        """
+        if self.retry_policy is None:
+            return None
+        delay = self.retry_policy.next_delay(method, url, attempt, time.monotonic() - started, response, error)
+        if delay is not None:
+            reason = error if response is None else 'status-code {}'.format(response.status_code)
+            logging.warning('Retrying {} {} in {:.2f}s after {}'.format(method.upper(), url, delay, reason))
+        return delay
 
     def get_path(self, parent, relation):
         if parent is None:
@@ -110,6 +358,13 @@ class SensorThingsService:
     def delete(self, entity):
         entity.get_dao(self).delete(entity)
 
+    def batch(self, max_requests=100):
+        """
+        Returns a Batch, which sends the create, update, patch and delete operations queued on it in $batch requests
+        of at most max_requests operations each, when it is used as a context manager and the context is left
+        """
+        return batch.Batch(self, max_requests)
+
     def actuators(self):
         return actuator.ActuatorDao(self)
 
@@ -0,0 +1,140 @@
+# Copyright (C) 2021 Fraunhofer Institut IOSB, Fraunhoferstr. 1, D 76131
+# Karlsruhe, Germany.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import hashlib
+import json
+import logging
+import os
+import threading
+
+
+class UpsertCache:
+    """
+    Remembers for the entities written by upsert their id and a fingerprint of each property they were written with,
+    by service url, entity type and natural key. An upsert of an entity whose properties match the fingerprints sends
+    no request at all, one of a changed entity only the properties that differ. If a path is given, the cache is
+    loaded from and saved to that json file, so it survives restarts.
+    """
+    # the entity types the server deletes together with an entity of the given type
+    CASCADES = {'Thing': ('Datastream', 'MultiDatastream', 'HistoricalLocation', 'TaskingCapability'),
+                'Location': ('HistoricalLocation',),
+                'Sensor': ('Datastream', 'MultiDatastream'),
+                'ObservedProperty': ('Datastream', 'MultiDatastream'),
+                'Datastream': ('Observation',),
+                'MultiDatastream': ('Observation',),
+                'FeatureOfInterest': ('Observation',),
+                'Actuator': ('TaskingCapability',),
+                'TaskingCapability': ('Task',)}
+
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = {}
+        self.lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def fingerprint(state):
+        """
+        Returns a dict from each property of the state to a hash of its value
+        """
+        return {name: UpsertCache.value_fingerprint(value) for name, value in state.items()}
+
+    @staticmethod
+    def value_fingerprint(value):
+        data = json.dumps(value, sort_keys=True, default=str)
+        return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def changed_properties(fingerprint, state):
+        """
+        Returns the properties of state whose values do not match the fingerprint, all of them if the fingerprint is
+        one of an older cache file
+        """
+        if not isinstance(fingerprint, dict):
+            return dict(state)
+        return {name: value for name, value in state.items()
+                if fingerprint.get(name, None) != UpsertCache.value_fingerprint(value)}
+
+    @staticmethod
+    def entry_key(service_url, entity_type, natural_key):
+        return str(service_url).rstrip('/'), entity_type, json.dumps(list(natural_key), default=str)
+
+    def get(self, service_url, entity_type, natural_key):
+        """
+        Returns the (id, fingerprint) tuple stored for the natural key, or None. The fingerprint is a dict from
+        property name to the hash of its value.
+        """
+        with self.lock:
+            return self.entries.get(self.entry_key(service_url, entity_type, natural_key), None)
+
+    def put(self, service_url, entity_type, natural_key, entity_id, state):
+        with self.lock:
+            self.entries[self.entry_key(service_url, entity_type, natural_key)] = (entity_id, self.fingerprint(state))
+
+    def forget(self, service_url, entity_type, entity_id):
+        """
+        Removes the entries of a deleted entity, and all entries of the entity types deleted together with it
+        """
+        url = str(service_url).rstrip('/')
+        with self.lock:
+            for key in [key for key, (cached_id, _) in self.entries.items()
+                        if key[:2] == (url, entity_type) and cached_id == entity_id]:
+                del self.entries[key]
+        for cascaded in self.CASCADES.get(entity_type, ()):
+            self.forget_type(service_url, cascaded)
+
+    def forget_type(self, service_url, entity_type):
+        """
+        Removes the entries of all entities of a type, e.g. after a filtered delete of that collection
+        """
+        url = str(service_url).rstrip('/')
+        with self.lock:
+            for key in [key for key in self.entries if key[:2] == (url, entity_type)]:
+                del self.entries[key]
+        for cascaded in self.CASCADES.get(entity_type, ()):
+            self.forget_type(service_url, cascaded)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning('Ignoring unreadable upsert cache {}: {}'.format(self.path, e))
+            return
+        with self.lock:
+            for service_url, types in data.items():
+                for entity_type, entries in types.items():
+                    for natural_key, (entity_id, fingerprint) in entries.items():
+                        self.entries[(service_url, entity_type, natural_key)] = (entity_id, fingerprint)
+
+    def save(self):
+        if self.path is None:
+            return
+        data = {}
+        with self.lock:
+            for (service_url, entity_type, natural_key), value in self.entries.items():
+                data.setdefault(service_url, {}).setdefault(entity_type, {})[natural_key] = list(value)
+        with open(self.path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(self.path + '.tmp', self.path)
@@ -14,13 +14,18 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import jsonpickle
+import collections
 import datetime
-from dateutil.parser import isoparse
-import geojson
+import functools
+import importlib
 import logging
+import re
 import sys
+import threading
 import frost_sta_client.model.ext.entity_list
+import frost_sta_client.model.ext.entity_type
+
+_MISSING = object()
 
 
 def extract_value(location):
@@ -37,17 +42,139 @@ def transform_entity_to_json_dict(entity):
         data = entity.__dict__
     return data
 
+def camel_case(attribute):
+    """
+    Returns the SensorThings name of an entity attribute, e.g. 'encodingType' for 'encoding_type'
+    """
+    first, *rest = attribute.split('_')
+    return first + ''.join(part.capitalize() for part in rest)
+
+
 def class_from_string(string):
     module_name, class_name = string.rsplit(".", 1)
-    return getattr(sys.modules[module_name], class_name)
+    module = sys.modules.get(module_name, None)
+    if module is None:
+        module = importlib.import_module(module_name)
+    return getattr(module, class_name)
 
-def transform_json_to_entity(json_response, entity_class):
+
+def configure_jsonpickle():
+    """
+    Sets demjson3 as the preferred backend of jsonpickle, which keeps the precision of long floats, and returns
+    the jsonpickle module. Also called on first access of frost_sta_client.jsonpickle.
+    """
+    import jsonpickle
+    jsonpickle.load_backend('demjson3', 'encode', 'decode', 'JSONDecodeError')
+    jsonpickle.set_preferred_backend('demjson3')
+    jsonpickle.set_decoder_options("demjson3", decode_float=float)
+    return jsonpickle
+
+def transform_json_to_entity(json_response, entity_class, trusted=False, identity_map=None):
+    """
+    Creates an entity of the given class from its json representation. If trusted is True, the json is assumed to
+    come from the server and is stored without the validation of the property setters. If an IdentityMap is given,
+    an entity of the same class and id decoded before is returned instead, updated with the properties and relations
+    contained in the json, and the relations of the entity are decoded through the map as well.
+    """
     cl = class_from_string(entity_class)
+    if identity_map is not None:
+        known = identity_map.get(cl, json_response)
+        if known is not None:
+            return merge_json_into_entity(known, json_response, trusted, identity_map)
     obj = cl()
-    obj.__setstate__(json_response)
+    if trusted:
+        obj.set_trusted_state(json_response)
+    else:
+        obj.__setstate__(json_response)
+    if identity_map is not None:
+        obj.set_identity_map(identity_map)
+        obj = identity_map.add(obj)
     return obj
 
-def transform_json_to_entity_list(json_response, entity_class):
+def merge_json_into_entity(entity, json_response, trusted=False, identity_map=None):
+    """
+    Updates an entity with the properties and relations contained in json_response. Properties missing in the json,
+    e.g. because of a narrower $select, keep their values, relations that are not expanded are kept as well.
+    If the identity_map knows the json the entity was last decoded from, only the keys that differ from it are
+    applied, so that decoding an unchanged entity again costs one comparison of the json.
+    """
+    last_state = identity_map.get_state(entity) if identity_map is not None else None
+    new_state = json_response
+    if last_state is not None:
+        changed = [key for key, value in json_response.items() if last_state.get(key, _MISSING) != value]
+        if len(changed) == 0:
+            return entity
+        new_state = dict(last_state, **json_response)
+        if apply_changed_keys(entity, json_response, changed, trusted, identity_map):
+            identity_map.set_state(entity, new_state)
+            return entity
+    state = entity.get_property_state()
+    if entity.self_link:
+        state['@iot.selfLink'] = entity.self_link
+    state.update(json_response)
+    if trusted:
+        entity.set_trusted_state(state)
+    else:
+        entity.__setstate__(state)
+    if identity_map is not None:
+        identity_map.set_state(entity, new_state)
+        entity.set_identity_map(identity_map)
+    return entity
+
+def apply_changed_keys(entity, json_response, changed, trusted, identity_map):
+    """
+    Sets only the attributes of the entity that belong to the changed keys of json_response, after decoding them on a
+    scratch instance of the same class. The keys of a relation ('Datastreams', 'Datastreams@iot.nextLink', ...) are
+    decoded together. Returns False if a key does not belong to an attribute of the entity.
+    """
+    slots = entity_slots(type(entity))
+    names = set()
+    attributes = []
+    for key in changed:
+        name = key.split('@', 1)[0]
+        if name == '':
+            if key != '@iot.selfLink':
+                continue
+            attribute = '_self_link'
+        else:
+            attribute = attribute_for_key(name)
+            names.add(name)
+        if attribute not in slots:
+            return False
+        attributes.append(attribute)
+    state = {key: value for key, value in json_response.items() if key.split('@', 1)[0] in names}
+    state['@iot.id'] = entity.id
+    if '@iot.selfLink' in json_response:
+        state['@iot.selfLink'] = json_response['@iot.selfLink']
+    entity_class = type(entity)
+    # the entity classes fill all attributes with their defaults in __new__, so the scratch can skip __init__
+    scratch = entity_class.__new__(entity_class) if entity_class.__new__ is not object.__new__ else entity_class()
+    for attribute in attributes:
+        setattr(scratch, attribute, _MISSING)
+    if trusted:
+        scratch.set_trusted_state(state)
+    else:
+        scratch.__setstate__(state)
+    if any(name[:1].isupper() for name in names):
+        scratch.set_identity_map(identity_map)
+    for attribute in attributes:
+        value = getattr(scratch, attribute)
+        if value is not _MISSING:
+            setattr(entity, attribute, value)
+    return True
+
+@functools.lru_cache(maxsize=None)
+def entity_slots(entity_class):
+    return frozenset(slot for cls in entity_class.__mro__ for slot in getattr(cls, '__slots__', ()))
+
+@functools.lru_cache(maxsize=None)
+def attribute_for_key(name):
+    """
+    Returns the attribute holding the json key of an entity, e.g. '_phenomenon_time' for 'phenomenonTime'
+    """
+    return '_' + re.sub('(?<!^)(?=[A-Z])', '_', name).lower()
+
+def transform_json_to_entity_list(json_response, entity_class, trusted=False, identity_map=None):
     entity_list = frost_sta_client.model.ext.entity_list.EntityList(entity_class)
     result_list = []
     if isinstance(json_response, dict):
@@ -61,52 +188,156 @@ def transform_json_to_entity_list(json_response, entity_class):
         response_list = json_response
     else:
         raise ValueError("expected json as a dict or list to transform into entity list")
-    entity_list.entities = [transform_json_to_entity(item, entity_list.entity_class) for item in response_list]
+    if trusted:
+        entity_list._entities = [transform_json_to_entity(item, entity_list.entity_class, True, identity_map)
+                                 for item in response_list]
+    else:
+        entity_list.entities = [transform_json_to_entity(item, entity_list.entity_class, False, identity_map)
+                                for item in response_list]
+    return entity_list
+
+
+def transform_json_to_related_entity_list(state, relation, entity_type_name, trusted=False, identity_map=None):
+    """
+    Creates the EntityList of an expanded relation (e.g. 'Observations') of an entity's json, including its
+    nextLink and count. Returns None if the relation is not expanded.
+    """
+    if not isinstance(state.get(relation, None), list):
+        return None
+    entity_class = frost_sta_client.model.ext.entity_type.EntityTypes[entity_type_name]['class']
+    entity_list = transform_json_to_entity_list(state[relation], entity_class, trusted, identity_map)
+    entity_list.next_link = state.get(relation + "@iot.nextLink", None)
+    entity_list.count = state.get(relation + "@iot.count", None)
     return entity_list
 
 
+def transform_json_to_related_entity(state, relation, entity_type_name, trusted=False, identity_map=None):
+    if state.get(relation, None) is None:
+        return None
+    entity_class = frost_sta_client.model.ext.entity_type.EntityTypes[entity_type_name]['class']
+    return transform_json_to_entity(state[relation], entity_class, trusted, identity_map)
+
+
+def run_concurrently(function, items, concurrency=1):
+    """
+    Calls function for every item, with up to concurrency calls running in parallel threads.
+    Returns a list of (result, error) tuples in the order of items, error being None for successful calls.
+    """
+    def call(item):
+        try:
+            return function(item), None
+        except Exception as e:
+            return None, e
+
+    items = list(items)
+    if concurrency <= 1 or len(items) <= 1:
+        return [call(item) for item in items]
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(items))) as executor:
+        return list(executor.map(call, items))
+
+
+class DatetimeCache:
+    """
+    A bounded, thread safe LRU cache from time (interval) strings to their normalized isoformat. The normalized
+    string is cached as well, so serializing an already normalized value does not parse it again.
+    """
+
+    def __init__(self, max_size=16384):
+        self.max_size = max_size
+        self.values = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, value):
+        with self.lock:
+            normalized = self.values.get(value, None)
+            if normalized is not None:
+                self.values.move_to_end(value)
+                self.hits += 1
+                return normalized
+            self.misses += 1
+        normalized = normalize_datetime_string(value)
+        with self.lock:
+            self.values[value] = normalized
+            self.values[normalized] = normalized
+            while len(self.values) > self.max_size:
+                self.values.popitem(last=False)
+        return normalized
+
+    def clear(self):
+        with self.lock:
+            self.values.clear()
+            self.hits = 0
+            self.misses = 0
+
+
 def check_datetime(value, time_entity):
+    """
+    Validates a time (interval) and returns the value to store: strings in their normalized isoformat, so that
+    serializing them later is a cache hit, other values unchanged.
+    """
     try:
-        parse_datetime(value)
+        normalized = parse_datetime(value)
     except ValueError as e:
         logging.error(f"error during {time_entity} check")
         raise e
+    if isinstance(value, str):
+        return normalized
     return value
 
 
+def parse_iso_datetime(value):
+    """
+    Parses an ISO 8601 string into a datetime, with datetime.fromisoformat where possible and the slower but more
+    lenient dateutil isoparse otherwise.
+    """
+    try:
+        return datetime.datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith('Z') else value)
+    except ValueError:
+        from dateutil.parser import isoparse
+        return isoparse(value)
+
+
+def normalize_datetime_string(value):
+    if '/' in value:
+        try:
+            times = value.split('/')
+            if len(times) != 2:
+                raise ValueError("If the time interval is provided as a string,"
+                                 " it should be in isoformat")
+            result = [parse_iso_datetime(times[0]),
+                      parse_iso_datetime(times[1])]
+        except ValueError:
+            raise ValueError("If the time entity interval is provided as a string,"
+                             " it should be in isoformat")
+        return result[0].isoformat() + '/' + result[1].isoformat()
+    try:
+        result = parse_iso_datetime(value)
+    except ValueError:
+        raise ValueError("If the phenomenon time is provided as string, it should be in isoformat")
+    return result.isoformat()
+
+
 def parse_datetime(value) -> str:
     if value is None:
         return value
     if isinstance(value, str):
-        if '/' in value:
-            try:
-                times = value.split('/')
-                if len(times) != 2:
-                    raise ValueError("If the time interval is provided as a string,"
-                                     " it should be in isoformat")
-                result = [isoparse(times[0]),
-                          isoparse(times[1])]
-            except ValueError:
-                raise ValueError("If the time entity interval is provided as a string,"
-                                 " it should be in isoformat")
-            result = result[0].isoformat() + '/' + result[1].isoformat()
-            return result
-        else:
-            try:
-                result = isoparse(value)
-            except ValueError:
-                raise ValueError("If the phenomenon time is provided as string, it should be in isoformat")
-            result = result.isoformat()
-            return result
+        return datetime_cache.get(value)
     if isinstance(value, datetime.datetime):
         return value.isoformat()
     if isinstance(value, list) and all(isinstance(v, datetime.datetime) for v in value):
-        return value[0].isoformat() + value[1].isoformat()
+        return value[0].isoformat() + '/' + value[1].isoformat()
     else:
         raise ValueError('time entities should consist of one or two datetimes')
 
 
+datetime_cache = DatetimeCache()
+
+
 def process_area(value):
+    import geojson.geometry
     if not isinstance(value, dict):
         raise ValueError("geojsons can only be handled as dictionaries!")
     if value.get("type", None) is None or value.get("coordinates", None) is None:
@@ -22,5 +22,6 @@ setup(
     packages=find_packages(),
     install_requires=['demjson3>=3.0.5', 'furl>=2.1.3', 'geojson>=2.5.0', 'jsonpickle>=2.0.0', 'requests>=2.26.0',
                       'jsonpatch', 'python-dateutil'],
+    extras_require={'async': ['aiohttp>=3.8'], 'fastjson': ['orjson>=3.6'], 'yaml': ['PyYAML>=5.1']},
     keywords=['sta', 'ogc', 'frost', 'sensorthingsapi', 'IoT']
 )
@@ -0,0 +1,238 @@
+import asyncio
+import threading
+import time
+
+import pytest
+import requests
+from frost_sta_client.service.async_sensorthingsservice import AsyncSensorThingsService
+from frost_sta_client.model.ext.entity_list import AsyncEntityList
+from frost_sta_client.model.thing import Thing
+from frost_sta_client.model.observation import Observation
+from frost_sta_client.model.datastream import Datastream
+from test_query_unit import RangeService
+
+
+class MockResponse:
+    def __init__(self, status_code=200, json_data=None, headers=None):
+        self.status_code = status_code
+        self._json = json_data if json_data is not None else {}
+        self.headers = headers or {}
+
+    def json(self):
+        return self._json
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(response=self)
+
+
+class DummyAsyncService(AsyncSensorThingsService):
+    def __init__(self, responses=None):
+        super().__init__('http://example.org/FROST-Server/v1.1')
+        self.responses = list(responses or [])
+        self.calls = []
+
+    async def execute(self, method, url, **kwargs):
+        self.calls.append((method, str(url), kwargs))
+        if method == 'post':
+            return MockResponse(201, headers={'location': 'Things(42)'})
+        if self.responses:
+            return self.responses.pop(0)
+        return MockResponse(200, {"@iot.id": 5, "name": "MyThing"})
+
+
+def test_async_create_and_find():
+    svc = DummyAsyncService()
+
+    async def run():
+        t = Thing(name='X')
+        await svc.create(t)
+        found = await svc.things().find(5)
+        return t, found
+
+    t, found = asyncio.run(run())
+    assert t.id == 42
+    assert t.service is svc
+    assert found.name == 'MyThing'
+    assert svc.calls[-1][0] == 'get'
+
+
+def test_async_patch_and_delete():
+    svc = DummyAsyncService()
+    t = Thing(id=7)
+    asyncio.run(svc.patch(t, [{"op": "replace", "path": "/name", "value": "new"}]))
+    asyncio.run(svc.delete(t))
+    assert [c[0] for c in svc.calls] == ['patch', 'delete']
+    assert svc.calls[0][2]['headers']['Content-type'] == 'application/json-patch+json'
+    with pytest.raises(AttributeError):
+        asyncio.run(svc.update(Thing(name='noid')))
+
+
+def test_async_query_iterates_across_pages():
+    page1 = MockResponse(200, {"value": [{"@iot.id": 1, "name": "A"}],
+                               "@iot.nextLink": "http://example.org/FROST-Server/v1.1/Things?$skip=1"})
+    page2 = MockResponse(200, {"value": [{"@iot.id": 2, "name": "B"}]})
+    svc = DummyAsyncService([page1, page2])
+
+    async def run():
+        entity_list = await svc.things().query().filter("name ne 'C'").list()
+        assert isinstance(entity_list, AsyncEntityList)
+        return [thing.name async for thing in entity_list]
+
+    assert asyncio.run(run()) == ['A', 'B']
+    assert svc.calls[1][1] == 'http://example.org/FROST-Server/v1.1/Things?$skip=1'
+
+
+def test_async_iteration_skips_empty_pages():
+    link = "http://example.org/FROST-Server/v1.1/Things?$skip={}"
+    svc = DummyAsyncService([MockResponse(200, {"value": [], "@iot.nextLink": link.format(1)}),
+                             MockResponse(200, {"value": [], "@iot.nextLink": link.format(2)}),
+                             MockResponse(200, {"value": [{"@iot.id": 3, "name": "C"}]})])
+
+    async def run():
+        entity_list = await svc.things().query().list()
+        return [thing.name async for thing in entity_list]
+
+    assert asyncio.run(run()) == ['C']
+
+
+def test_async_stream_and_iter_pages():
+    link = "http://example.org/FROST-Server/v1.1/Things?$skip={}"
+    pages = [MockResponse(200, {"value": [{"@iot.id": 1, "name": "A"}], "@iot.nextLink": link.format(1)}),
+             MockResponse(200, {"value": [{"@iot.id": 2, "name": "B"}], "@iot.nextLink": link.format(2)}),
+             MockResponse(200, {"value": [{"@iot.id": 3, "name": "C"}]})]
+
+    async def stream():
+        entity_list = await DummyAsyncService(list(pages)).things().query().stream()
+        names = []
+        async for thing in entity_list:
+            names.append(thing.name)
+            assert len(entity_list.entities) == 1
+        return names
+
+    async def iter_pages():
+        entity_list = await DummyAsyncService(list(pages)).things().query().list()
+        return [[thing.name for thing in page.entities] async for page in entity_list.iter_pages()]
+
+    assert asyncio.run(stream()) == ['A', 'B', 'C']
+    assert asyncio.run(iter_pages()) == [['A'], ['B'], ['C']]
+
+
+def test_async_data_array_follows_next_links():
+    page = {"Datastream@iot.navigationLink": "http://example.org/FROST-Server/v1.1/Datastreams(7)",
+            "components": ["id", "result"]}
+    svc = DummyAsyncService([MockResponse(200, {"value": [dict(page, dataArray=[[1, 1.5], [2, 2.5]])],
+                                                "@iot.nextLink": "http://example.org/FROST-Server/v1.1/Observations"
+                                                                 "?$skip=2"}),
+                             MockResponse(200, {"value": [dict(page, dataArray=[[3, 3.5]])]})])
+    document = asyncio.run(svc.observations().query().data_array())
+    assert '%24resultFormat=dataArray' in svc.calls[0][1]
+    assert svc.calls[1][1].endswith('$skip=2')
+    dav, = document.value
+    assert dav.column('result') == [1.5, 2.5, 3.5]
+    assert document.next_link is None
+
+
+class AsyncRangeService(AsyncSensorThingsService):
+    def __init__(self, ids):
+        super().__init__('http://example.org/FROST-Server/v1.1')
+        self.sync_service = RangeService(self.url, ids)
+
+    async def execute(self, method, url, **kwargs):
+        await asyncio.sleep(0)
+        return self.sync_service.execute(method, url, **kwargs)
+
+
+def test_async_list_parallel():
+    svc = AsyncRangeService(list(range(1, 26)))
+    ordered = asyncio.run(svc.things().query().filter("name ne 'x'").list_parallel(workers=3, slices=4))
+    assert [thing.id for thing in ordered.entities] == list(range(1, 26))
+    assert ordered.count == 25
+    unordered = asyncio.run(svc.things().query().list_parallel(ordered=False))
+    assert sorted(thing.id for thing in unordered.entities) == list(range(1, 26))
+    assert asyncio.run(AsyncRangeService([]).things().query().list_parallel()).entities == []
+
+
+def test_async_relation_daos():
+    svc = DummyAsyncService([MockResponse(200, {"value": [{"@iot.id": 3, "result": 1}]})])
+    ds_entity = Datastream(id=5, service=svc)
+    observations = asyncio.run(ds_entity.get_observations().query().list())
+    assert isinstance(observations.entities[0], Observation)
+    assert 'Datastreams(5)/Observations' in svc.calls[-1][1]
+
+
+def test_executor_transport_is_bounded(monkeypatch):
+    monkeypatch.setattr('frost_sta_client.service.async_sensorthingsservice.aiohttp', None)
+    svc = AsyncSensorThingsService('http://example.org/FROST-Server/v1.1', max_concurrency=3)
+    lock = threading.Lock()
+    state = {'active': 0, 'max': 0}
+
+    def fake_request(method, url, **kwargs):
+        with lock:
+            state['active'] += 1
+            state['max'] = max(state['max'], state['active'])
+        time.sleep(0.01)
+        with lock:
+            state['active'] -= 1
+        return MockResponse(200, {"@iot.id": 1})
+
+    monkeypatch.setattr(svc.session, 'request', fake_request)
+
+    async def run():
+        await asyncio.gather(*[svc.things().find(i) for i in range(12)])
+        await svc.aclose()
+
+    asyncio.run(run())
+    assert 1 < state['max'] <= 3
+
+
+def test_async_create_many():
+    svc = DummyAsyncService()
+    things = [Thing(name=str(i)) for i in range(5)]
+    assert asyncio.run(svc.things().create_many(things, concurrency=2)) == things
+    assert all(t.id == 42 for t in things)
+    assert asyncio.run(svc.things().create_many(things, ordered=True)) == things
+
+
+class RaisingAsyncService(DummyAsyncService):
+    async def execute(self, method, url, **kwargs):
+        response = await super().execute(method, url, **kwargs)
+        response.raise_for_status()
+        return response
+
+
+def test_async_query_delete():
+    svc = RaisingAsyncService([MockResponse(200)])
+    assert asyncio.run(svc.things().query().filter("name eq 'x'").delete()) is None
+    assert svc.calls[-1][0] == 'delete' and 'filter=name' in svc.calls[-1][1]
+
+    link = 'http://example.org/FROST-Server/v1.1/Things?$skip=2'
+    svc = RaisingAsyncService([MockResponse(405),
+                             MockResponse(200, {"value": [{"@iot.id": 1}, {"@iot.id": 2}], "@iot.nextLink": link}),
+                             MockResponse(200), MockResponse(200),
+                             MockResponse(200, {"value": [{"@iot.id": 3}]}), MockResponse(200)])
+    assert asyncio.run(svc.things().query().filter("name eq 'x'").delete(workers=2)) == 3
+    deletes = [url for method, url, _ in svc.calls[1:] if method == 'delete']
+    assert deletes == ['http://example.org/FROST-Server/v1.1/Things({})'.format(i) for i in (1, 2, 3)]
+    assert 'id+gt+2' in [url for method, url, _ in svc.calls if method == 'get'][-1]
+
+
+def test_async_upsert():
+    svc = RaisingAsyncService([MockResponse(200, {"value": [{"@iot.id": 5, "name": "old", "description": "d"}]})])
+
+    async def run():
+        things = [Thing(name='old', description='new'), Thing(name='new', description='d'),
+                  Thing(name='new', description='d')]
+        actions = await svc.things().upsert_many(things, concurrency=2)
+        again = await svc.things().upsert(Thing(name='new', description='d'))
+        await svc.things().delete(things[1])
+        return things, actions, again
+
+    things, actions, again = asyncio.run(run())
+    assert actions == ['updated', 'created', 'unchanged'] and again == 'unchanged'
+    assert [thing.id for thing in things] == [5, 42, 42]
+    assert [method for method, _, _ in svc.calls].count('post') == 1
+    writes = {method: kwargs['json'] for method, _, kwargs in svc.calls[1:3]}
+    assert writes == {'patch': {'description': 'new'}, 'post': {'name': 'new', 'description': 'd'}}
+    assert svc.calls[-1][0] == 'delete'
+    assert len(svc.upsert_cache) == 1
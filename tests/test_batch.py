@@ -0,0 +1,130 @@
+import asyncio
+import json
+
+import pytest
+import requests
+from frost_sta_client.service.sensorthingsservice import SensorThingsService
+from frost_sta_client.service.async_sensorthingsservice import AsyncSensorThingsService
+from frost_sta_client.service.batch import BatchError
+from frost_sta_client.model.thing import Thing
+from frost_sta_client.model.datastream import Datastream
+
+BASE = 'http://example.org/FROST-Server/v1.1'
+
+
+class MockResponse:
+    def __init__(self, status_code=200, json_data=None):
+        self.status_code = status_code
+        self.content = json.dumps(json_data).encode('utf-8')
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(response=self)
+
+
+class BatchService(SensorThingsService):
+    """Answers every $batch request by echoing its operations, failing the ones on Things(404)"""
+
+    def __init__(self):
+        super().__init__(BASE)
+        self.calls = []
+
+    def execute(self, method, url, **kwargs):
+        self.calls.append((method, str(url), kwargs))
+        responses = []
+        for number, request in enumerate(kwargs['json']['requests']):
+            if request['url'] == 'Things(404)':
+                responses.append({'id': request['id'], 'status': 404, 'body': {'message': 'Nothing found.'}})
+            elif request['method'] == 'post':
+                responses.append({'id': request['id'], 'status': 201,
+                                  'headers': {'Location': BASE + '/Things({})'.format(100 + number)}})
+            else:
+                responses.append({'id': request['id'], 'status': 200})
+        return MockResponse(200, {'responses': responses})
+
+
+def test_batch_sends_queued_operations_and_fills_ids():
+    svc = BatchService()
+    new_thing = Thing(name='new', description='d')
+    with svc.batch() as batch:
+        created = batch.create(new_thing)
+        batch.patch(Datastream(id=5), [{'op': 'replace', 'path': '/name', 'value': 'x'}])
+        batch.delete(Thing(id=7))
+    assert len(svc.calls) == 1
+    method, url, kwargs = svc.calls[0]
+    assert (method, url) == ('post', BASE + '/$batch')
+    operations = kwargs['json']['requests']
+    assert [(o['method'], o['url']) for o in operations] == [('post', 'Things'), ('patch', 'Datastreams(5)'),
+                                                            ('delete', 'Things(7)')]
+    assert operations[1]['headers'] == {'Content-type': 'application/json-patch+json'}
+    assert operations[0]['body']['name'] == 'new'
+    assert created.status == 201
+    assert new_thing.id == 100
+    assert new_thing.service is svc
+
+
+def test_batch_delete_clears_upsert_cache():
+    svc = BatchService()
+    svc.upsert_cache.put(svc.url, 'Thing', ('a',), 7, {})
+    with svc.batch() as batch:
+        batch.delete(Thing(id=7))
+    assert len(svc.upsert_cache) == 0
+
+
+def test_batch_is_split_by_size_limit_and_reports_failures():
+    svc = BatchService()
+    with pytest.raises(BatchError) as error:
+        with svc.batch(max_requests=2) as batch:
+            for thing_id in (1, 404, 3, 4, 5):
+                batch.update(Thing(id=thing_id, name='n', description='d'))
+    assert len(svc.calls) == 3
+    failed = error.value.failed
+    assert [request.url for request in failed] == ['Things(404)']
+    assert failed[0].status == 404
+    assert isinstance(failed[0].error, requests.exceptions.HTTPError)
+    assert all(request.status == 200 for request in batch.sent if request not in failed)
+
+
+def test_batch_is_discarded_on_exception():
+    svc = BatchService()
+    with pytest.raises(RuntimeError):
+        with svc.batch() as batch:
+            batch.delete(Thing(id=1))
+            raise RuntimeError()
+    assert svc.calls == []
+    with pytest.raises(AttributeError):
+        svc.batch().update(Thing(name='no id'))
+
+
+class AsyncBatchService(AsyncSensorThingsService):
+    def __init__(self):
+        super().__init__(BASE)
+        self.echo = BatchService()
+        self.calls = self.echo.calls
+
+    async def execute(self, method, url, **kwargs):
+        return self.echo.execute(method, url, **kwargs)
+
+
+def test_async_batch_is_sent_when_the_context_is_left():
+    svc = AsyncBatchService()
+    new_thing = Thing(name='new', description='d')
+
+    async def run():
+        async with svc.batch(max_requests=2) as batch:
+            batch.create(new_thing)
+            for thing_id in (404, 3):
+                batch.update(Thing(id=thing_id, name='n', description='d'))
+
+    with pytest.raises(BatchError) as error:
+        asyncio.run(run())
+    assert len(svc.calls) == 2
+    assert [request.url for request in error.value.failed] == ['Things(404)']
+    assert new_thing.id == 100
+
+    batch = svc.batch()
+    batch.delete(Thing(id=7))
+    assert [request.status for request in asyncio.run(batch.send())] == [200]
+    with pytest.raises(TypeError):
+        with svc.batch():
+            pass
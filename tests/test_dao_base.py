@@ -1,3 +1,5 @@
+import threading
+
 import pytest
 import requests
 from frost_sta_client.service.sensorthingsservice import SensorThingsService
@@ -69,3 +71,222 @@ def test_entity_path_formats_string_and_int():
     svc = DummyService()
     assert svc.things().entity_path(1) == 'Things(1)'
     assert svc.things().entity_path('abc') == "Things('abc')"
+
+
+class CountingService(SensorThingsService):
+    """Assigns ascending ids to created Things and rejects the ones named 'bad'"""
+
+    def __init__(self):
+        super().__init__('http://example.org/FROST-Server/v1.1')
+        self.created = []
+        self.lock = threading.Lock()
+
+    def execute(self, method, url, **kwargs):
+        if kwargs['json']['name'] == 'bad':
+            MockResponse(400, {'message': 'bad name'}).raise_for_status()
+        with self.lock:
+            self.created.append(kwargs['json']['name'])
+            location = 'Things({})'.format(len(self.created))
+        return MockResponse(201, headers={'location': location})
+
+
+@pytest.mark.parametrize('concurrency, ordered', [(1, False), (4, False), (4, True)])
+def test_create_many_fills_ids_and_collects_errors(concurrency, ordered):
+    from frost_sta_client.dao.base import CreateManyError
+    svc = CountingService()
+    things = [Thing(name=name, description='d') for name in ['a', 'b', 'bad', 'c', 'd', 'e']]
+    with pytest.raises(CreateManyError) as error:
+        svc.things().create_many(things, concurrency=concurrency, ordered=ordered)
+    assert [entity for entity, _ in error.value.failed] == [things[2]]
+    assert isinstance(error.value.failed[0][1], requests.exceptions.HTTPError)
+    created = [thing for thing in things if thing.name != 'bad']
+    assert sorted(thing.id for thing in created) == [1, 2, 3, 4, 5]
+    assert all(thing.service is svc for thing in created)
+    if ordered:
+        assert [thing.id for thing in created] == [1, 2, 3, 4, 5]
+        assert svc.created == ['a', 'b', 'c', 'd', 'e']
+
+
+def test_create_many_returns_entities():
+    svc = CountingService()
+    things = [Thing(name=str(i), description='d') for i in range(3)]
+    assert svc.things().create_many(iter(things), concurrency=2) == things
+
+
+def test_save_changes_sends_only_changed_properties():
+    from frost_sta_client.dao.base import SaveChangesError
+    svc = DummyService()
+    svc.track_changes = True
+    things = [svc.things().find(5) for _ in range(3)]
+    things[0].name = 'renamed'
+    things[1].properties['k'] = 1
+    untracked = Thing(id=8, name='x')
+    assert svc.things().save_changes(things, concurrency=2) == things[:2]
+    patches = sorted((kwargs['json'] for method, _, kwargs in svc.calls if method == 'patch'), key=str)
+    assert patches == [[{'op': 'add', 'path': '/properties', 'value': {'k': 1}}],
+                       [{'op': 'replace', 'path': '/name', 'value': 'renamed'}]]
+    assert things[0].get_changes() is None
+    with pytest.raises(SaveChangesError) as error:
+        svc.things().save_changes([untracked])
+    assert isinstance(error.value.failed[0][1], ValueError)
+
+
+def test_save_changes_as_merge_patch():
+    svc = DummyService()
+    thing = Thing(id=3, name='a', description='d', properties={'k': 1, 'j': 2})
+    thing.mark_clean()
+    thing.properties['k'] = 5
+    thing.description = None
+    svc.things().save_changes([thing], patch_format='merge-patch')
+    method, url, kwargs = svc.calls[-1]
+    assert (method, url) == ('patch', 'http://example.org/FROST-Server/v1.1/Things(3)')
+    assert kwargs['json'] == {'properties': {'k': 5, 'j': 2}, 'description': None}
+    assert 'headers' not in kwargs
+
+
+class FindService(SensorThingsService):
+    """Serves the Things with the ids 1..10 and 'a', in pages of at most three"""
+
+    def __init__(self):
+        super().__init__('http://example.org/FROST-Server/v1.1')
+        self.filters = []
+
+    def execute(self, method, url, **kwargs):
+        from furl import furl
+        args = furl(str(url)).args
+        statement = args['$filter']
+        self.filters.append(statement)
+        skip = int(args.get('$skip', 0))
+        known = list(range(1, 11)) + ['a']
+        matches = [i for i in known if 'id eq {}'.format(i if isinstance(i, int) else "'a'") in statement.split(' or ')]
+        body = {'value': [{'@iot.id': i} for i in matches[skip:skip + 3]]}
+        if len(matches) > skip + 3:
+            url = furl(str(url))
+            url.args['$skip'] = skip + 3
+            body['@iot.nextLink'] = url.url
+        return MockResponse(200, body)
+
+
+@pytest.mark.parametrize('concurrency', [1, 3])
+def test_find_many_queries_chunks_of_ids(concurrency):
+    svc = FindService()
+    found = svc.things().find_many([3, 'a', 4, 5, 6, 7, 42, 3], chunk_size=4, concurrency=concurrency)
+    assert list(found) == [3, 'a', 4, 5, 6, 7, 42]
+    assert found[42] is None
+    assert all(found[i].id == i for i in [3, 'a', 4, 5, 6, 7])
+    assert found['a'].service is svc
+    assert sorted(svc.filters) == sorted(["id eq 3 or id eq 'a' or id eq 4 or id eq 5"] * 2 +
+                                         ["id eq 6 or id eq 7 or id eq 42"])
+    with pytest.raises(ValueError):
+        svc.things().find_many([1], chunk_size=0)
+
+
+class UpsertService(SensorThingsService):
+    """Stores Things in memory, knows the Thing 'old' with id 1"""
+
+    def __init__(self, upsert_cache=None):
+        super().__init__('http://example.org/FROST-Server/v1.1', upsert_cache=upsert_cache)
+        self.store = {1: {'@iot.id': 1, 'name': 'old', 'description': 'd'}}
+        self.calls = []
+
+    def execute(self, method, url, **kwargs):
+        from furl import furl
+        url = furl(str(url))
+        self.calls.append((method, kwargs.get('json', None)))
+        if method == 'get':
+            names = url.args['$filter'].split(' or ')
+            return MockResponse(200, {'value': [thing for thing in self.store.values()
+                                                if "(name eq '{}')".format(thing['name']) in names]})
+        if method == 'post':
+            if kwargs['json'].get('name', None) is None:
+                MockResponse(400).raise_for_status()
+            thing_id = max(self.store, default=0) + 1
+            self.store[thing_id] = dict(kwargs['json'], **{'@iot.id': thing_id})
+            return MockResponse(201, headers={'location': 'Things({})'.format(thing_id)})
+        if '(' not in str(url.path):
+            self.store.clear()
+            return MockResponse(200)
+        thing_id = int(str(url.path).rsplit('(', 1)[1].rstrip(')'))
+        if thing_id not in self.store:
+            MockResponse(404).raise_for_status()
+        if method == 'delete':
+            del self.store[thing_id]
+        else:
+            self.store[thing_id].update(kwargs['json'])
+        return MockResponse(200)
+
+
+def test_upsert_many_creates_patches_and_skips_unchanged(tmp_path):
+    from frost_sta_client.service.upsert_cache import UpsertCache
+    path = str(tmp_path / 'upsert.json')
+    svc = UpsertService(UpsertCache(path))
+    things = [Thing(name='old', description='changed'), Thing(name='new', description='d')]
+    assert svc.things().upsert_many(things) == ['updated', 'created']
+    assert [method for method, _ in svc.calls] == ['get', 'patch', 'post']
+    assert svc.calls[1][1] == {'description': 'changed'}
+    assert [thing.id for thing in things] == [1, 2]
+
+    svc = UpsertService(UpsertCache(path))
+    svc.store.update({2: {'@iot.id': 2, 'name': 'new', 'description': 'd'}})
+    thing = Thing(name='new', description='d')
+    assert svc.things().upsert(thing) == 'unchanged'
+    assert svc.calls == [] and thing.id == 2 and thing.service is svc
+    assert svc.things().upsert(Thing(name='old', description='again')) == 'updated'
+    assert svc.calls == [('patch', {'description': 'again'})]
+
+    svc.things().delete(thing)
+    assert svc.things().upsert(Thing(name='new', description='d')) == 'created'
+
+
+def test_upsert_many_writes_a_natural_key_once():
+    svc = UpsertService()
+    things = [Thing(name='new', description='d'), Thing(name='old', description='d'),
+              Thing(name='new', description='d'), Thing(name='new', description='e')]
+    assert svc.things().upsert_many(things) == ['created', 'unchanged', 'unchanged', 'updated']
+    assert [method for method, _ in svc.calls] == ['get', 'post', 'patch']
+    assert svc.calls[2][1] == {'description': 'e'}
+    assert [thing.id for thing in things] == [2, 1, 2, 2]
+    assert svc.store[2]['description'] == 'e'
+    svc.calls = []
+    assert svc.things().upsert(Thing(name='new', description='e')) == 'unchanged'
+    assert svc.calls == []
+
+
+def test_upsert_keys_query_and_old_cache_entries():
+    svc = UpsertService()
+    query = svc.things().keys_query([('a', None)], ('name', 'description'))
+    assert query.params['$filter'] == "(name eq 'a' and description eq null)"
+    # a cache file written before the fingerprints were stored per property
+    svc.upsert_cache.entries[svc.upsert_cache.entry_key(svc.url, 'Thing', ('old',))] = (1, 'sha1 of the whole state')
+    assert svc.things().upsert(Thing(name='old', description='d')) == 'updated'
+    assert svc.calls[-1] == ('patch', {'name': 'old', 'description': 'd'})
+
+
+def test_upsert_recreates_deleted_entity_and_collects_errors():
+    from frost_sta_client.dao.base import UpsertError
+    svc = UpsertService()
+    thing = Thing(name='gone', description='d')
+    svc.things().upsert(thing)
+    del svc.store[thing.id]
+    assert svc.things().upsert(Thing(name='gone', description='e')) == 'created'
+    with pytest.raises(UpsertError) as error:
+        svc.things().upsert_many([Thing(name='x', description='d'), Thing(description='no name')])
+    assert [entity.description for entity, _ in error.value.failed] == ['no name']
+
+
+def test_upsert_cache_is_cleared_by_every_delete_and_keyed_by_service(tmp_path):
+    from frost_sta_client.service.upsert_cache import UpsertCache
+    svc = UpsertService()
+    svc.things().upsert(Thing(name='a', description='d'))
+    svc.things().query().filter("name eq 'a'").delete()
+    assert svc.things().upsert(Thing(name='a', description='d')) == 'created'
+
+    cache = UpsertCache(str(tmp_path / 'upsert.json'))
+    cache.put('http://one.org/v1.1/', 'Thing', ('a',), 1, {})
+    cache.put('http://one.org/v1.1', 'Datastream', ('ds',), 2, {})
+    cache.save()
+    cache = UpsertCache(str(tmp_path / 'upsert.json'))
+    assert cache.get('http://one.org/v1.1', 'Thing', ('a',))[0] == 1
+    assert cache.get('http://two.org/v1.1', 'Thing', ('a',)) is None
+    cache.forget('http://one.org/v1.1', 'Thing', 1)
+    assert len(cache) == 0
@@ -19,3 +19,19 @@ def test_set_service_propagates_to_children():
     t.set_service(svc)
     assert t.service is svc
     assert t.locations.entities[0].service is svc
+
+
+def test_entities_are_slotted_and_picklable():
+    import pickle
+    import weakref
+    from frost_sta_client import utils
+    from frost_sta_client.model.entity import Entity
+    for entity_type in EntityTypes.values():
+        entity_class = utils.class_from_string(entity_type['class'])
+        if issubclass(entity_class, Entity):
+            assert not hasattr(entity_class(), '__dict__')
+    t = Thing(id=3, name='T', properties={'a': 1})
+    t.locations = [Location(name='L', encoding_type='application/geo+json')]
+    copy = pickle.loads(pickle.dumps(t))
+    assert copy.__getstate__() == t.__getstate__()
+    assert weakref.ref(t)() is t
@@ -1,3 +1,6 @@
+import time
+
+import pytest
 from frost_sta_client.utils import transform_json_to_entity_list
 from frost_sta_client.service.sensorthingsservice import SensorThingsService
 
@@ -48,3 +51,89 @@ def test_entity_list_iterates_across_pages():
     names = [e.name for e in elist]
     assert names == ['A', 'B', 'C', 'D']
     assert called == [0, 2]
+
+
+class PagedService(SensorThingsService):
+    def __init__(self, url, pages):
+        super().__init__(url)
+        self.pages = pages
+        self.fetched = []
+
+    def execute(self, method, url, **kwargs):
+        self.fetched.append(str(url))
+        return MockResponse(self.pages[str(url)])
+
+
+def make_pages(num_pages, page_size=2):
+    base = 'http://example.org/FROST-Server/v1.1/Things?$skip='
+    pages = {}
+    for p in range(num_pages):
+        page = {"value": [{"@iot.id": p * page_size + i, "name": str(p * page_size + i)} for i in range(page_size)]}
+        if p < num_pages - 1:
+            page["@iot.nextLink"] = base + str((p + 1) * page_size)
+        pages[base + str(p * page_size)] = page
+    return base + '0', pages
+
+
+def test_entity_list_prefetches_following_pages():
+    first, pages = make_pages(5)
+    svc = PagedService('http://example.org/FROST-Server/v1.1', pages)
+    elist = transform_json_to_entity_list(pages[first], 'frost_sta_client.model.thing.Thing')
+    elist.set_service(svc)
+    elist.prefetch = 2
+    it = iter(elist)
+    for _ in range(100):
+        if len(svc.fetched) >= 2:
+            break
+        time.sleep(0.01)
+    time.sleep(0.05)
+    # up to 'prefetch' pages are fetched ahead before the first page has been consumed, and no more
+    assert len(svc.fetched) == 2
+    assert [int(t.name) for t in it] == list(range(10))
+    assert elist.next_link is None
+    assert len(elist.entities) == 10
+
+
+def test_entity_list_prefetch_propagates_errors():
+    first, pages = make_pages(3)
+    del pages[pages[first]["@iot.nextLink"]]
+    svc = PagedService('http://example.org/FROST-Server/v1.1', pages)
+    elist = transform_json_to_entity_list(pages[first], 'frost_sta_client.model.thing.Thing')
+    elist.set_service(svc)
+    elist.prefetch = 1
+    names = []
+    with pytest.raises(KeyError):
+        for thing in elist:
+            names.append(thing.name)
+    assert names == ['0', '1']
+
+
+def test_streaming_entity_list_drops_consumed_pages():
+    first, pages = make_pages(4)
+    pages[first]["@iot.count"] = 8
+    svc = PagedService('http://example.org/FROST-Server/v1.1', pages)
+    elist = transform_json_to_entity_list(pages[first], 'frost_sta_client.model.thing.Thing')
+    elist.set_service(svc)
+    elist.streaming = True
+    called = []
+    elist.step_size = 3
+    elist.callback = lambda idx: called.append(idx)
+    names = []
+    for thing in elist:
+        names.append(int(thing.name))
+        assert len(elist.entities) <= 2
+    assert names == list(range(8))
+    assert called == [0, 3, 6]
+    assert elist.count == 8
+
+
+def test_iter_pages_yields_pages_without_accumulating():
+    first, pages = make_pages(3)
+    svc = PagedService('http://example.org/FROST-Server/v1.1', pages)
+    elist = transform_json_to_entity_list(pages[first], 'frost_sta_client.model.thing.Thing')
+    elist.set_service(svc)
+    elist.prefetch = 1
+    result = [[t.name for t in page.entities] for page in elist.iter_pages()]
+    assert result == [['0', '1'], ['2', '3'], ['4', '5']]
+    assert len(elist.entities) == 2
+    assert elist.next_link is None
@@ -1,4 +1,12 @@
+import datetime
+import json
+import threading
+
 import pytest
+import requests
+from frost_sta_client.service.sensorthingsservice import SensorThingsService
+from frost_sta_client.dao.observation import DataArrayUploadError
+from frost_sta_client.model.ext.data_array_document import DataArrayDocument
 from frost_sta_client.model.ext.data_array_value import DataArrayValue as DAV
 from frost_sta_client.model.observation import Observation
 from frost_sta_client.model.datastream import Datastream
@@ -18,3 +26,95 @@ def test_data_array_value_components_and_add_observation():
     assert 'components' in state and 'dataArray' in state and state['Datastream']['@iot.id'] == 99
     with pytest.raises(ValueError):
         dav.components = components
+
+
+class UploadService(SensorThingsService):
+    def __init__(self, fail_on=None):
+        super().__init__('http://example.org/FROST-Server/v1.1')
+        self.fail_on = fail_on
+        self.posted = []
+        self.lock = threading.Lock()
+
+    def execute(self, method, url, **kwargs):
+        rows = [(dav['Datastream']['@iot.id'], row[1]) for dav in kwargs['json'] for row in dav['dataArray']]
+        with self.lock:
+            self.posted.append(rows)
+        response = requests.models.Response()
+        if self.fail_on in rows:
+            response.status_code = 413
+            response._content = b'{"message": "too large"}'
+            raise requests.exceptions.HTTPError(response=response)
+        response.status_code = 201
+        response._content = json.dumps(['http://example.org/Observations({})'.format(ds * 100 + r)
+                                        for ds, r in rows]).encode()
+        return response
+
+
+def make_document(rows_per_datastream):
+    dad = DataArrayDocument()
+    for ds_id, num_rows in rows_per_datastream:
+        dav = DAV()
+        dav.datastream = Datastream(id=ds_id)
+        dav.components = {DAV.Property.PHENOMENON_TIME, DAV.Property.RESULT}
+        for r in range(num_rows):
+            dav.add_observation(Observation(result=r, phenomenon_time='2023-01-01T00:00:00Z'))
+        dad.add_data_array_value(dav)
+    return dad
+
+
+def test_data_array_document_split_by_rows_and_bytes():
+    dad = make_document([(1, 5), (2, 3)])
+    chunks = dad.split(max_rows=3)
+    assert [c.row_count() for c in chunks] == [3, 3, 2]
+    assert [[dav.datastream.id for dav in c.value] for c in chunks] == [[1], [1, 2], [2]]
+    assert dad.split() and len(dad.split()) == 1
+    small = dad.split(max_bytes=160)
+    assert sum(c.row_count() for c in small) == 8
+    assert all(len(json.dumps([d.__getstate__() for d in c.value])) <= 160 for c in small)
+
+
+def test_chunked_create_merges_results_in_order():
+    svc = UploadService()
+    result = svc.observations().create(make_document([(1, 5), (2, 3)]), max_rows=2, concurrency=3)
+    assert len(svc.posted) == 4
+    assert [o.self_link[-5:] for o in result] == ['(100)', '(101)', '(102)', '(103)', '(104)',
+                                                  '(200)', '(201)', '(202)']
+
+
+def test_chunked_create_reports_failed_chunks():
+    svc = UploadService(fail_on=(1, 3))
+    with pytest.raises(DataArrayUploadError) as info:
+        svc.observations().create(make_document([(1, 5), (2, 3)]), max_rows=3, concurrency=2)
+    error = info.value
+    assert len(svc.posted) == 3
+    assert [o is None for o in error.observations] == [False] * 3 + [True] * 3 + [False] * 2
+    (chunk, exc), = error.failed_chunks
+    assert isinstance(exc, requests.exceptions.HTTPError)
+    svc.fail_on = None
+    retried = svc.observations().create(chunk)
+    assert [o.self_link[-5:] for o in retried] == ['(103)', '(104)', '(200)']
+
+
+def test_data_array_value_from_columns():
+    foi = FeatureOfInterest(id=3)
+    dav = DAV.from_columns(Datastream(id=1), result=(1.5, 2.5),
+                           phenomenon_time=[datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc),
+                                            '2023-01-01T00:00:01Z'],
+                           feature_of_interest=[foi, 4])
+    assert dav.observations == []
+    assert dav.__getstate__() == {'Datastream': {'@iot.id': 1},
+                                  'components': ['phenomenonTime', 'result', 'FeatureOfInterest/id'],
+                                  'dataArray': [['2023-01-01T00:00:00+00:00', 1.5, 3],
+                                                ['2023-01-01T00:00:01Z', 2.5, 4]]}
+    with pytest.raises(ValueError):
+        DAV.from_columns(Datastream(id=1), result=[1, 2], phenomenon_time=['2023-01-01T00:00:00Z'])
+    with pytest.raises(ValueError):
+        DAV.from_columns(Datastream(id=1), temperature=[1])
+
+
+def test_data_array_value_from_numpy_columns():
+    numpy = pytest.importorskip('numpy')
+    times = numpy.array(['2023-01-01T00:00:00', '2023-01-01T00:00:00.010'], dtype='datetime64[ms]')
+    dav = DAV.from_columns(Datastream(id=1), phenomenon_time=times, result=numpy.array([1.0, 2.0]))
+    assert dav.data_array == [['2023-01-01T00:00:00.000Z', 1.0], ['2023-01-01T00:00:00.010Z', 2.0]]
+    assert type(dav.data_array[0][1]) is float
@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+
+LAZY_MODULES = ['jsonpickle', 'demjson3', 'jsonpatch', 'geojson', 'asyncio', 'aiohttp', 'numpy', 'yaml',
+                'frost_sta_client.service.async_sensorthingsservice', 'frost_sta_client.dao.async_base']
+
+
+def imported_modules(statement):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=root + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement], env=env, capture_output=True,
+                            text=True, check=True)
+    # lines look like "import time:   self [us] | cumulative | imported package"
+    timings = {}
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and not line.endswith('imported package'):
+            _, cumulative, name = line[len('import time:'):].split('|')
+            timings[name.strip()] = int(cumulative)
+    return timings
+
+
+def test_import_does_not_load_rarely_used_dependencies():
+    timings = imported_modules('import frost_sta_client')
+    assert 'frost_sta_client' in timings
+    loaded = [module for module in LAZY_MODULES if module in timings]
+    assert loaded == [], 'imported eagerly: {}'.format(loaded)
+
+
+def test_rarely_used_dependencies_load_on_first_use():
+    timings = imported_modules('import frost_sta_client; frost_sta_client.AsyncSensorThingsService; '
+                               'frost_sta_client.jsonpickle')
+    assert 'frost_sta_client.service.async_sensorthingsservice' in timings
+    assert 'demjson3' in timings
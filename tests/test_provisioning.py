@@ -0,0 +1,125 @@
+import io
+import json
+import threading
+
+import pytest
+import requests
+from furl import furl
+from frost_sta_client.service.sensorthingsservice import SensorThingsService
+from frost_sta_client.provisioning import Provisioner
+from frost_sta_client.dao.base import CreateManyError
+from frost_sta_client.model.thing import Thing
+from frost_sta_client.model.datastream import Datastream
+from frost_sta_client.model.sensor import Sensor
+from frost_sta_client.model.observedproperty import ObservedProperty
+from frost_sta_client.model.ext.unitofmeasurement import UnitOfMeasurement
+
+BASE = 'http://example.org/FROST-Server/v1.1'
+
+
+class MockResponse:
+    def __init__(self, status_code=200, json_data=None, headers=None):
+        self.status_code = status_code
+        self.content = json.dumps(json_data if json_data is not None else {}).encode('utf-8')
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(response=self)
+
+
+class ProvisioningService(SensorThingsService):
+    """Knows the ObservedProperty 'Temperature' with id 7 and creates everything else with ascending ids"""
+
+    def __init__(self):
+        super().__init__(BASE)
+        self.calls = []
+        self.next_id = 100
+        self.lock = threading.Lock()
+
+    def execute(self, method, url, **kwargs):
+        url = furl(str(url))
+        collection = str(url.path).rsplit('/', 1)[-1]
+        with self.lock:
+            self.calls.append((method, collection, url.args.get('$filter'), kwargs.get('json')))
+            if method == 'get':
+                found = [{'@iot.id': 7, 'name': 'Temperature', 'definition': 'd', 'description': 'd'}]
+                if collection != 'ObservedProperties' or "name eq 'Temperature'" not in url.args['$filter']:
+                    found = []
+                return MockResponse(200, {'value': found})
+            if kwargs['json'].get('name') == 'broken':
+                MockResponse(400).raise_for_status()
+            self.next_id += 1
+            return MockResponse(201, headers={'location': '{}/{}({})'.format(BASE, collection, self.next_id)})
+
+
+def datastream(name, sensor, observed_property):
+    return Datastream(name=name, description='d', observation_type='OM_Measurement',
+                      unit_of_measurement=UnitOfMeasurement(name='C', symbol='C', definition='u'),
+                      sensor=sensor, observed_property=observed_property)
+
+
+def test_provisioning_deduplicates_and_links_shared_entities():
+    svc = ProvisioningService()
+    things = []
+    for i in range(3):
+        dht = Sensor(name='DHT22', description='d', encoding_type='application/pdf', metadata='m')
+        own = Sensor(name='own{}'.format(i), description='d', encoding_type='application/pdf', metadata='m')
+        temperature = ObservedProperty(name='Temperature', definition='d', description='d')
+        things.append(Thing(name='site{}'.format(i), description='d',
+                            datastreams=[datastream('t', dht, temperature), datastream('o', own, temperature)]))
+    Provisioner(svc, concurrency=3).provision(things)
+
+    lookups = [call for call in svc.calls if call[0] == 'get']
+    assert sorted(call[1] for call in lookups) == ['ObservedProperties', 'Sensors']
+    sensor_filter = [call[2] for call in lookups if call[1] == 'Sensors'][0]
+    assert sorted(sensor_filter.split(' or ')) == sorted(["(name eq 'DHT22')", "(name eq 'own0')",
+                                                          "(name eq 'own1')", "(name eq 'own2')"])
+    sensor_posts = [call for call in svc.calls if call[:2] == ('post', 'Sensors')]
+    assert [call[3]['name'] for call in sensor_posts] == ['DHT22']
+    thing_posts = [call[3] for call in svc.calls if call[:2] == ('post', 'Things')]
+    assert len(thing_posts) == 3
+    dht_id = things[0].datastreams.entities[0].sensor.id
+    assert dht_id is not None
+    for payload in thing_posts:
+        shared, own = payload['Datastreams']
+        assert shared['Sensor'] == {'@iot.id': dht_id}
+        assert shared['ObservedProperty'] == {'@iot.id': 7}
+        assert own['Sensor']['name'].startswith('own') and '@iot.id' not in own['Sensor']
+        assert 'Thing' not in shared
+    assert all(thing.id is not None and thing.service is svc for thing in things)
+
+
+def test_provisioning_from_yaml_topology():
+    pytest.importorskip('yaml')
+    topology = io.StringIO("""
+sensors:
+  - {name: DHT22, description: d, encodingType: application/pdf, metadata: m}
+observedProperties:
+  - {name: Temperature, definition: d, description: d}
+  - {name: Humidity, definition: d, description: d}
+things:
+  - name: site
+    description: d
+    Locations:
+      - {name: here, description: d, encodingType: application/geo+json,
+         location: {type: Point, coordinates: [1, 2]}}
+    Datastreams:
+      - {name: t, description: d, observationType: m, unitOfMeasurement: {name: C, symbol: C, definition: u},
+         Sensor: DHT22, ObservedProperty: Temperature}
+      - {name: h, description: d, observationType: m, unitOfMeasurement: {name: P, symbol: P, definition: u},
+         Sensor: DHT22, ObservedProperty: Humidity}
+  - {name: broken, description: d}
+""")
+    svc = ProvisioningService()
+    with pytest.raises(CreateManyError) as error:
+        Provisioner(svc).provision_yaml(topology)
+    assert [thing.name for thing, _ in error.value.failed] == ['broken']
+    payload = [call[3] for call in svc.calls if call[:2] == ('post', 'Things')][0]
+    assert payload['Locations'][0]['location'] == {'type': 'Point', 'coordinates': [1, 2]}
+    temperature, humidity = payload['Datastreams']
+    assert temperature['ObservedProperty'] == {'@iot.id': 7}
+    assert humidity['ObservedProperty']['name'] == 'Humidity'
+    assert temperature['Sensor'] == humidity['Sensor'] and '@iot.id' in temperature['Sensor']
+    with pytest.raises(ValueError):
+        Provisioner.things_from_topology({'things': [{'name': 'x', 'Datastreams': [{'Sensor': 'unknown'}]}]})
@@ -1,4 +1,9 @@
+import re
+import threading
+
+import pytest
 import requests
+from furl import furl
 import frost_sta_client.model.ext.entity_list
 from frost_sta_client.service.sensorthingsservice import SensorThingsService
 
@@ -40,3 +45,222 @@ def test_query_builds_and_lists():
     assert len(lst.entities) == 1
     assert isinstance(lst, frost_sta_client.model.ext.entity_list.EntityList)
     assert isinstance(lst.entities[0], frost_sta_client.model.thing.Thing)
+
+
+def test_query_list_passes_prefetch():
+    first = MockResponse(200, {"value": [{"@iot.id": 1, "name": "A"}]})
+    svc = DummyService('http://example.org/FROST-Server/v1.1', [first])
+    lst = svc.things().query().list(prefetch=3)
+    assert lst.prefetch == 3
+    assert [t.name for t in lst] == ['A']
+
+
+def test_query_stream_returns_streaming_list():
+    first = MockResponse(200, {"value": [{"@iot.id": 1, "name": "A"}], "@iot.count": 1})
+    svc = DummyService('http://example.org/FROST-Server/v1.1', [first])
+    lst = svc.things().query().count().stream()
+    assert lst.streaming
+    assert lst.count == 1
+    assert [t.name for t in lst] == ['A']
+
+
+class RangeService(SensorThingsService):
+    """
+    Serves Things with ids 1..25 and evaluates the id range filters and $top paging used by list_parallel
+    """
+    def __init__(self, url, ids):
+        super().__init__(url)
+        self.ids = ids
+        self.calls = []
+
+    def execute(self, method, url, **kwargs):
+        self.calls.append((method, str(url)))
+        args = furl(str(url)).args
+        ids = sorted(self.ids, reverse=args.get('$orderby') == 'id desc')
+        for op, value in re.findall(r'id (ge|gt|lt|le) (\d+)', args.get('$filter', '')):
+            value = int(value)
+            ids = [i for i in ids if {'ge': i >= value, 'gt': i > value, 'lt': i < value, 'le': i <= value}[op]]
+        top = int(args.get('$top', 4))
+        skip = int(args.get('$skip', 0))
+        page = {"value": [{"@iot.id": i, "name": str(i)} for i in ids[skip:skip + top]]}
+        if skip + top < len(ids) and args.get('$top') != '1':
+            next_url = furl(str(url))
+            next_url.args['$skip'] = skip + top
+            page["@iot.nextLink"] = next_url.url
+        return MockResponse(200, page)
+
+
+def test_list_parallel_by_id_ordered():
+    svc = RangeService('http://example.org/FROST-Server/v1.1', list(range(1, 26)))
+    lst = svc.things().query().filter("name ne 'x'").list_parallel(workers=3, slices=4)
+    assert [t.id for t in lst.entities] == list(range(1, 26))
+    assert lst.count == 25
+    slice_calls = [c for c in svc.calls if 'lt' in c[1] or 'le' in c[1]]
+    assert len(slice_calls) > 4
+    assert all('name+ne' in c[1] or 'name%20ne' in c[1] for c in slice_calls)
+
+
+def test_list_parallel_unordered_and_empty():
+    svc = RangeService('http://example.org/FROST-Server/v1.1', list(range(5, 30)))
+    lst = svc.things().query().list_parallel(workers=4, ordered=False)
+    assert sorted(t.id for t in lst.entities) == list(range(5, 30))
+    empty = RangeService('http://example.org/FROST-Server/v1.1', [])
+    assert empty.things().query().list_parallel().entities == []
+    with pytest.raises(ValueError):
+        svc.things().query().list_parallel(partition_by='name')
+
+
+def test_keyset_paging_filters_on_last_id():
+    svc = RangeService('http://example.org/FROST-Server/v1.1', list(range(1, 12)))
+    lst = svc.things().query().top(4).skip(2).keyset().list()
+    assert [t.id for t in lst] == list(range(1, 12))
+    first_args = furl(svc.calls[0][1]).args
+    assert first_args['$orderby'] == 'id asc'
+    assert '$skip' not in first_args
+    assert [furl(c[1]).args.get('$filter') for c in svc.calls[1:]] == ['id gt 4', 'id gt 8']
+
+
+def test_keyset_cursor_resumes_iteration():
+    svc = RangeService('http://example.org/FROST-Server/v1.1', list(range(1, 12)))
+    lst = svc.things().query().filter('id ge 2').top(3).keyset().list()
+    assert lst.cursor is None
+    it = iter(lst)
+    consumed = [next(it).id for _ in range(4)]
+    assert consumed == [2, 3, 4, 5]
+    token = lst.cursor
+    resumed = svc.things().query().filter('id ge 2').top(3).keyset(cursor=token).list()
+    assert [t.id for t in resumed] == list(range(6, 12))
+    assert furl(svc.calls[-1][1]).args['$filter'] == '(id ge 2) and id gt 8'
+    with pytest.raises(ValueError):
+        svc.things().query().keyset('phenomenonTime', cursor=token)
+
+
+def test_keyset_by_phenomenon_time_only_for_observations():
+    svc = RangeService('http://example.org/FROST-Server/v1.1', [])
+    svc.observations().query().keyset('phenomenonTime')
+    with pytest.raises(ValueError):
+        svc.datastreams().query().keyset('phenomenonTime')
+
+
+def test_keyset_pager_phenomenon_time_filter():
+    from frost_sta_client.query.keyset import KeysetPager
+    pager = KeysetPager('http://example.org/v1.1/Observations', {'$select': 'result'}, 'phenomenonTime')
+    args = pager.args(['2020-01-01T00:00:00+01:00', 7])
+    assert args['$orderby'] == 'phenomenonTime asc,id asc'
+    assert args['$select'] == 'result,phenomenonTime,id'
+    assert args['$filter'] == '(phenomenonTime gt 2019-12-31T23:00:00.000000Z or ' \
+                              '(phenomenonTime eq 2019-12-31T23:00:00.000000Z and id gt 7))'
+
+
+def test_query_data_array_reads_columns_across_pages():
+    link = 'http://example.org/FROST-Server/v1.1/Datastreams(7)'
+    first_page = lambda: MockResponse(200, {"value": [{"Datastream@iot.navigationLink": link,
+                                          "components": ["id", "phenomenonTime", "result"],
+                                          "dataArray@iot.count": 2,
+                                          "dataArray": [[1, "2023-01-01T00:00:00Z", 1.5],
+                                                        [2, "2023-01-01T00:01:00Z", 2.5]]}],
+                               "@iot.nextLink": "http://example.org/FROST-Server/v1.1/Observations?$skip=2"})
+    second = MockResponse(200, {"value": [{"Datastream@iot.navigationLink": link,
+                                           "components": ["id", "phenomenonTime", "result"],
+                                           "dataArray": [[3, "2023-01-01T00:02:00Z", 3.5]]}]})
+    svc = DummyService('http://example.org/FROST-Server/v1.1', [first_page(), second])
+    document = svc.observations().query().filter('result gt 1').data_array()
+    assert '%24resultFormat=dataArray' in svc.calls[0][1]
+    assert svc.calls[1][1].endswith('$skip=2')
+    assert document.next_link is None
+    dav, = document.value
+    assert dav.datastream.id == 7
+    assert dav.column('result') == [1.5, 2.5, 3.5]
+    assert dav.columns()['id'] == [1, 2, 3]
+    with pytest.raises(KeyError):
+        dav.column('resultTime')
+
+    svc = DummyService('http://example.org/FROST-Server/v1.1', [first_page()])
+    page = svc.observations().query().data_array(follow_next_links=False)
+    assert page.next_link.endswith('$skip=2')
+    assert page.row_count() == 2
+
+
+def test_query_trusted_decodes_all_pages():
+    first = MockResponse(200, {"value": [{"@iot.id": 1, "name": "A"}],
+                               "@iot.nextLink": "http://example.org/FROST-Server/v1.1/Things?$skip=1"})
+    second = MockResponse(200, {"value": [{"@iot.id": 2, "name": "B"}]})
+    svc = DummyService('http://example.org/FROST-Server/v1.1', [first, second])
+    svc.trusted_decode = True
+    lst = svc.things().query().list()
+    assert lst.trusted
+    assert [t.name for t in lst] == ['A', 'B']
+    assert not svc.things().query().trusted(False).is_trusted()
+
+
+def test_query_deduplicate_shares_expanded_entities_across_pages():
+    def observation(i):
+        return {"@iot.id": i, "result": i, "Datastream": {"@iot.id": 5, "name": "DS"},
+                "FeatureOfInterest": {"@iot.id": 9, "name": "F"}}
+    first = MockResponse(200, {"value": [observation(1), observation(2)],
+                               "@iot.nextLink": "http://example.org/FROST-Server/v1.1/Observations?$skip=2"})
+    second = MockResponse(200, {"value": [observation(3)]})
+    svc = DummyService('http://example.org/FROST-Server/v1.1', [first, second])
+    observations = list(svc.observations().query().expand('Datastream,FeatureOfInterest').deduplicate().list())
+    assert len(observations) == 3
+    assert len({id(o.datastream) for o in observations}) == 1
+    assert len({id(o.feature_of_interest) for o in observations}) == 1
+    assert observations[0].datastream.service is svc
+
+
+def test_identity_map_of_service_can_be_overridden_per_query():
+    data = {"value": [{"@iot.id": 1, "Datastream": {"@iot.id": 5}}, {"@iot.id": 2, "Datastream": {"@iot.id": 5}}]}
+    svc = DummyService('http://example.org/FROST-Server/v1.1', [MockResponse(200, data), MockResponse(200, data)])
+    svc.identity_map = True
+    shared = svc.observations().query().list()
+    assert shared.entities[0].datastream is shared.entities[1].datastream
+    separate = svc.observations().query().deduplicate(False).list()
+    assert separate.entities[0].datastream is not separate.entities[1].datastream
+    with pytest.raises(ValueError):
+        svc.identity_map = {}
+
+
+def test_query_delete_uses_filtered_collection_delete():
+    svc = DummyService('http://example.org/FROST-Server/v1.1', [MockResponse(200)])
+    assert svc.observations().query().filter('result gt 10').delete() is None
+    assert svc.calls == [('delete', 'http://example.org/FROST-Server/v1.1/Observations?%24filter=result+gt+10')]
+    with pytest.raises(ValueError):
+        svc.observations().query().delete()
+
+
+class DeleteService(SensorThingsService):
+    """Rejects collection deletes and serves the ids 1..5 in pages of two, without the deleted ones"""
+
+    def __init__(self):
+        super().__init__('http://example.org/FROST-Server/v1.1')
+        self.remaining = [1, 2, 3, 4, 5]
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def execute(self, method, url, **kwargs):
+        url = furl(str(url))
+        with self.lock:
+            self.calls.append((method, str(url)))
+            if method == 'delete' and str(url.path).endswith('/Observations'):
+                MockResponse(405).raise_for_status()
+            if method == 'delete':
+                self.remaining.remove(int(re.search(r'\((\d+)\)', str(url.path)).group(1)))
+                return MockResponse(200)
+            match = re.search(r'id gt (\d+)', url.args.get('$filter', ''))
+            after = int(match.group(1)) if match else 0
+            ids = [i for i in self.remaining if i > after]
+            body = {"value": [{"@iot.id": i} for i in ids[:2]]}
+            if len(ids) > 2:
+                body["@iot.nextLink"] = 'http://example.org/FROST-Server/v1.1/Observations?$skip=2'
+            return MockResponse(200, body)
+
+
+def test_query_delete_falls_back_to_deleting_one_by_one():
+    svc = DeleteService()
+    assert svc.observations().query().filter('result gt 10').delete(workers=2) == 5
+    assert svc.remaining == []
+    get_urls = [url for method, url in svc.calls if method == 'get']
+    assert len(get_urls) == 3
+    assert all('%24select=id' in url and 'result+gt+10' in url for url in get_urls)
+    with pytest.raises(requests.exceptions.HTTPError):
+        DeleteService().observations().query().filter('result gt 10').delete(fallback=False)
@@ -0,0 +1,140 @@
+import json
+import os
+
+import pytest
+import requests
+from requests.structures import CaseInsensitiveDict
+from frost_sta_client.service.sensorthingsservice import SensorThingsService
+from frost_sta_client.service.response_cache import ResponseCache
+from frost_sta_client.model.thing import Thing
+
+BASE = 'http://example.org/FROST-Server/v1.1'
+
+
+def make_response(status_code=200, body=None, headers=None):
+    response = requests.models.Response()
+    response.status_code = status_code
+    response.headers = CaseInsensitiveDict(headers or {})
+    response._content = json.dumps(body).encode('utf-8') if body is not None else b''
+    return response
+
+
+class FakeServer:
+    def __init__(self, responses=None):
+        self.responses = list(responses or [])
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, str(url), dict(kwargs.get('headers') or {})))
+        if self.responses:
+            return self.responses.pop(0)
+        return make_response(200, {'@iot.id': 1, 'name': 'A'})
+
+
+def cached_service(monkeypatch, responses=None, **cache_kwargs):
+    svc = SensorThingsService(BASE, cache=ResponseCache(**cache_kwargs))
+    server = FakeServer(responses)
+    monkeypatch.setattr(svc.session, 'request', server.request)
+    return svc, server
+
+
+def test_find_is_served_from_cache(monkeypatch):
+    svc, server = cached_service(monkeypatch)
+    first = svc.things().find(1)
+    second = svc.things().find(1)
+    assert first.name == second.name == 'A'
+    assert first is not second
+    assert len(server.calls) == 1
+    assert svc.cache.hits == 1
+
+
+def test_cache_type_check():
+    with pytest.raises(ValueError):
+        SensorThingsService(BASE, cache={})
+    with pytest.raises(ValueError):
+        ResponseCache(ttl=-1)
+
+
+def test_stale_entry_is_revalidated(monkeypatch):
+    responses = [make_response(200, {'@iot.id': 1, 'name': 'A'}, {'ETag': '"v1"'}),
+                 make_response(304)]
+    svc, server = cached_service(monkeypatch, responses, ttl=0)
+    svc.things().find(1)
+    thing = svc.things().find(1)
+    assert thing.name == 'A'
+    assert server.calls[1][2]['If-None-Match'] == '"v1"'
+
+
+def test_changed_entry_is_replaced(monkeypatch):
+    responses = [make_response(200, {'@iot.id': 1, 'name': 'A'}, {'Last-Modified': 'Mon, 01 Jan 2024 00:00:00 GMT'}),
+                 make_response(200, {'@iot.id': 1, 'name': 'B'})]
+    svc, server = cached_service(monkeypatch, responses, ttl=0)
+    svc.things().find(1)
+    assert svc.things().find(1).name == 'B'
+    assert server.calls[1][2]['If-Modified-Since'] == 'Mon, 01 Jan 2024 00:00:00 GMT'
+
+
+def test_writes_invalidate_related_entries(monkeypatch):
+    responses = [make_response(200, {'@iot.id': 1, 'name': 'A'}), make_response(200, {'value': []}),
+                 make_response(200, {'@iot.id': 2, 'name': 'S'})]
+    svc, server = cached_service(monkeypatch, responses)
+    svc.things().find(1)
+    svc.datastreams().query().expand('Thing').list()
+    svc.sensors().find(2)
+    svc.patch(Thing(id=1), [{'op': 'replace', 'path': '/name', 'value': 'B'}])
+    assert len(svc.cache) == 1
+    svc.things().find(1)
+    assert [call[0] for call in server.calls].count('get') == 4
+
+
+def test_lru_bound():
+    cache = ResponseCache(max_entries=2)
+    for i in range(3):
+        cache.update('{}/Things({})'.format(BASE, i), make_response(200, {'@iot.id': i}))
+    assert len(cache) == 2
+    assert cache.lookup('{}/Things(0)'.format(BASE))[0] is None
+    assert cache.lookup('{}/Things(2)'.format(BASE))[0] is not None
+
+
+def test_disk_storage(tmp_path):
+    url = '{}/Things(1)'.format(BASE)
+    ResponseCache(directory=str(tmp_path)).update(url, make_response(200, {'@iot.id': 1}, {'ETag': '"v1"'}))
+    cached, validators = ResponseCache(directory=str(tmp_path)).lookup(url)
+    assert cached.json() == {'@iot.id': 1}
+    ResponseCache(directory=str(tmp_path)).invalidate('{}/Things(1)'.format(BASE))
+    assert ResponseCache(directory=str(tmp_path)).lookup(url)[0] is None
+
+
+def test_deep_insert_invalidates_nested_entity_types():
+    cache = ResponseCache()
+    for path in ('Sensors', 'ObservedProperties', 'HistoricalLocations', 'FeaturesOfInterest'):
+        cache.update('{}/{}'.format(BASE, path), make_response(200, {'value': []}))
+    body = {'name': 't', 'Locations': [{'name': 'l'}],
+            'Datastreams': [{'name': 'd', 'Sensor': {'@iot.id': 1}, 'ObservedProperty': {'name': 'o'}}]}
+    assert ResponseCache.entity_types_in(body) == {'Location', 'Datastream', 'Sensor', 'ObservedProperty'}
+    cache.invalidate(BASE + '/Things', body)
+    assert [entry for entry in cache._entries] == [BASE + '/FeaturesOfInterest']
+
+
+def test_disk_invalidation_does_not_read_files(tmp_path, monkeypatch):
+    cache = ResponseCache(directory=str(tmp_path))
+    for i in range(3):
+        cache.update('{}/Things({})'.format(BASE, i), make_response(200, {'@iot.id': i}))
+    cache.update(BASE + '/Sensors', make_response(200, {'value': []}))
+
+    def no_open(*args, **kwargs):
+        raise AssertionError('invalidate should not open cache files')
+
+    monkeypatch.setattr('frost_sta_client.service.response_cache.open', no_open, raising=False)
+    cache.invalidate(BASE + '/Things(1)')
+    assert len(os.listdir(str(tmp_path))) == 1
+    cache.clear()
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_entity_type_of():
+    assert ResponseCache.entity_type_of(BASE + '/Things(1)') == 'Thing'
+    assert ResponseCache.entity_type_of(BASE + '/Datastreams(1)/Observations') == 'Observation'
+    assert ResponseCache.entity_type_of(BASE + '/FeaturesOfInterest') == 'FeatureOfInterest'
+    assert ResponseCache.entity_type_of(BASE + '/CreateObservations') == 'Observation'
+    assert ResponseCache.entity_type_of(BASE + '/$batch') is None
@@ -0,0 +1,123 @@
+import asyncio
+import email.utils
+import json
+import time
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+from frost_sta_client.service.sensorthingsservice import SensorThingsService
+from frost_sta_client.service.async_sensorthingsservice import AsyncSensorThingsService
+from frost_sta_client.service.retry_policy import RetryPolicy
+from frost_sta_client.model.thing import Thing
+
+BASE = 'http://example.org/FROST-Server/v1.1'
+
+
+def make_response(status_code, json_data=None, headers=None):
+    response = requests.models.Response()
+    response.status_code = status_code
+    response.headers = requests.structures.CaseInsensitiveDict(headers or {})
+    response._content = json.dumps(json_data if json_data is not None else {}).encode('utf-8')
+    response.encoding = 'utf-8'
+    return response
+
+
+class ScriptedAdapter(BaseAdapter):
+    """Answers requests with the given responses in turn, raising the ones that are exceptions"""
+
+    def __init__(self, answers):
+        super().__init__()
+        self.answers = list(answers)
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append((request.method, request.url))
+        answer = self.answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        answer.request = request
+        return answer
+
+    def close(self):
+        pass
+
+
+def fast_policy(**kwargs):
+    return RetryPolicy(backoff_factor=0, jitter=False, **kwargs)
+
+
+def test_next_delay_backoff_and_limits():
+    policy = RetryPolicy(max_retries=3, backoff_factor=1, max_backoff=3, jitter=False, max_elapsed=10)
+    delays = [policy.next_delay('get', BASE, attempt, 0, make_response(503)) for attempt in range(4)]
+    assert delays == [1, 2, 3, None]
+    assert policy.next_delay('get', BASE, 0, 9.5, make_response(503)) is None
+    assert policy.next_delay('get', BASE, 0, 0, make_response(404)) is None
+    assert policy.next_delay('get', BASE, 0, 0, error=requests.exceptions.ConnectionError()) == 1
+    assert 0 <= RetryPolicy(backoff_factor=1).next_delay('get', BASE, 1, 0, make_response(429)) <= 2
+    with pytest.raises(ValueError):
+        RetryPolicy(max_retries=-1)
+
+
+def test_retry_after_header():
+    policy = RetryPolicy(max_backoff=1, max_elapsed=60)
+    assert policy.next_delay('get', BASE, 0, 0, make_response(429, headers={'Retry-After': '7'})) == 7
+    date = email.utils.formatdate(time.time() + 30, usegmt=True)
+    delay = policy.next_delay('get', BASE, 0, 0, make_response(503, headers={'Retry-After': date}))
+    assert 25 < delay <= 30
+    assert policy.next_delay('get', BASE, 0, 0, make_response(503, headers={'Retry-After': '600'})) is None
+
+
+def test_non_idempotent_methods_need_permission():
+    response = make_response(503)
+    assert RetryPolicy().next_delay('post', BASE, 0, 0, response) is None
+    assert RetryPolicy().next_delay('patch', BASE, 0, 0, response) is None
+    assert RetryPolicy(retry_non_idempotent=True).next_delay('post', BASE, 0, 0, response) is not None
+    only_connect = fast_policy(retry_non_idempotent=lambda method, url, response, error:
+                               isinstance(error, requests.exceptions.ConnectTimeout))
+    assert only_connect.next_delay('post', BASE, 0, 0, response) is None
+    assert only_connect.next_delay('post', BASE, 0, 0, error=requests.exceptions.ConnectTimeout()) == 0
+
+
+def test_service_retries_dao_calls_and_page_fetches():
+    adapter = ScriptedAdapter([make_response(503), requests.exceptions.ConnectionError(),
+                               make_response(200, {'@iot.id': 1, 'name': 'x'}),
+                               make_response(200, {'value': [{'@iot.id': 1}],
+                                                   '@iot.nextLink': BASE + '/Things?$skip=1'}),
+                               make_response(502), make_response(200, {'value': [{'@iot.id': 2}]})])
+    svc = SensorThingsService(BASE, adapter=adapter, retry_policy=fast_policy())
+    assert svc.things().find(1).name == 'x'
+    assert len(adapter.requests) == 3
+    things = svc.things().query().list()
+    assert [thing.id for thing in things] == [1, 2]
+    assert len(adapter.requests) == 6
+
+
+def test_service_gives_up_and_does_not_retry_posts():
+    adapter = ScriptedAdapter([make_response(503)] * 3 + [make_response(503)])
+    svc = SensorThingsService(BASE, adapter=adapter, retry_policy=fast_policy(max_retries=2))
+    with pytest.raises(requests.exceptions.HTTPError):
+        svc.execute('get', BASE + '/Things')
+    assert len(adapter.requests) == 3
+    with pytest.raises(requests.exceptions.HTTPError):
+        svc.create(Thing(name='x', description='d'))
+    assert len(adapter.requests) == 4
+    svc.retry_policy = True
+    assert isinstance(svc.retry_policy, RetryPolicy)
+    with pytest.raises(ValueError):
+        svc.retry_policy = 3
+
+
+def test_async_service_retries(monkeypatch):
+    monkeypatch.setattr('frost_sta_client.service.async_sensorthingsservice.aiohttp', None)
+    adapter = ScriptedAdapter([make_response(429), requests.exceptions.Timeout(), make_response(200, {'@iot.id': 4})])
+    svc = AsyncSensorThingsService(BASE, adapter=adapter, retry_policy=fast_policy())
+
+    async def run():
+        try:
+            return await svc.things().find(4)
+        finally:
+            await svc.aclose()
+
+    assert asyncio.run(run()).id == 4
+    assert len(adapter.requests) == 3
@@ -1,6 +1,7 @@
 import pytest
 import requests
 from requests.auth import HTTPBasicAuth
+from requests.adapters import HTTPAdapter
 from frost_sta_client.service.sensorthingsservice import SensorThingsService
 from frost_sta_client.service.auth_handler import AuthHandler
 from frost_sta_client.model.thing import Thing
@@ -53,6 +54,91 @@ def test_execute_uses_auth(monkeypatch):
                 return {}
         return R()
 
-    monkeypatch.setattr(requests, 'request', fake_request)
+    monkeypatch.setattr(svc.session, 'request', fake_request)
     svc.execute('get', 'http://example.org')
     assert isinstance(captured['auth'], HTTPBasicAuth)
+
+
+def test_session_is_pooled_and_reused():
+    svc = SensorThingsService('http://example.org/FROST-Server/v1.1', pool_connections=2, pool_maxsize=20)
+    session = svc.session
+    assert svc.session is session
+    adapter = session.get_adapter('https://example.org')
+    assert isinstance(adapter, HTTPAdapter)
+    assert adapter._pool_maxsize == 20
+    assert adapter._pool_connections == 2
+
+
+def test_session_is_created_once_across_threads(monkeypatch):
+    import threading
+    import time
+    svc = SensorThingsService('http://example.org/FROST-Server/v1.1')
+    created = []
+
+    def slow_create_session():
+        time.sleep(0.01)
+        created.append(requests.Session())
+        return created[-1]
+
+    monkeypatch.setattr(svc, 'create_session', slow_create_session)
+    threads = [threading.Thread(target=lambda: svc.session) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(created) == 1
+    assert svc.session is created[0]
+
+
+def test_custom_adapter_and_keep_alive():
+    adapter = HTTPAdapter(pool_maxsize=3)
+    svc = SensorThingsService('http://example.org/FROST-Server/v1.1', adapter=adapter, keep_alive=False)
+    assert svc.session.get_adapter('http://example.org') is adapter
+    assert svc.session.headers['Connection'] == 'close'
+    with pytest.raises(ValueError):
+        svc.adapter = 'not-an-adapter'
+
+
+def test_context_manager_closes_session():
+    with SensorThingsService('http://example.org/FROST-Server/v1.1') as svc:
+        session = svc.session
+    assert svc._session is None
+    assert svc.session is not session
+
+
+def test_codec_selection():
+    from frost_sta_client.service import json_codec
+    svc = SensorThingsService('http://example.org/FROST-Server/v1.1', codec='json')
+    assert svc.codec.name == 'json'
+    assert SensorThingsService('http://example.org').codec.module is not None
+    with pytest.raises(ValueError):
+        svc.codec = 'no-such-codec'
+    svc.codec = json_codec.JsonCodec()
+    assert isinstance(svc.codec, json_codec.JsonCodec)
+
+
+@pytest.mark.parametrize('codec', ['json', 'orjson', 'ujson', 'msgspec'])
+def test_codec_encodes_requests_and_decodes_responses(monkeypatch, codec):
+    from frost_sta_client.service import json_codec
+    if json_codec.CODECS[codec].module is None:
+        pytest.skip('{} is not installed'.format(codec))
+    svc = SensorThingsService('http://example.org/FROST-Server/v1.1', codec=codec)
+    captured = {}
+
+    def fake_request(method, url, proxies=None, **kwargs):
+        captured.update(kwargs)
+        response = requests.models.Response()
+        response.status_code = 200
+        response._content = b'{"@iot.id": 1, "name": "A\\u00e4"}'
+        return response
+
+    monkeypatch.setattr(svc.session, 'request', fake_request)
+    svc.execute('post', 'http://example.org', json={'name': 'B', 'result': 1.5})
+    assert 'json' not in captured
+    assert captured['headers']['Content-Type'] == 'application/json'
+    assert svc.codec.loads(captured['data']) == {'name': 'B', 'result': 1.5}
+    svc.execute('patch', 'http://example.org', json=[], headers={'Content-type': 'application/json-patch+json'})
+    assert captured['headers'] == {'Content-type': 'application/json-patch+json'}
+    assert svc.things().find(1).name == 'Aä'
+    with pytest.raises(ValueError):
+        svc.codec.loads(b'<html>')
@@ -1,6 +1,7 @@
 import unittest
 
-from frost_sta_client.utils import parse_datetime
+from frost_sta_client.utils import parse_datetime, check_datetime, datetime_cache, DatetimeCache
+from frost_sta_client.model.observation import Observation
 import datetime
 
 
@@ -22,3 +23,24 @@ class TestUtils(unittest.TestCase):
         parsedtime = parse_datetime('2022-04-07T14:00:00+02:00/2022-04-07T15:00:00+02:00')
         self.assertEqual('2022-04-07T14:00:00+02:00/2022-04-07T15:00:00+02:00', parsedtime)
 
+    def test_parse_lenient_formats_and_datetime_lists(self):
+        self.assertEqual('2022-04-07T14:00:00.123456+00:00', parse_datetime('2022-04-07T14:00:00.123456789Z'))
+        self.assertEqual('2022-04-07T14:00:00+01:30', parse_datetime('20220407T140000+0130'))
+        start = datetime.datetime(2022, 4, 7, 14, tzinfo=datetime.timezone.utc)
+        self.assertEqual('2022-04-07T14:00:00+00:00/2022-04-07T15:00:00+00:00',
+                         parse_datetime([start, start + datetime.timedelta(hours=1)]))
+        with self.assertRaises(ValueError):
+            parse_datetime('2022-04-07T14:00:00Z/x')
+
+    def test_normalized_time_is_stored_and_cached(self):
+        datetime_cache.clear()
+        observation = Observation(phenomenon_time='2022-04-07T14:00:00.000Z', result=1)
+        self.assertEqual('2022-04-07T14:00:00+00:00', observation.phenomenon_time)
+        observation.__getstate__()
+        self.assertEqual((1, 1), (datetime_cache.hits, datetime_cache.misses))
+        cache = DatetimeCache(max_size=4)
+        for hour in range(10, 15):
+            cache.get('2022-04-07T{}:00:00Z'.format(hour))
+        self.assertEqual(4, len(cache.values))
+        now = datetime.datetime.now(datetime.timezone.utc)
+        self.assertIs(now, check_datetime(now, 'time'))
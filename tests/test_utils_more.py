@@ -31,3 +31,109 @@ def test_process_area_point_and_polygon():
     assert getattr(poly, 'type', 'Polygon') == 'Polygon'
     with pytest.raises(ValueError):
         utils.process_area({"type": "Unknown", "coordinates": []})
+
+
+def test_trusted_decode_matches_validated_decode():
+    data = {"value": [
+        {"@iot.id": 1, "name": "A", "description": "d", "properties": {"k": 1},
+         "Locations": [{"@iot.id": 3, "name": "L", "encodingType": "application/geo+json",
+                        "location": {"type": "Point", "coordinates": [1, 2]}}],
+         "Datastreams": [{"@iot.id": 5, "name": "DS", "unitOfMeasurement": {"name": "m"},
+                          "Observations": [{"@iot.id": 7, "result": 1.5,
+                                            "phenomenonTime": "2020-01-01T00:00:00Z",
+                                            "FeatureOfInterest": {"@iot.id": 9, "name": "F"}}]}],
+         "Datastreams@iot.nextLink": "http://example.org/Things(1)/Datastreams?$skip=1"}]}
+    validated = utils.transform_json_to_entity_list(data, 'frost_sta_client.model.thing.Thing')
+    trusted = utils.transform_json_to_entity_list(data, 'frost_sta_client.model.thing.Thing', trusted=True)
+    assert trusted.entities == validated.entities
+    assert trusted.entities[0].__getstate__() == validated.entities[0].__getstate__()
+    datastreams = trusted.entities[0].datastreams
+    assert datastreams.next_link == "http://example.org/Things(1)/Datastreams?$skip=1"
+    assert datastreams.entities[0].observations.entities[0].feature_of_interest.name == 'F'
+
+
+def test_expanded_relations_are_decoded_on_first_access():
+    from frost_sta_client.model.ext.lazy_relation import LazyRelation
+    from frost_sta_client.service.sensorthingsservice import SensorThingsService
+    data = {"@iot.id": 1, "name": "A",
+            "Datastreams": [{"@iot.id": 5, "name": "DS", "Observations": [{"@iot.id": 7, "result": 3}]}],
+            "Datastreams@iot.count": 4}
+    thing = utils.transform_json_to_entity(data, 'frost_sta_client.model.thing.Thing')
+    assert thing.name == 'A'
+    assert isinstance(thing._datastreams, LazyRelation)
+    service = SensorThingsService('http://example.org/FROST-Server/v1.1')
+    thing.set_service(service)
+    assert isinstance(thing._datastreams, LazyRelation)
+    datastreams = thing.datastreams
+    assert thing.datastreams is datastreams
+    assert datastreams.count == 4
+    assert datastreams.entities[0].service is service
+    assert isinstance(datastreams.entities[0]._observations, LazyRelation)
+    assert datastreams.entities[0].observations.entities[0].result == 3
+    assert thing.__getstate__()['Datastreams'][0]['Observations'] == [{"@iot.id": 7, "result": 3}]
+
+
+def test_identity_map_returns_known_entities():
+    from frost_sta_client.model.ext.identity_map import IdentityMap
+    identity_map = IdentityMap()
+    data = [{"@iot.id": 1, "name": "A", "Datastreams": [{"@iot.id": 5, "name": "DS"}]},
+            {"@iot.id": 2, "name": "B", "Datastreams": [{"@iot.id": 5, "name": "DS"}]},
+            {"@iot.id": 1, "name": "A"}]
+    things = utils.transform_json_to_entity_list(data, 'frost_sta_client.model.thing.Thing', True, identity_map)
+    assert things.entities[0] is things.entities[2]
+    assert things.entities[0].datastreams.entities[0] is things.entities[1].datastreams.entities[0]
+    assert len(identity_map) == 3
+    del things
+    assert len(identity_map) == 0
+
+
+def test_identity_map_updates_known_entities():
+    from frost_sta_client.model.ext.identity_map import IdentityMap
+    identity_map = IdentityMap()
+    thing_class = 'frost_sta_client.model.thing.Thing'
+    old = utils.transform_json_to_entity({"@iot.id": 1, "name": "old", "properties": {"k": 1}}, thing_class, True,
+                                         identity_map)
+    new = utils.transform_json_to_entity({"@iot.id": 1, "name": "new", "description": "d",
+                                          "Datastreams": [{"@iot.id": 5, "name": "DS"}]}, thing_class, False,
+                                         identity_map)
+    assert new is old
+    assert (old.name, old.description, old.properties) == ('new', 'd', {"k": 1})
+    assert old.datastreams.entities[0].name == 'DS'
+    utils.transform_json_to_entity({"@iot.id": 1, "description": "e"}, thing_class, True, identity_map)
+    assert (old.name, old.description, old.datastreams.entities[0].id) == ('new', 'e', 5)
+
+
+def test_identity_map_hits_only_apply_changed_keys(monkeypatch):
+    from frost_sta_client.model.ext.identity_map import IdentityMap
+    from frost_sta_client.model.datastream import Datastream
+    identity_map = IdentityMap()
+    ds_class = 'frost_sta_client.model.datastream.Datastream'
+    ds = {"@iot.id": 7, "name": "DS", "description": "d", "unitOfMeasurement": {"name": "Celsius", "symbol": "C"},
+          "phenomenonTime": "2023-01-01T00:00:00Z", "Thing": {"@iot.id": 1, "name": "T"}}
+    shared = utils.transform_json_to_entity(ds, ds_class, False, identity_map)
+    assert utils.transform_json_to_entity(dict(ds), ds_class, False, identity_map) is shared
+    thing = shared.thing
+    calls = []
+    for method in ('__setstate__', 'set_trusted_state', 'get_property_state'):
+        original = getattr(Datastream, method)
+        monkeypatch.setattr(Datastream, method,
+                            lambda self, *args, _method=method, _original=original: calls.append(_method) or
+                            _original(self, *args))
+    for trusted in (False, True):
+        assert utils.transform_json_to_entity(dict(ds), ds_class, trusted, identity_map) is shared
+    assert calls == []
+
+    shared.description = 'local'
+    utils.transform_json_to_entity(dict(ds, name="new", phenomenonTime="2023-01-02T00:00:00Z"), ds_class, False,
+                                   identity_map)
+    assert 'get_property_state' not in calls
+    assert (shared.name, shared.description) == ('new', 'local')
+    assert shared.phenomenon_time == '2023-01-02T00:00:00+00:00'
+    assert shared.unit_of_measurement.symbol == 'C'
+    assert shared.thing is thing
+
+    utils.transform_json_to_entity(dict(ds, name="new", Thing={"@iot.id": 2, "name": "U"}), ds_class, True,
+                                   identity_map)
+    assert shared.thing.id == 2 and shared.name == 'new'
+    assert utils.transform_json_to_entity({"@iot.id": 2}, 'frost_sta_client.model.thing.Thing', True,
+                                          identity_map) is shared.thing